@@ -0,0 +1,117 @@
+"""
+Compares stdlib and system tool decompression backends.
+
+    python benchmarks/decompression.py [--size-mb 256] [--repeat 3]
+
+For each format, compresses synthetic payload (using system tool when available, so
+that ie. `.xz` is written in multiple blocks, the same way release assets usually are),
+then decompresses it with both backends, verifies outputs are identical and prints
+best wall clock time of each.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import random
+import shutil
+import subprocess
+import time
+
+from usr_local_pull import decompressors
+
+_COMPRESSORS = {
+    "gz": (("pigz", "-c", "-6"), lambda data: gzip.compress(data, 6)),
+    "bz2": (("lbzip2", "-c"), bz2.compress),
+    "xz": (("xz", "-c", "-T0", "-6"), lzma.compress),
+    "zst": (("zstd", "-c", "-T0", "-q"), None),
+}
+
+
+def _payload(size: int) -> bytes:
+    # Compressible, but not trivially so: mix of random words and random bytes,
+    # roughly resembling a binary with embedded strings.
+    rnd = random.Random(42)  # noqa: S311
+    words = [rnd.randbytes(rnd.randint(3, 12)).hex().encode() for _ in range(4096)]
+    out = io.BytesIO()
+    while out.tell() < size:
+        if rnd.random() < 0.1:  # noqa: PLR2004
+            out.write(rnd.randbytes(256))
+        else:
+            out.write(b" ".join(rnd.choices(words, k=64)))
+    return out.getvalue()[:size]
+
+
+def _compress(compression: str, data: bytes) -> bytes | None:
+    cmd, fallback = _COMPRESSORS[compression]
+    if shutil.which(cmd[0]):
+        return subprocess.run(  # noqa: S603
+            cmd, input=data, capture_output=True, check=True, shell=False
+        ).stdout
+    return fallback(data) if fallback else None
+
+
+def _time_backend(backend: str, compression: str, data: bytes, repeat: int):
+    decompressors.set_backend(backend)
+    best = float("inf")
+    digest = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        h = hashlib.sha256()
+        with decompressors.open_decompressed(io.BytesIO(data), compression) as f:
+            while chunk := f.read(1024 * 1024):
+                h.update(chunk)
+        best = min(best, time.perf_counter() - start)
+        digest = h.hexdigest()
+    return best, digest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = _payload(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(payload).hexdigest()
+
+    print(f"{'format':<8}{'tool':<10}{'stdlib':>10}{'system':>10}{'speedup':>10}")
+    for compression in _COMPRESSORS:
+        compressed = _compress(compression, payload)
+        if compressed is None:
+            print(f"{compression:<8}{'-':<10}skipped, no compressor available")
+            continue
+
+        decompressors.set_backend("auto")
+        tool = decompressors.system_tool(compression)
+
+        try:
+            stdlib_t, stdlib_digest = _time_backend(
+                "stdlib", compression, compressed, args.repeat
+            )
+        except ValueError:
+            stdlib_t, stdlib_digest = float("nan"), expected
+
+        if not tool:
+            print(f"{compression:<8}{'-':<10}{stdlib_t:>9.3f}s{'-':>10}{'-':>10}")
+            continue
+
+        system_t, system_digest = _time_backend(
+            "auto", compression, compressed, args.repeat
+        )
+
+        if stdlib_digest != expected or system_digest != expected:
+            raise SystemExit(f"{compression}: decompressed output differs!")
+
+        print(
+            f"{compression:<8}{tool[0].rsplit('/', 1)[-1]:<10}"
+            f"{stdlib_t:>9.3f}s{system_t:>9.3f}s{stdlib_t / system_t:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
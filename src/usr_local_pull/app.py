@@ -1,116 +1,56 @@
 from __future__ import annotations
 
-import contextlib
+import copy
 import logging
+import os
 import stat
 import subprocess
+import tempfile
+import threading
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from contextlib import contextmanager
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar, Final
 
 from packaging.version import Version
-from packaging.version import parse as parse_version
 
+from . import generated, manuals, probes, versions
+from .app_files import (
+    BIN_PERM,
+    DEFAULT_PREFIX,
+    DOC_PERM,
+    AppBinary,
+    InstallFile,
+    ManPage,
+    ZshCompletion,
+)
+from .generated import OUTPUT_DIR, GeneratedOutput
 from .gh_client import GithubApiClient
+from .probes import VersionProbe
+from .receipts import InstallReceipt, ReceiptFile, sha256_of
+from .transaction import InstallTransaction
+from .versions import VersionStore
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from datetime import date
+    from typing import Self
 
     from packaging.version import Version
 
+    from .app_files import StoredFile
+    from .archive_extractor import SelectedMembers
+    from .pipeline import Stage
 
-logger = logging.getLogger(__name__)
-
-# Default install prefix for everything.
-#
-# Following `make` and many other packaging tools traditions, it should be `/usr/local`.
-#
-# PREFIX="/usr"       - Stuff built by and installed from Linux distribution packages
-# PREFIX="/usr/local" - Stuff built by and installed by local admins (ie. `make install`
-#                       and similar commands). When system package is updated, it
-#                       doesn't overwrite locally built alternative
-# PREFIX="/opt"       - Stuff installed from external sources and maybe not even
-#                       packaged by hosting distribution standards (ie. doesn't keep
-#                       config in /etc, variable data in /var, etc...)
-DEFAULT_PREFIX = Path("/usr/local")
-
-BIN_PERM: int = (
-    stat.S_IRUSR  # Owner has read permission.
-    | stat.S_IWUSR  # Owner has write permission.
-    | stat.S_IXUSR  # Owner has execute permission.
-    | stat.S_IRGRP  # Group has read permission.
-    | stat.S_IXGRP  # Group has execute permission.
-    | stat.S_IXOTH  # Others have execute permission.
-    | stat.S_IROTH  # Others have read permission.
-)
-
-DOC_PERM: int = (
-    stat.S_IRUSR  # Owner has read permission.
-    | stat.S_IWUSR  # Owner has write permission.
-    | stat.S_IRGRP  # Group has read permission.
-    | stat.S_IROTH  # Others have read permission.
-)
-
-
-@dataclass
-class ManPage:
-    section: int
-    file_name: str
-    data: bytes = field(default=b"", repr=False)
-
-    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
-        return prefix / "share" / "man" / f"man{self.section}" / self.file_name
 
+logger = logging.getLogger(__name__)
 
-@dataclass
-class ZshCompletion:
-    app_name: str
-    data: bytes = field(default=b"", repr=False)
-    _file_name: str = field(init=False)
-
-    def __post_init__(self):
-        self._file_name = f"_{self.app_name}"
+# Downloaded binaries run to generate completions and man pages: how many may run at
+# once (regardless of number of workers in generate stage) and for how long
+GENERATOR_CONCURRENCY: Final[int] = 4
+GENERATOR_TIMEOUT: Final[float] = 60
 
-    @property
-    def file_name(self) -> str:
-        return self._file_name
-
-    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
-        # ZSH manual says vendor supplied functions should be in:
-        #
-        #     $PREFIX/share/zsh/site-functions
-        #
-        # Various Linux distributions additionally use:
-        #
-        #     $PREFIX/share/zsh/vendor-functions
-        #     $PREFIX/share/zsh/vendor-completions
-        #
-        # But then don't necessarily include these in `$fpath`:`
-        #
-        #     /usr/local/share/zsh/vendor-functions
-        #     /usr/local/share/zsh/vendor-completions
-        #
-        # This is, of course, because nothing from official Linux distribution repos
-        # gets installed in `$PREFIX=/ur/local`.
-        #
-        # What IS included in `$fpath` (probably because ZSH does it regardless of Linux
-        # distro):
-        #
-        #     `/usr/local/share/zsh/site-functions`
-        #
-        # Since this script is intended to be used for `/usr/local` installs anyway, we
-        # can safely use that and don't care about distro speciffic things
-        return prefix / "share" / "zsh" / "site-functions" / self.file_name
-
-
-@dataclass
-class AppBinary:
-    app_name: str
-    data: bytes = field(default=b"", repr=False)
-
-    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
-        return prefix / "bin" / self.app_name
+_GENERATOR_SLOTS = threading.BoundedSemaphore(GENERATOR_CONCURRENCY)
 
 
 class App(ABC):
@@ -130,6 +70,15 @@ class App(ABC):
         self.zsh_completions: list[ZshCompletion] | None = None
         self.man_pages: list[ManPage] = []
 
+    def at_prefix(self, prefix: str | Path) -> Self:
+        """
+        Shallow copy of app that installs into `prefix` instead, sharing everything
+        that was already downloaded (see `PrefixFanOut`).
+        """
+        retv = copy.copy(self)
+        retv.prefix = Path(prefix)
+        return retv
+
     @property
     @abstractmethod
     def installed_version(self) -> Version | None:
@@ -149,7 +98,7 @@ class App(ABC):
         )
 
     @abstractmethod
-    def download(self):
+    def download(self) -> Iterator[Stage] | None:
         """
         Unconditionally download all app's assets and populate:
 
@@ -157,83 +106,287 @@ class App(ABC):
         - self.zsh_completions
         - self.man_pages
         - self.other_bins
+
+        Should be generator that starts in `Stage.DOWNLOAD` and yields stage in which
+        it continues (see `Stage`). Plain function is run entirely in download stage.
         """
 
-    def install(self) -> list[Path]:
-        installed_files: list[Path] = []
+    def add_selected(self, selected: SelectedMembers) -> None:
+        """
+        Adds members selected from downloaded asset to app's files.
+        """
+        if selected.binary:
+            self.binary = selected.binary
+        if selected.other_bins:
+            self.other_bins = [*(self.other_bins or []), *selected.other_bins]
+        if selected.zsh_completions:
+            self.zsh_completions = [
+                *(self.zsh_completions or []),
+                *selected.zsh_completions,
+            ]
+        self.man_pages.extend(selected.man_pages)
+
+    def generate(self, binary: AppBinary, *args: str) -> GeneratedOutput:
+        """
+        Runs downloaded `binary` with `args` to generate its completions or man pages.
 
-        if not self.needs_install:
-            logger.info(
-                "Already at latest version: '%s'...",
-                self.installed_version,
-                extra={"app_name": self.name},
+        Outputs are cached by binary's hash and `args`, so the same binary never runs
+        twice with the same arguments. Argument `OUTPUT_DIR` is replaced with directory
+        for generated files.
+        """
+        cached = generated.get(binary.sha256, args)
+        if cached is not None:
+            logger.debug(
+                "generated output cache hit for %s", args, extra={"app_name": self.name}
+            )
+            return cached
+
+        with (
+            _GENERATOR_SLOTS,
+            tempfile.TemporaryDirectory() as output_dir,
+            _executable(binary) as (exe_path, pass_fds),
+        ):
+            cmd = [exe_path, *(_.replace(OUTPUT_DIR, output_dir) for _ in args)]
+            try:
+                proc = subprocess.run(  # noqa: S603
+                    cmd,
+                    shell=False,
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    stdin=subprocess.DEVNULL,
+                    pass_fds=pass_fds,
+                    timeout=GENERATOR_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired as e:
+                raise ValueError(
+                    f"`{binary.app_name} {' '.join(args)}` didn't finish in "
+                    f"{GENERATOR_TIMEOUT}s!"
+                ) from e
+
+            retv = GeneratedOutput(
+                stdout=proc.stdout,
+                files={
+                    _.relative_to(output_dir).as_posix(): _.read_bytes()
+                    for _ in Path(output_dir).rglob("*")
+                    if _.is_file()
+                },
             )
 
-        else:
-            self.download()
-
-            if not self.binary:
-                raise ValueError(f"Downloaded app {self.name} has no executable")
-
-            bin_path = self.binary.install_path(prefix=self.prefix)
-            if not bin_path.parent.exists():
-                bin_path.parent.mkdir(parents=True)
-            with bin_path.open("wb") as f:
-                f.write(self.binary.data)
-            bin_path.chmod(BIN_PERM)
-            installed_files.append(bin_path)
-
-            for bin in self.other_bins or []:
-                bin_path = bin.install_path(prefix=self.prefix)
-                if not bin_path.parent.exists():
-                    bin_path.parent.mkdir(parents=True)
-                with bin_path.open("wb") as f:
-                    f.write(self.binary.data)
-                bin_path.chmod(BIN_PERM)
-                installed_files.append(bin_path)
-
-            installed_files.extend(self._install_zsh_completions())
-            installed_files.extend(self._install_man_pages())
+        generated.add(binary.sha256, args, retv)
+        return retv
+
+    def install(self) -> list[Path]:
+        """
+        Installs app if needed, running all stages in calling thread.
+        """
+        if not self.check_for_update():
+            return []
+
+        for _ in self.stages():
+            pass
 
+        return self.commit()
+
+    def check_for_update(self) -> bool:
+        """
+        Metadata stage: does app need to be installed?
+        """
+        # Files of interrupted install can't be trusted to tell installed version
+        InstallTransaction.recover(self.prefix, self.name)
+
+        if self.needs_install:
+            return True
+
+        logger.info(
+            "Already at latest version: '%s'...",
+            self.installed_version,
+            extra={"app_name": self.name},
+        )
+        return False
+
+    def stages(self) -> Iterator[Stage]:
+        """
+        Runs `download()`, yielding stages it asks to be moved to.
+        """
+        retv = self.download()
+        if retv is not None:
+            yield from retv
+
+    def commit(self) -> list[Path]:
+        """
+        Commit stage: writes downloaded files into prefix.
+
+        All files and install receipt are replaced in single `InstallTransaction`.
+        Files that are already in prefix with identical content aren't rewritten, files
+        of previously installed version that this one doesn't have are removed.
+
+        With versioned layout (see `VersionStore`), files are written into version's
+        own directory, and then linked into prefix.
+        """
+        if not self.binary:
+            raise ValueError(f"Downloaded app {self.name} has no executable")
+
+        files = self.install_files()
+        version = str(self.latest_available_version)
+        store = VersionStore(self.prefix, self.name) if versions.is_enabled() else None
+
+        with InstallTransaction(self.prefix, self.name) as txn:
+            # Loaded only once lock is held, concurrent install could have replaced it
+            previous = InstallReceipt.load(self.prefix, self.name)
+
+            receipt_files: list[ReceiptFile] = []
+            written: list[Path] = []
+            for _ in files:
+                dest = store.path_in_version(version, _.path) if store else _.path
+                if self._is_unchanged(dest, _, previous):
+                    if dest.stat().st_mode & 0o7777 != _.mode:
+                        dest.chmod(_.mode)
+                    st = dest.stat()
+                else:
+                    st = txn.stage(dest, _.data, _.mode, _.source)
+                    written.append(_.path)
+                receipt_files.append(
+                    ReceiptFile.of(self.prefix, _.path, _.sha256, st=st)
+                )
+
+            self._remove_stale(txn, previous, files)
+
+            receipt = self.make_receipt(receipt_files)
+            if store:
+                txn.stage(store.receipt_path(version), receipt.to_json(), DOC_PERM)
+                store.stage_activation(txn, version, receipt)
+            else:
+                txn.stage(
+                    InstallReceipt.path(self.prefix, self.name),
+                    receipt.to_json(),
+                    DOC_PERM,
+                )
+            txn.commit()
+
+            if store:
+                store.prune(versions.get_keep())
+
+        manuals.update_index(
+            (_ for _ in written if _.is_relative_to(self.prefix / "share" / "man")),
+            app_name=self.name,
+        )
+
+        if len(written) < len(files):
             logger.info(
-                "Installed %s.",
-                self.latest_available_version,
+                "%d of %d files were unchanged, not rewritten.",
+                len(files) - len(written),
+                len(files),
                 extra={"app_name": self.name},
             )
+        logger.info(
+            "Installed %s.",
+            self.latest_available_version,
+            extra={"app_name": self.name},
+        )
 
-        return installed_files
-
-    def _install_zsh_completions(self):
-        retv = []
+        return [_.path for _ in files]
 
-        if self.zsh_completions:
-            for _ in self.zsh_completions:
-                zsh_path = _.install_path(prefix=self.prefix)
-                if not zsh_path.parent.exists():
-                    zsh_path.parent.mkdir(parents=True)
-                with zsh_path.open("wb") as f:
-                    f.write(_.data)
-                zsh_path.chmod(DOC_PERM)
-                retv.append(zsh_path)
+    def install_files(self) -> list[InstallFile]:
+        """
+        All files of downloaded app, as they should be written into prefix.
+        """
+        retv: list[InstallFile] = []
+
+        if self.binary:
+            retv.append(
+                InstallFile(
+                    self.binary.install_path(prefix=self.prefix),
+                    self.binary.data,
+                    BIN_PERM,
+                    self.binary.source,
+                )
+            )
+        retv.extend(
+            InstallFile(_.install_path(prefix=self.prefix), _.data, BIN_PERM, _.source)
+            for _ in self.other_bins or []
+        )
+        retv.extend(
+            InstallFile(_.install_path(prefix=self.prefix), _.data, DOC_PERM, _.source)
+            for _ in self.zsh_completions or []
+        )
+        for _ in self.man_pages:
+            path = _.install_path(prefix=self.prefix)
+            if manuals.is_installed_as_is(_):
+                retv.append(InstallFile(path, _.data, DOC_PERM, _.source))
+            else:
+                file_name, data = manuals.install_name_and_data(_)
+                retv.append(InstallFile(path.with_name(file_name), data, DOC_PERM))
 
         return retv
 
-    def _install_man_pages(self):
-        retv = []
+    def _remove_stale(
+        self,
+        txn: InstallTransaction,
+        previous: InstallReceipt | None,
+        files: list[InstallFile],
+    ) -> None:
+        # Ie. man page that was installed uncompressed before
+        installed = {_.path for _ in files}
+        for _ in previous.files if previous else []:
+            path = self.prefix / _.path
+            if path in installed or not (path.exists() or path.is_symlink()):
+                continue
+            if _.is_intact(self.prefix):
+                logger.info(
+                    "Removing %s, no longer part of app.",
+                    _.path,
+                    extra={"app_name": self.name},
+                )
+                txn.remove(path)
+            else:
+                logger.warning(
+                    "Not removing %s, it was changed since it was installed.",
+                    _.path,
+                    extra={"app_name": self.name},
+                )
 
-        for man in self.man_pages:
-            man_path = man.install_path(prefix=self.prefix)
-            if not man_path.parent.exists():
-                man_path.parent.mkdir(parents=True)
-            with man_path.open("wb") as f:
-                f.write(man.data)
-            man_path.chmod(DOC_PERM)
-            retv.append(man_path)
+    def _is_unchanged(
+        self, dest: Path, file: InstallFile, previous: InstallReceipt | None
+    ) -> bool:
+        # Existing file is hashed only if it was touched since previous install. Link
+        # into versioned layout is replaced by file when installing without it
+        try:
+            if dest.is_symlink():
+                return False
+            st = dest.stat()
+        except OSError:
+            return False
+        if st.st_size != file.size:
+            return False
+
+        entry = (
+            previous.file(file.path.relative_to(self.prefix).as_posix())
+            if previous
+            else None
+        )
+        if entry and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+            return entry.sha256 == file.sha256
 
-        return retv
+        return sha256_of(dest) == file.sha256
+
+    def make_receipt(self, files: list[ReceiptFile]) -> InstallReceipt:
+        """
+        Install receipt of downloaded version, consisting of `files`.
+        """
+        bin_path = self.binary.install_path(prefix=self.prefix)  # type: ignore
+        return InstallReceipt(
+            app_name=self.name,
+            version=str(self.latest_available_version),
+            binary=bin_path.relative_to(self.prefix).as_posix(),
+            files=files,
+        )
 
 
 class GitHubApp(App):
+    # How to find out installed version by running installed binary (only needed if
+    # there is no install receipt for it). Defaults to last word of `<name> --version`
+    version_probe: ClassVar[VersionProbe | None] = None
+
     def __init__(
         self,
         *,
@@ -248,6 +401,13 @@ class GitHubApp(App):
         )
         self.client = GithubApiClient(owner=gh_owner, repo=gh_repo)
         self._installed_version: Version | None = None
+        self._installed_version_checked = False
+
+    def at_prefix(self, prefix: str | Path) -> Self:
+        retv = super().at_prefix(prefix)
+        retv._installed_version = None
+        retv._installed_version_checked = False
+        return retv
 
     @property
     def latest_available_version(self):
@@ -255,38 +415,118 @@ class GitHubApp(App):
 
     @property
     def installed_version(self) -> Version | None:
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -1)
+        if not self._installed_version_checked:
+            self._installed_version = (
+                self._receipt_version() or self.probe_installed_version()
+            )
+            self._installed_version_checked = True
         return self._installed_version
 
-    def get_installed_version(
-        self, exe_name: str, version_str_idx: int = -1
-    ) -> Version | None:
-        retv = None
+    def _receipt_version(self) -> Version | None:
+        receipt = InstallReceipt.load(self.prefix, self.name)
+        if not receipt:
+            return None
 
-        try:
-            bin_path = self.prefix / "bin" / exe_name
-            if bin_path.exists():
-                data = subprocess.check_output(  # noqa: S603
-                    [bin_path.as_posix(), "--version"], shell=False, encoding="utf-8"
-                )
+        if not receipt.binary_is_intact(self.prefix):
+            logger.info(
+                "%s was changed since it was installed, checking its version.",
+                receipt.binary,
+                extra={"app_name": self.name},
+            )
+            return None
 
-                with contextlib.suppress(Exception):
-                    _ = data.split()
-                    retv = parse_version(_[version_str_idx])
+        retv = receipt.parsed_version
+        logger.debug(
+            "Found installed version %s in install receipt",
+            retv,
+            extra={"app_name": self.name},
+        )
+        return retv  # type: ignore
 
-                if not retv:
-                    _ = data.replace("-", " ").split()
-                    retv = parse_version(_[version_str_idx])
+    @property
+    def _version_probe(self) -> VersionProbe:
+        return self.version_probe or VersionProbe(self.name)
 
-            if retv:
-                logger.debug(
-                    "Found installed version %s", retv, extra={"app_name": self.name}
-                )
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to fetch local app version for {self.name}!"
-            ) from e
+    def probe_installed_version(self) -> Version | None:
+        """
+        Runs installed binary to find out its version.
 
+        Used only if app wasn't installed by us or if it was changed since. In planning
+        mode nothing is written into probe cache.
+        """
+        return probes.probe(
+            self.prefix,
+            self._version_probe,
+            app_name=self.name,
+            save=not self.client.planning,
+        )
+
+    def make_receipt(self, files: list[ReceiptFile]) -> InstallReceipt:
+        retv = super().make_receipt(files)
+        retv.release_id = self.client.latest_release.gh_id
+        retv.assets = dict(self.client.used_assets)
         return retv
+
+
+@contextmanager
+def _executable(binary: AppBinary) -> Iterator[tuple[str, tuple[int, ...]]]:
+    """
+    Path from which downloaded `binary` can be executed, and file descriptors child
+    process needs to inherit for that path to work:
+
+    - binary's own file in extracted artifacts cache, if it has one that can be run
+      as is (see `_is_executable()`)
+    - otherwise anonymous in-memory file (`memfd_create`, Linux only), executed as
+      `/proc/self/fd/<fd>`
+    - otherwise temp file
+    """
+    source = binary.source
+    if source is not None and _is_executable(source, binary.sha256):
+        yield source.path.as_posix(), ()
+        return
+
+    if hasattr(os, "memfd_create"):
+        try:
+            # Without `MFD_CLOEXEC`, so that `/proc/self/fd/<fd>` also works for
+            # interpreters of `#!` scripts, which open it after exec
+            fd = os.memfd_create(binary.app_name, 0)
+        except OSError as e:
+            logger.debug("can't create memfd for %s: %s", binary.app_name, e)
+        else:
+            try:
+                with os.fdopen(os.dup(fd), "wb") as f:
+                    f.write(binary.content())
+                yield f"/proc/self/fd/{fd}", (fd,)
+            finally:
+                os.close(fd)
+            return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        exe_path = Path(tmp_dir) / f"{binary.app_name}_tmp"
+        with exe_path.open("wb") as _:
+            _.write(binary.content())
+        exe_path.chmod(BIN_PERM)
+        yield exe_path.as_posix(), ()
+
+
+def _is_executable(source: StoredFile, sha256: str) -> bool:
+    """
+    Cached file is executed only if cache stored it as executable, only its owner (which
+    is us) can change it, and its content is still what `sha256` says. Cache entries
+    are never chmod-ed here, others are written into memory instead.
+    """
+    if not source.is_intact():
+        return False
+    try:
+        st = source.path.stat()
+        if (
+            st.st_uid != os.geteuid()
+            or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+            or not st.st_mode & stat.S_IXUSR
+            # Also false on filesystems mounted `noexec`
+            or not os.access(source.path, os.X_OK)
+        ):
+            return False
+        return sha256_of(source.path) == sha256
+    except OSError:
+        return False
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import hashlib
+import stat
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+
+# Default install prefix for everything.
+#
+# Following `make` and many other packaging tools traditions, it should be `/usr/local`.
+#
+# PREFIX="/usr"       - Stuff built by and installed from Linux distribution packages
+# PREFIX="/usr/local" - Stuff built by and installed by local admins (ie. `make install`
+#                       and similar commands). When system package is updated, it
+#                       doesn't overwrite locally built alternative
+# PREFIX="/opt"       - Stuff installed from external sources and maybe not even
+#                       packaged by hosting distribution standards (ie. doesn't keep
+#                       config in /etc, variable data in /var, etc...)
+DEFAULT_PREFIX = Path("/usr/local")
+
+BIN_PERM: int = (
+    stat.S_IRUSR  # Owner has read permission.
+    | stat.S_IWUSR  # Owner has write permission.
+    | stat.S_IXUSR  # Owner has execute permission.
+    | stat.S_IRGRP  # Group has read permission.
+    | stat.S_IXGRP  # Group has execute permission.
+    | stat.S_IXOTH  # Others have execute permission.
+    | stat.S_IROTH  # Others have read permission.
+)
+
+DOC_PERM: int = (
+    stat.S_IRUSR  # Owner has read permission.
+    | stat.S_IWUSR  # Owner has write permission.
+    | stat.S_IRGRP  # Group has read permission.
+    | stat.S_IROTH  # Others have read permission.
+)
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    """
+    Member already written into extracted artifacts cache, with what the cache recorded
+    about it when writing it.
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    def is_intact(self) -> bool:
+        """
+        Whether file is still the one cache wrote (same size and mtime), so it can be
+        used without reading it.
+        """
+        try:
+            st = self.path.stat()
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def read(self) -> bytes:
+        try:
+            data = self.path.read_bytes()
+        except OSError as e:
+            raise ValueError(f"Can't read cached {self.path}: {e}!") from e
+        if hashlib.sha256(data).hexdigest() != self.sha256:
+            raise ValueError(f"Cached {self.path} is corrupted!")
+        return data
+
+
+class _Content:
+    """
+    File content, given either as `data`, or only as `source` in extracted artifacts
+    cache. In the latter case it is read from there only if something really needs it
+    (ie. installing it as is doesn't).
+    """
+
+    data: bytes | None
+    source: StoredFile | None
+
+    def content(self) -> bytes:
+        if self.data is None:
+            self.data = self.source.read() if self.source else b""
+        return self.data
+
+    @property
+    def size(self) -> int:
+        if self.source is not None:
+            return self.source.size
+        return len(self.content())
+
+    @cached_property
+    def sha256(self) -> str:
+        if self.source is not None:
+            return self.source.sha256
+        return hashlib.sha256(self.content()).hexdigest()
+
+
+@dataclass
+class ManPage(_Content):
+    section: int
+    file_name: str
+    data: bytes | None = field(default=None, repr=False)
+    # The same content, already on disk (in extracted artifacts cache)
+    source: StoredFile | None = field(default=None, repr=False)
+
+    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
+        return prefix / "share" / "man" / f"man{self.section}" / self.file_name
+
+
+@dataclass
+class ZshCompletion(_Content):
+    app_name: str
+    data: bytes | None = field(default=None, repr=False)
+    source: StoredFile | None = field(default=None, repr=False)
+    _file_name: str = field(init=False)
+
+    def __post_init__(self):
+        self._file_name = f"_{self.app_name}"
+
+    @property
+    def file_name(self) -> str:
+        return self._file_name
+
+    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
+        # ZSH manual says vendor supplied functions should be in:
+        #
+        #     $PREFIX/share/zsh/site-functions
+        #
+        # Various Linux distributions additionally use:
+        #
+        #     $PREFIX/share/zsh/vendor-functions
+        #     $PREFIX/share/zsh/vendor-completions
+        #
+        # But then don't necessarily include these in `$fpath`:`
+        #
+        #     /usr/local/share/zsh/vendor-functions
+        #     /usr/local/share/zsh/vendor-completions
+        #
+        # This is, of course, because nothing from official Linux distribution repos
+        # gets installed in `$PREFIX=/ur/local`.
+        #
+        # What IS included in `$fpath` (probably because ZSH does it regardless of Linux
+        # distro):
+        #
+        #     `/usr/local/share/zsh/site-functions`
+        #
+        # Since this script is intended to be used for `/usr/local` installs anyway, we
+        # can safely use that and don't care about distro speciffic things
+        return self.site_functions_dir(prefix) / self.file_name
+
+    @classmethod
+    def site_functions_dir(cls, prefix: Path = DEFAULT_PREFIX) -> Path:
+        return prefix / "share" / "zsh" / "site-functions"
+
+
+@dataclass
+class AppBinary(_Content):
+    app_name: str
+    data: bytes | None = field(default=None, repr=False)
+    source: StoredFile | None = field(default=None, repr=False)
+
+    def install_path(self, prefix: Path = DEFAULT_PREFIX) -> Path:
+        return prefix / "bin" / self.app_name
+
+
+@dataclass
+class InstallFile(_Content):
+    """
+    Single file, as it should be written into prefix.
+    """
+
+    path: Path
+    data: bytes | None = field(repr=False)
+    mode: int
+    source: StoredFile | None = field(default=None, repr=False)
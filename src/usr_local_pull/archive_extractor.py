@@ -1,96 +1,464 @@
-import gzip
+from __future__ import annotations
+
+import fnmatch
+import re
 import tarfile
 import zipfile
-from io import BytesIO
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from io import BytesIO, RawIOBase
 from pathlib import Path
+from typing import TYPE_CHECKING, Final
 
 import ar
 
+from .app_files import AppBinary, ManPage, ZshCompletion
+from .decompressors import decompress, open_decompressed
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Iterator
+    from typing import BinaryIO
+
+    from .app_files import StoredFile
+    from .gh_client import GhExtractedArtifacts
+
+
+class MemberRole(Enum):
+    BINARY = "binary"
+    OTHER_BIN = "other_bin"
+    ZSH_COMPLETION = "zsh_completion"
+    MAN_PAGE = "man_page"
+
+
+@dataclass(frozen=True)
+class MemberSpec:
+    """
+    Declarative description of archive member(s) app needs.
+
+    `pattern` is either glob (`str`) or regex (`re.Pattern`). It is matched against
+    member's file name, or against member's whole path if pattern contains `/`.
+
+    `name` is install name of binary or completion. Man pages are installed under
+    their own file name, into section inferred from file name (`eza_colors.5` ->
+    `man5`) unless `section` is given.
+    """
+
+    role: MemberRole
+    pattern: str | re.Pattern
+    name: str | None = None
+    section: int | None = None
+
+    @classmethod
+    def binary(cls, name: str, pattern: str | re.Pattern | None = None) -> MemberSpec:
+        return cls(MemberRole.BINARY, pattern or name, name=name)
+
+    @classmethod
+    def other_bin(
+        cls, name: str, pattern: str | re.Pattern | None = None
+    ) -> MemberSpec:
+        return cls(MemberRole.OTHER_BIN, pattern or name, name=name)
+
+    @classmethod
+    def zsh_completion(
+        cls, app_name: str, pattern: str | re.Pattern | None = None
+    ) -> MemberSpec:
+        return cls(MemberRole.ZSH_COMPLETION, pattern or f"_{app_name}", name=app_name)
+
+    @classmethod
+    def man_pages(
+        cls, pattern: str | re.Pattern, section: int | None = None
+    ) -> MemberSpec:
+        return cls(MemberRole.MAN_PAGE, pattern, section=section)
+
+    @property
+    def many(self) -> bool:
+        return self.role == MemberRole.MAN_PAGE
+
+    def matches(self, member: str) -> bool:
+        if isinstance(self.pattern, re.Pattern):
+            target = member if "/" in self.pattern.pattern else Path(member).name
+            return self.pattern.fullmatch(target) is not None
+
+        target = member if "/" in self.pattern else Path(member).name
+        return fnmatch.fnmatchcase(target, self.pattern)
+
+    def __str__(self) -> str:
+        pattern = (
+            self.pattern.pattern
+            if isinstance(self.pattern, re.Pattern)
+            else self.pattern
+        )
+        return f"'{pattern}'"
+
+
+@dataclass
+class SelectedMembers:
+    binary: AppBinary | None = None
+    other_bins: list[AppBinary] = field(default_factory=list)
+    zsh_completions: list[ZshCompletion] = field(default_factory=list)
+    man_pages: list[ManPage] = field(default_factory=list)
+
+
+@dataclass
+class PendingSelection:
+    """
+    Members of already fetched archive, to be extracted later.
+    """
+
+    extractor: ArchiveExtractor
+    specs: tuple[MemberSpec, ...]
+
+    def select(self) -> SelectedMembers:
+        return self.extractor.select(*self.specs)
+
 
 class ArchiveExtractor:
-    def __init__(self, archive: str | Path, data: bytes) -> None:
+    # Separates member of outer archive from member path in inner (nested) archive. ie.
+    #
+    #     extractor.extract("data.tar.*!/usr/bin/rg")
+    #
+    # Part before separator may be glob pattern, matched against outer archive members.
+    NESTED_SEPARATOR: Final[str] = "!/"
+
+    _COMPRESSION_SUFFIXES: Final[frozenset[str]] = frozenset(
+        {".gz", ".bz2", ".xz", ".lzma", ".zst"}
+    )
+
+    def __init__(
+        self,
+        archive: str | Path,
+        data: bytes | None = None,
+        *,
+        fileobj: BinaryIO | None = None,
+        loader: Callable[[], bytes | BinaryIO] | None = None,
+        artifacts: GhExtractedArtifacts | None = None,
+    ) -> None:
+        """
+        Archive content is given either as `data`, as `fileobj` or as `loader` that
+        will be called to fetch `data` (or `fileobj`) when (and if) it is first needed.
+
+        If `artifacts` is given, member list and extracted members are read from it
+        when possible and stored in it otherwise.
+        """
+        if sum(_ is not None for _ in (data, fileobj, loader)) != 1:
+            raise ValueError(
+                "Exactly one of `data`, `fileobj` or `loader` is required!"
+            )
+
         self.archive = Path(archive)
-        self.file = BytesIO(data)
+        self._file: BinaryIO | None = BytesIO(data) if data is not None else fileobj
+        self._loader = loader
+        self._artifacts = artifacts
         self._members: list[str] | None = None
 
     @property
-    def members(self) -> list[str]:  # noqa: C901
+    def file(self) -> BinaryIO:
+        if self._file is None:
+            loaded = self._loader()  # type: ignore
+            self._file = BytesIO(loaded) if isinstance(loaded, bytes) else loaded
+        return self._file
+
+    @property
+    def members(self) -> list[str]:
         if self._members is not None:
             return self._members
 
-        if self._is_tar:
-            self._members = []
-            self.file.seek(0)
-            with tarfile.open(
-                name=self.archive.name, fileobj=self.file, mode=self._tar_read_mode  # type: ignore
-            ) as tar:  # type: ignore
-                for member in tar.getmembers():
-                    if member.isfile():
-                        self._members.append(member.path)
+        if self._artifacts:
+            self._members = self._artifacts.members
+            if self._members is not None:
+                return self._members
 
-        elif self._is_zip:
-            self._members = []
-            self.file.seek(0)
-            with zipfile.ZipFile(file=self.file) as zipf:
-                for member in zipf.infolist():
-                    if not member.is_dir():
-                        self._members.append(member.filename)
+        self._set_members(self._scan(lambda _: False)[0])
 
-        elif self._is_ar:
-            self._members = []
-            self.file.seek(0)
-            archive = ar.Archive(self.file)
-            for entry in archive:
-                self._members.append(entry.name)
+        return self._members  # type: ignore
 
-        elif self._is_gzip:
-            self._members = [Path(self.archive).name[:-3]]
+    def _set_members(self, members: list[str]) -> None:
+        self._members = members
+        if self._artifacts:
+            self._artifacts.members = members
+
+    def nested(self, member: str) -> ArchiveExtractor:
+        """
+        Extractor for archive that is itself member of this archive.
 
+        `member` may be glob pattern, in which case it must match exactly one member.
+
+        Members of `.deb` (ar) archives are streamed directly from outer archive into
+        inner archive decoder, without extracting them first.
+        """
+        name = self._resolve(member)
+
+        if self._is_ar:
+            loader = lambda: self._ar_member_stream(name)  # noqa: E731
         else:
-            raise ValueError(f"Unsupported asset type {self.archive}!")
+            loader = lambda: self.extract(name)  # noqa: E731
+
+        return ArchiveExtractor(
+            name,
+            loader=loader,
+            artifacts=self._artifacts.nested(name) if self._artifacts else None,
+        )
+
+    def extract(self, member: str) -> bytes:
+        if self.NESTED_SEPARATOR in member:
+            outer, inner = member.split(self.NESTED_SEPARATOR, 1)
+            return self.nested(outer).extract(inner)
 
-        return self._members
+        if self._artifacts:
+            retv = self._artifacts.get(member)
+            if retv is not None:
+                return retv
 
-    def extract(self, member: str) -> bytes:  # noqa: C901
-        retv: bytes | None = None
+        retv = self._scan(lambda _: _ == member, stop_after=1)[1].get(member)
+        if retv is None:
+            raise ValueError(f"No such file {member} in {self.archive.name}!")
+
+        self._remember({member: retv})
+
+        return retv
+
+    def select(self, *specs: MemberSpec) -> SelectedMembers:
+        """
+        Finds and extracts all members described by `specs`.
+
+        Each spec except man pages must match exactly one member (first one wins if
+        there are more). Man page specs must match at least one member.
+
+        Uncached archive is read only once: member index is built in the same pass in
+        which matched members are extracted.
+        """
+        members = self._members
+        if members is None and self._artifacts:
+            members = self._members = self._artifacts.members
+
+        data: dict[str, bytes] = {}
+        stored: dict[str, StoredFile] = {}
+        if members is None:
+            members, data = self._scan(lambda m: any(_.matches(m) for _ in specs))
+            self._set_members(members)
+
+        errs: list[str] = []
+        resolved: list[tuple[MemberSpec, list[str]]] = []
+        for spec in specs:
+            found = [_ for _ in members if spec.matches(_)]
+            if not found:
+                errs.append(f"Can't find {spec} in {self.archive.name}!")
+            resolved.append((spec, found if spec.many else found[:1]))
+
+        if errs:
+            raise ValueError(f"Asset extraction failed: {errs}!")
+
+        executables = {
+            _
+            for spec, found in resolved
+            if spec.role in (MemberRole.BINARY, MemberRole.OTHER_BIN)
+            for _ in found
+        }
+        stored.update(self._remember(data, executables))
+
+        # Cached members aren't even read, they are installed from the cache
+        wanted = {_ for _, found in resolved for _ in found} - data.keys()
+        if self._artifacts:
+            for member in list(wanted):
+                cached = self._artifacts.stored(member)
+                if cached is not None:
+                    stored[member] = cached
+                    wanted.discard(member)
+        if wanted:
+            extracted = self._scan(lambda _: _ in wanted, stop_after=len(wanted))[1]
+            stored.update(self._remember(extracted, executables))
+            data.update(extracted)
+
+        return self._selected(resolved, data, stored)
+
+    def prefetch(self, *specs: MemberSpec) -> PendingSelection:
+        """
+        Fetches archive content (ie. downloads it), unless all members described by
+        `specs` were already extracted from it before.
+
+        This separates network I/O from decompression: `select()` of returned
+        selection then works with already fetched data.
+        """
+        if not self._is_cached(specs):
+            _ = self.file
+
+        return PendingSelection(self, specs)
+
+    def _is_cached(self, specs: tuple[MemberSpec, ...]) -> bool:
+        if not self._artifacts:
+            return False
+
+        members = self._members
+        if members is None:
+            members = self._members = self._artifacts.members
+        if members is None:
+            return False
+
+        for spec in specs:
+            found = [_ for _ in members if spec.matches(_)]
+            if not found:
+                return False
+            if not all(
+                self._artifacts.stored(_) is not None
+                for _ in (found if spec.many else found[:1])
+            ):
+                return False
+
+        return True
+
+    def _remember(
+        self, extracted: dict[str, bytes], executables: Collection[str] = ()
+    ) -> dict[str, StoredFile]:
+        if not self._artifacts:
+            return {}
+        return {
+            member: self._artifacts.add(member, data, executable=member in executables)
+            for member, data in extracted.items()
+        }
+
+    def _selected(
+        self,
+        resolved: list[tuple[MemberSpec, list[str]]],
+        data: dict[str, bytes],
+        stored: dict[str, StoredFile],
+    ) -> SelectedMembers:
+        retv = SelectedMembers()
+
+        for spec, found in resolved:
+            for member in found:
+                content = data.get(member)
+                source = stored.get(member)
+                if spec.role == MemberRole.BINARY:
+                    retv.binary = AppBinary(spec.name, content, source)  # type: ignore
+                elif spec.role == MemberRole.OTHER_BIN:
+                    retv.other_bins.append(AppBinary(spec.name, content, source))  # type: ignore
+                elif spec.role == MemberRole.ZSH_COMPLETION:
+                    retv.zsh_completions.append(
+                        ZshCompletion(spec.name, content, source)  # type: ignore
+                    )
+                elif not any(_.file_name == Path(member).name for _ in retv.man_pages):
+                    retv.man_pages.append(
+                        ManPage(
+                            section=spec.section or self._man_section(member),
+                            file_name=Path(member).name,
+                            data=content,
+                            source=source,
+                        )
+                    )
+
+        return retv
+
+    def _scan(  # noqa: C901, PLR0912
+        self, wanted: Callable[[str], bool], *, stop_after: int | None = None
+    ) -> tuple[list[str], dict[str, bytes]]:
+        """
+        Single pass over archive.
+
+        Returns all file members and data of those for which `wanted(member)` is true.
+        If `stop_after` is given, reading stops once that many members were extracted
+        (and returned member list is then incomplete).
+        """
+        members: list[str] = []
+        data: dict[str, bytes] = {}
 
         if self._is_tar:
-            self._members = []
-            self.file.seek(0)
-            with tarfile.open(
-                name=self.archive.name, fileobj=self.file, mode=self._tar_read_mode  # type: ignore
-            ) as tar:  # type: ignore
-                for member_info in tar.getmembers():
-                    if member_info.isfile() and member_info.path == member:
-                        retv = tar.extractfile(member_info).read()
+            with self._open_tar() as tar:
+                for member_info in tar:
+                    if not member_info.isfile():
+                        continue
+                    members.append(member_info.path)
+                    if wanted(member_info.path):
+                        data[member_info.path] = tar.extractfile(member_info).read()  # type: ignore
+                        if stop_after and len(data) >= stop_after:
+                            break
 
         elif self._is_zip:
             self.file.seek(0)
             with zipfile.ZipFile(file=self.file) as zip_f:
                 for member_info in zip_f.infolist():
-                    if not member_info.is_dir() and member_info.filename == member:
+                    if member_info.is_dir():
+                        continue
+                    members.append(member_info.filename)
+                    if wanted(member_info.filename):
                         with zip_f.open(member_info) as member_f:
-                            retv = member_f.read()
+                            data[member_info.filename] = member_f.read()
+
         elif self._is_ar:
             self.file.seek(0)
             archive = ar.Archive(self.file)
             for entry in archive:
-                retv = archive.open(entry, "rb").read()
+                members.append(entry.name)
+                if wanted(entry.name):
+                    data[entry.name] = _ArMember(archive.open(entry, "rb")).read()
 
         elif self._is_gzip:
-            self.file.seek(0)
-            with gzip.GzipFile(fileobj=self.file, mode="rb") as gzip_f:
-                retv = gzip_f.read()
+            members.append(self.archive.name[:-3])
+            if wanted(members[0]):
+                self.file.seek(0)
+                data[members[0]] = decompress(self.file.read(), "gz")
 
-        if retv is None:
-            raise ValueError("No such file!")
+        else:
+            raise ValueError(f"Unsupported asset type {self.archive}!")
 
-        return retv
+        return members, data
+
+    def _resolve(self, pattern: str) -> str:
+        if pattern in self.members:
+            return pattern
+
+        found = fnmatch.filter(self.members, pattern)
+        if len(found) != 1:
+            raise ValueError(
+                f"Expected exactly one member matching {pattern} in "
+                f"{self.archive.name}, found {found}!"
+            )
+
+        return found[0]
+
+    def _ar_member_stream(self, name: str) -> BinaryIO:
+        """
+        Read-only window over single member, reading directly from outer archive file
+        object, so nothing gets copied before inner archive decoder asks for it.
+        """
+        self.file.seek(0)
+        return _ArMember(ar.Archive(self.file).open(name, "rb"))  # type: ignore
+
+    @classmethod
+    def _man_section(cls, member: str) -> int:
+        # eza.1, eza_colors.5, rg.1.gz, perlfunc.3pm
+        for suffix in reversed(Path(member).suffixes):
+            if suffix.lower() in cls._COMPRESSION_SUFFIXES:
+                continue
+            match = re.match(r"\.(\d)", suffix)
+            if match:
+                return int(match.group(1))
+            break
+
+        raise ValueError(f"Can't infer man section from {member}!")
+
+    @contextmanager
+    def _open_tar(self) -> Iterator[tarfile.TarFile]:
+        # Tar is always read as a stream, in single forward pass, so that decompression
+        # can be piped through external tool and reading can stop as soon as wanted
+        # member was found.
+        self.file.seek(0)
+        with (
+            open_decompressed(self.file, self._compression) as stream,
+            tarfile.open(fileobj=stream, mode="r|") as tar,
+        ):
+            yield tar
 
     @property
-    def _tar_read_mode(self) -> str | None:
+    def _compression(self) -> str | None:
         ext = self.archive.suffixes[-1].lower()
-        return {".gz": "r:gz", ".bz2": "r:bz2", ".xz": "r:xz", ".tar": "r:"}.get(ext)
+        return {
+            ".gz": "gz",
+            ".bz2": "bz2",
+            ".xz": "xz",
+            ".lzma": "xz",
+            ".zst": "zst",
+        }.get(ext)
 
     @property
     def _is_tar(self) -> bool:
@@ -100,6 +468,8 @@ class ArchiveExtractor:
                 ".tar.gz",
                 ".tar.bz2",
                 ".tar.xz",
+                ".tar.lzma",
+                ".tar.zst",
                 ".tar",
             )
         )
@@ -116,3 +486,33 @@ class ArchiveExtractor:
     @property
     def _is_gzip(self) -> bool:
         return not self._is_tar and self.archive.name.lower().endswith(".gz")
+
+
+class _ArMember(RawIOBase):
+    """
+    Member of `ar` archive as regular binary stream. Stream returned by
+    `ar.Archive.open()` doesn't clamp `read(-1)` to member size (it reads till the end
+    of the whole archive) and has no `readinto()`.
+    """
+
+    def __init__(self, substream: ar.substream.Substream) -> None:
+        super().__init__()
+        self._substream = substream
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._substream.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._substream.tell()
+
+    def readinto(self, b) -> int:
+        remaining = self._substream.size - self._substream.tell()
+        data = self._substream.read(max(0, min(len(b), remaining)))
+        memoryview(b).cast("B")[: len(data)] = data
+        return len(data)
@@ -0,0 +1,467 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar, Final
+
+from .app import App
+from .app_files import AppBinary, InstallFile
+from .decompressors import open_decompressed
+from .pipeline import InstallPipeline
+from .receipts import InstallReceipt
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+    from datetime import date
+
+    from packaging.version import Version
+
+    from .pipeline import Stage
+    from .receipts import ReceiptFile
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME: Final[str] = "usr-local-pull-bundle.tar.gz"
+
+# Files are stored in bundle as "files/<path relative to prefix>"
+_FILES_DIR: Final[str] = "files"
+
+
+@dataclass
+class BundleFile:
+    # Relative to prefix
+    path: str
+    mode: int
+    size: int
+    sha256: str
+
+
+@dataclass
+class AppState:
+    """
+    What is (or should be) installed of single app.
+    """
+
+    version: str
+    # Path relative to prefix -> sha256
+    files: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, receipt: InstallReceipt) -> AppState:
+        return cls(
+            version=receipt.version, files={_.path: _.sha256 for _ in receipt.files}
+        )
+
+
+@dataclass
+class BundleEntry:
+    """
+    Single app in bundle, with everything that goes into its install receipt.
+    """
+
+    app_name: str
+    version: str
+    # Relative to prefix
+    binary: str
+    release_id: int | None = None
+    assets: dict[str, str | None] = field(default_factory=dict)
+    files: list[BundleFile] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, app: App, files: list[InstallFile]) -> BundleEntry:
+        receipt = app.make_receipt([])
+        return cls(
+            app_name=receipt.app_name,
+            version=receipt.version,
+            binary=receipt.binary,
+            release_id=receipt.release_id,
+            assets=receipt.assets,
+            files=[
+                BundleFile(
+                    path=_.path.relative_to(app.prefix).as_posix(),
+                    mode=_.mode,
+                    size=_.size,
+                    sha256=_.sha256,
+                )
+                for _ in files
+            ],
+        )
+
+    def receipt(self, files: list[ReceiptFile]) -> InstallReceipt:
+        return InstallReceipt(
+            app_name=self.app_name,
+            version=self.version,
+            binary=self.binary,
+            release_id=self.release_id,
+            assets=dict(self.assets),
+            files=files,
+        )
+
+    @property
+    def state(self) -> AppState:
+        return AppState(
+            version=self.version, files={_.path: _.sha256 for _ in self.files}
+        )
+
+
+@dataclass
+class BundleIndex:
+    """
+    First member of bundle. Files of each app follow it, in the same order as in
+    index, so that bundle can be installed in single pass over compressed stream.
+
+    Delta bundle (see `delta()`) has `base` state of all apps it was made against, and
+    only apps and files that changed since.
+    """
+
+    apps: list[BundleEntry] = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+    # App name -> its state that delta bundle applies to
+    base: dict[str, AppState] | None = None
+
+    FORMAT: ClassVar[int] = 1
+    NAME: ClassVar[str] = "index.json"
+
+    def to_json(self) -> bytes:
+        return json.dumps({"format": self.FORMAT, **asdict(self)}, indent=2).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> BundleIndex:
+        try:
+            obj = json.loads(data)
+        except ValueError as e:
+            raise ValueError(f"Can't read bundle index: {e}!") from e
+        if obj.get("format") != cls.FORMAT:
+            raise ValueError(f"Unsupported bundle format {obj.get('format')!r}!")
+
+        try:
+            return cls(
+                apps=[
+                    BundleEntry(**{**_, "files": [BundleFile(**f) for f in _["files"]]})
+                    for _ in obj["apps"]
+                ],
+                created_at=obj["created_at"],
+                base=(
+                    None
+                    if obj.get("base") is None
+                    else {k: AppState(**v) for k, v in obj["base"].items()}
+                ),
+            )
+        except Exception as e:
+            raise ValueError(f"Invalid bundle index: {e}!") from e
+
+    @property
+    def state(self) -> dict[str, AppState]:
+        return {_.app_name: _.state for _ in self.apps}
+
+    def has_data(self, entry: BundleEntry, file: BundleFile) -> bool:
+        """
+        Is content of `entry`'s `file` in bundle? Delta bundle has only files that
+        aren't in its base already.
+        """
+        if self.base is None or entry.app_name not in self.base:
+            return True
+        return self.base[entry.app_name].files.get(file.path) != file.sha256
+
+
+class BundledApp(App):
+    """
+    App whose files were prepared elsewhere (by `export()`) and are read from bundle
+    instead of being downloaded.
+    """
+
+    def __init__(
+        self, entry: BundleEntry, *, prefix: str | Path, base: AppState | None = None
+    ) -> None:
+        super().__init__(name=entry.app_name, prefix=prefix)
+        self.entry = entry
+        # Already verified to be installed, files that delta bundle doesn't have are
+        # taken from prefix
+        self.base = base
+        # Path relative to prefix -> content, as read from bundle
+        self.data: dict[str, bytes] = {}
+        # `App.commit()` needs one, its data is in `self.data` with all the others
+        self.binary = AppBinary(Path(entry.binary).name)
+
+    @property
+    def installed_version(self) -> Version | None:
+        receipt = InstallReceipt.load(self.prefix, self.name)
+        if not receipt or not receipt.binary_is_intact(self.prefix):
+            return None
+        return receipt.parsed_version  # type: ignore
+
+    @property
+    def latest_available_version(self) -> Version | date:
+        return self.make_receipt([]).parsed_version
+
+    def download(self) -> None:
+        """
+        Nothing to download, files come from bundle.
+        """
+
+    def install_files(self) -> list[InstallFile]:
+        retv = []
+        for _ in self.entry.files:
+            data = self.data.get(_.path)
+            if data is None and self.base and self.base.files.get(_.path) == _.sha256:
+                data = (self.prefix / _.path).read_bytes()
+            file = InstallFile(self.prefix / _.path, data or b"", _.mode)
+            if data is None or file.sha256 != _.sha256:
+                raise ValueError(f"{_.path} is missing or corrupted in bundle!")
+            retv.append(file)
+        return retv
+
+    def make_receipt(self, files: list[ReceiptFile]) -> InstallReceipt:
+        return self.entry.receipt(files)
+
+
+def prepare(
+    apps: Sequence[App], workers: dict[Stage, int] | None = None
+) -> list[tuple[BundleEntry, list[InstallFile]]]:
+    """
+    Downloads and prepares all `apps` (regardless of what is installed), returning
+    their files as they would be installed instead of installing them.
+    """
+    prepared: dict[str, tuple[BundleEntry, list[InstallFile]]] = {}
+    lock = threading.Lock()
+
+    def collect(app: App) -> list[Path]:
+        files = app.install_files()
+        with lock:
+            prepared[app.name] = (BundleEntry.of(app, files), files)
+        logger.info(
+            "Prepared %s.", app.latest_available_version, extra={"app_name": app.name}
+        )
+        return [_.path for _ in files]
+
+    InstallPipeline(apps, workers, check=_prepare_any, commit=collect).run()
+
+    return [prepared[_.name] for _ in apps]
+
+
+def export(
+    apps: Sequence[App], path: Path, workers: dict[Stage, int] | None = None
+) -> BundleIndex:
+    """
+    Writes files of all `apps` (see `prepare()`) into bundle at `path`.
+    """
+    prepared = prepare(apps, workers)
+    retv = BundleIndex(apps=[entry for entry, _ in prepared])
+    _write(
+        path,
+        retv,
+        (
+            (f"{_FILES_DIR}/{bundle_file.path}", file.content(), file.mode)
+            for entry, files in prepared
+            for bundle_file, file in zip(entry.files, files, strict=True)
+        ),
+    )
+    return retv
+
+
+def delta(base: dict[str, AppState], target: Path, path: Path) -> BundleIndex:
+    """
+    Writes bundle at `path` that turns `base` state (see `state_of()`) into full bundle
+    at `target`: with apps whose version or files differ and only their files whose
+    content differs. Files of `base` that `target` doesn't have are removed on import,
+    like any other files that are no longer part of app.
+
+    Apps that are in `base` but not in `target` are left alone.
+    """
+    with _open(target) as (tar, members, index):
+        if index.base is not None:
+            raise ValueError(f"{target} is delta bundle, expected full one!")
+
+        retv = BundleIndex(
+            apps=[_ for _ in index.apps if base.get(_.app_name) != _.state],
+            base=base,
+        )
+        wanted = {
+            f"{_FILES_DIR}/{file.path}"
+            for entry in retv.apps
+            for file in entry.files
+            if retv.has_data(entry, file)
+        }
+        _write(
+            path,
+            retv,
+            (
+                (member.name, _read(tar, member, member.name), member.mode)
+                for member in members
+                if member.name in wanted
+            ),
+        )
+
+    return retv
+
+
+def state_of(path: Path) -> dict[str, AppState]:
+    """
+    Install state of prefix at `path` (from install receipts of apps in it), or one
+    that full bundle at `path` installs (from its index).
+    """
+    if path.is_dir():
+        receipts = (
+            InstallReceipt.load_file(_, _.stem)
+            for _ in sorted((path / InstallReceipt.DIR).glob("*.json"))
+        )
+        return {_.app_name: AppState.of(_) for _ in receipts if _ is not None}
+
+    with _open(path) as (_, _members, index):
+        if index.base is not None:
+            raise ValueError(f"{path} is delta bundle, expected full one!")
+        return index.state
+
+
+def _write(
+    path: Path, index: BundleIndex, files: Iterable[tuple[str, bytes, int]]
+) -> None:
+    mtime = int(datetime.fromisoformat(index.created_at).timestamp())
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with (
+            os.fdopen(fd, "wb") as f,
+            tarfile.open(fileobj=f, mode="w:gz", compresslevel=6) as tar,
+        ):
+            _add(tar, BundleIndex.NAME, index.to_json(), 0o644, mtime)
+            for name, data, mode in files:
+                _add(tar, name, data, mode, mtime)
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def _open(
+    path: Path,
+) -> Iterator[tuple[tarfile.TarFile, Iterator[tarfile.TarInfo], BundleIndex]]:
+    """
+    Yields bundle at `path` opened for single pass, its remaining members (after
+    index) and its index.
+    """
+    with (
+        path.open("rb") as f,
+        open_decompressed(f, "gz") as stream,
+        tarfile.open(fileobj=stream, mode="r|") as tar,
+    ):
+        members = iter(tar)
+        index = BundleIndex.from_json(_read(tar, next(members, None), BundleIndex.NAME))
+        yield tar, members, index
+
+
+def _prepare_any(app: App) -> bool:
+    # Bundle has all apps, whatever is installed on machine preparing it. Their
+    # latest versions are still looked up in metadata stage, as with install
+    return app.latest_available_version is not None
+
+
+def _add(tar: tarfile.TarFile, name: str, data: bytes, mode: int, mtime: int) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mode = mode
+    info.mtime = mtime
+    tar.addfile(info, io.BytesIO(data))
+
+
+def install(path: Path, prefix: Path) -> list[Path]:
+    """
+    Installs apps from bundle at `path` into `prefix`, like `install` would (skipping
+    apps that are already at bundled version), in single pass over bundle.
+
+    Each app is committed as soon as all of its files were read. If any app fails,
+    remaining apps are still installed and then the first error is raised.
+    """
+    installed: list[Path] = []
+    errors: list[Exception] = []
+
+    with _open(path) as (tar, members, index):
+        if index.base is not None:
+            _verify_base(prefix, index)
+
+        for entry in index.apps:
+            base = index.base.get(entry.app_name) if index.base is not None else None
+            app = BundledApp(entry, prefix=prefix, base=base)
+            try:
+                # Delta bundle applies to its (already verified) base, whatever
+                # versions are in it
+                wanted = index.base is not None or app.check_for_update()
+            except Exception as e:
+                logger.exception("Failed to check.", extra={"app_name": app.name})
+                errors.append(e)
+                wanted = False
+
+            _read_files(tar, members, index, entry, app.data if wanted else None)
+
+            if wanted:
+                try:
+                    installed.extend(app.commit())
+                except Exception as e:
+                    logger.exception("Failed to install.", extra={"app_name": app.name})
+                    errors.append(e)
+
+    if errors:
+        raise errors[0]
+
+    return installed
+
+
+def _read_files(
+    tar: tarfile.TarFile,
+    members: Iterator[tarfile.TarInfo],
+    index: BundleIndex,
+    entry: BundleEntry,
+    into: dict[str, bytes] | None,
+) -> None:
+    # Members have to be read in order, even those of skipped apps (`into` is `None`)
+    for _ in entry.files:
+        if not index.has_data(entry, _):
+            continue
+        member = next(members, None)
+        name = f"{_FILES_DIR}/{_.path}"
+        if into is not None:
+            into[_.path] = _read(tar, member, name)
+        elif member is None or member.name != name:
+            raise ValueError(f"Bundle is missing {name}!")
+
+
+def _verify_base(prefix: Path, index: BundleIndex) -> None:
+    # Before anything is written: every app delta bundle was made against (or adds)
+    # must be installed exactly as in its base, with none of its files changed since
+    base = index.base or {}
+    for name in sorted(base.keys() | {_.app_name for _ in index.apps}):
+        receipt = InstallReceipt.load(prefix, name)
+        actual = AppState.of(receipt) if receipt else None
+        expected = base.get(name)
+        if actual != expected:
+            raise ValueError(
+                f"Delta bundle doesn't apply to {prefix}: {name} is "
+                f"{actual.version if actual else 'not installed'}, expected "
+                f"{expected.version if expected else 'not installed'}!"
+            )
+
+        if receipt is None:
+            continue
+        changed = [_.path for _ in receipt.files if not _.is_intact(prefix)]
+        if changed:
+            raise ValueError(
+                f"Delta bundle doesn't apply to {prefix}: {', '.join(changed)} "
+                "changed since installed!"
+            )
+
+
+def _read(tar: tarfile.TarFile, member: tarfile.TarInfo | None, name: str) -> bytes:
+    if member is None or member.name != name or not member.isfile():
+        raise ValueError(f"Bundle is missing {name}!")
+    return tar.extractfile(member).read()  # type: ignore
@@ -1,35 +1,27 @@
+import json
 import logging
 import logging.config
 import textwrap
+from pathlib import Path
 
 import click
 
-from .app import DEFAULT_PREFIX
-from .supported_apps import (
-    AstGrep,
-    Bat,
-    Dasel,
-    Eza,
-    FdFind,
-    Fnm,
-    Fzf,
-    Gitleaks,
-    GoJq,
-    Jid,
-    Jq,
-    Jqp,
-    Lazygit,
-    Mdbook,
-    Neovide,
-    Restish,
-    Ripgrep,
-    RustAnalyzer,
-    Starship,
-    Stylua,
-    Uv,
-    Xq,
-    YamlQ,
+from . import bundle as bundles
+from . import (
+    decompressors,
+    gh_client,
+    layer,
+    manuals,
+    materialize,
+    plan,
+    supported_apps,
+    versions,
+    zsh_digest,
 )
+from .app import DEFAULT_PREFIX
+from .lockfile import Lockfile
+from .pipeline import InstallPipeline, PrefixFanOut, Stage
+from .versions import VersionStore
 
 
 class AppNameContext(logging.Filter):
@@ -83,9 +75,129 @@ _PREFIX_HELP = textwrap.dedent(
     """
 )
 
+_PREFIXES_HELP = textwrap.dedent(
+    """
+    May be given multiple times, to install into all of them with single download and
+    extraction. Installed version is checked in each prefix separately.
+    """
+)
 
-@click.command()
-@click.option(
+_DECOMPRESSION_HELP = textwrap.dedent(
+    """
+    How to decompress downloaded archives.
+
+    `auto` pipes decompression through multi-threaded system tools (`pigz`, `xz -T0`,
+    `lbzip2`, `zstd`) when they are found on `$PATH` and uses Python stdlib otherwise.
+    `stdlib` always uses Python stdlib.
+    """
+)
+
+_LINK_MODE_HELP = textwrap.dedent(
+    """
+    How to create installed files from files already extracted into `~/.cache`.
+
+    `auto` tries reflink (`FICLONE`) and then `copy_file_range`, `hardlink` makes
+    installed files hardlinks of cached ones (only if cache is owned by root and
+    writable by nobody else, works as `auto` otherwise). Both need cache and prefix in
+    the same filesystem and fall back to plain copy otherwise. `copy` always copies.
+    """
+)
+
+_CACHE_SIZE_HELP = textwrap.dedent(
+    """
+    Downloads in `~/.cache` (together with files extracted from them) are evicted,
+    least recently used first, once they take more than this. Those used by current
+    run are never evicted.
+    """
+)
+
+_ZCOMPILE_HELP = textwrap.dedent(
+    """
+    Compile zsh functions in `$PREFIX/share/zsh/site-functions` into
+    `site-functions.zwc` digest (rebuilt only when some of them changed), so that
+    shell startup doesn't need to parse each completion file. Needs `zsh` on `$PATH`.
+    """
+)
+
+_COMPRESS_MAN_PAGES_HELP = textwrap.dedent(
+    """
+    Install man pages gzipped (deterministically, so reinstalling the same page is
+    still recognized as no change).
+    """
+)
+
+_UPDATE_MAN_INDEX_HELP = textwrap.dedent(
+    """
+    Update `mandb` index entries of added or changed man pages (`mandb --filename`),
+    so that `man -k` / `apropos` find them without full index rebuild.
+    """
+)
+
+_VERSIONED_HELP = textwrap.dedent(
+    """
+    Keep each installed version in its own directory under
+    `$PREFIX/lib/usr-local-pull/<app>/` and link active one into prefix, so that
+    `rollback` and `activate` can switch between them without downloading anything.
+    """
+)
+
+_KEEP_HELP = textwrap.dedent(
+    """
+    With `--versioned`, how many most recently installed versions of each app to keep
+    (active one is always kept).
+    """
+)
+
+_LOCKED_HELP = textwrap.dedent(
+    """
+    Install exactly the releases and assets recorded in `--lockfile` (see `lock`),
+    without asking GitHub API anything. Downloads are verified against locked
+    SHA-256 digests.
+    """
+)
+
+_LOCKFILE_HELP = "Lockfile written by `lock` and read by `install --locked`."
+
+_MIRROR_HELP = textwrap.dedent(
+    """
+    Base URL that replaces `https://github.com` in asset download URLs, ie. internal
+    mirror of release assets (`https://mirror.example/BurntSushi/ripgrep/releases/...`).
+    """
+)
+
+_WORKERS_HELP = textwrap.dedent(
+    """
+    Number of concurrent workers of single install stage, as `STAGE=N`. May be given
+    multiple times. Stages are `metadata` (default 8), `download` (4), `extract`
+    (number of CPUs), `generate` (4) and `commit` (1).
+    """
+)
+
+
+def _parse_workers(ctx, param, value) -> dict[Stage, int]:
+    retv: dict[Stage, int] = {}
+    for _ in value:
+        stage, sep, count = _.partition("=")
+        try:
+            retv[Stage(stage.strip())] = int(count)
+        except ValueError as e:
+            raise click.BadParameter(
+                f"Expected STAGE=N, with STAGE one of {[s.value for s in Stage]}"
+            ) from e
+        if not sep or retv[Stage(stage.strip())] < 1:
+            raise click.BadParameter("Expected STAGE=N, with N >= 1")
+    return retv
+
+
+_lockfile_option = click.option(
+    "--lockfile",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    default=Lockfile.DEFAULT_NAME,
+    show_default=True,
+    help=_LOCKFILE_HELP,
+)
+
+_prefix_option = click.option(
     "-p",
     "--prefix",
     type=click.Path(
@@ -95,45 +207,450 @@ _PREFIX_HELP = textwrap.dedent(
     show_default=True,
     help=_PREFIX_HELP,
 )
-def cli(prefix):
+
+
+_decompression_option = click.option(
+    "--decompression",
+    type=click.Choice(decompressors.BACKENDS),
+    default="auto",
+    show_default=True,
+    help=_DECOMPRESSION_HELP,
+)
+
+_cache_size_option = click.option(
+    "--cache-size",
+    type=click.IntRange(min=0),
+    metavar="MiB",
+    default=gh_client.DEFAULT_MAX_DOWNLOADS_SIZE // 2**20,
+    show_default=True,
+    help=_CACHE_SIZE_HELP,
+)
+
+_only_option = click.option(
+    "--only",
+    multiple=True,
+    metavar="APP",
+    help="Use only this app, may be given multiple times. Default is all apps.",
+)
+
+_skip_option = click.option(
+    "--skip",
+    multiple=True,
+    metavar="APP",
+    help="Don't use this app, may be given multiple times.",
+)
+
+
+class _DefaultCommandGroup(click.Group):
+    """
+    Group that runs `default_command` when no command is given, so that ie.
+    `usr-local-pull --prefix /opt` still means `usr-local-pull install --prefix /opt`.
+    """
+
+    default_command = "install"
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] != "--help"):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultCommandGroup)
+def cli():
     """
     Installs or updates bunch of cmdline utilities directly from GitHub releases.
     """
 
     logging.config.dictConfig(_CLI_LOGGING_CONFIG)
 
-    logging.info("Installing into: %s", prefix)
 
-    installed = []
-
-    for app in [
-        AstGrep(prefix=prefix),
-        Bat(prefix=prefix),
-        Dasel(prefix=prefix),
-        Eza(prefix=prefix),
-        FdFind(prefix=prefix),
-        Fnm(prefix=prefix),
-        Fzf(prefix=prefix),
-        Gitleaks(prefix=prefix),
-        GoJq(prefix=prefix),
-        Jid(prefix=prefix),
-        Jq(prefix=prefix),
-        Jqp(prefix=prefix),
-        Lazygit(prefix=prefix),
-        Mdbook(prefix=prefix),
-        Neovide(prefix=prefix),
-        Restish(prefix=prefix),
-        Ripgrep(prefix=prefix),
-        RustAnalyzer(prefix=prefix),
-        Starship(prefix=prefix),
-        Stylua(prefix=prefix),
-        Uv(prefix=prefix),
-        Xq(prefix=prefix),
-        YamlQ(prefix=prefix),
-    ]:
-        installed.extend(app.install())
+@cli.command()
+@click.option(
+    "-p",
+    "--prefix",
+    "prefixes",
+    type=click.Path(
+        exists=False, dir_okay=True, file_okay=False, writable=True, resolve_path=True
+    ),
+    multiple=True,
+    default=[DEFAULT_PREFIX.as_posix()],
+    show_default=True,
+    help=_PREFIX_HELP + _PREFIXES_HELP,
+)
+@_decompression_option
+@click.option(
+    "--link-mode",
+    type=click.Choice(materialize.MODES),
+    default="auto",
+    show_default=True,
+    help=_LINK_MODE_HELP,
+)
+@click.option(
+    "--zcompile/--no-zcompile",
+    default=False,
+    show_default=True,
+    help=_ZCOMPILE_HELP,
+)
+@click.option(
+    "--compress-man-pages/--no-compress-man-pages",
+    default=False,
+    show_default=True,
+    help=_COMPRESS_MAN_PAGES_HELP,
+)
+@click.option(
+    "--update-man-index/--no-update-man-index",
+    default=False,
+    show_default=True,
+    help=_UPDATE_MAN_INDEX_HELP,
+)
+@click.option(
+    "--versioned/--no-versioned",
+    default=False,
+    show_default=True,
+    help=_VERSIONED_HELP,
+)
+@click.option(
+    "--keep",
+    type=click.IntRange(min=1),
+    default=versions.DEFAULT_KEEP,
+    show_default=True,
+    help=_KEEP_HELP,
+)
+@click.option(
+    "--locked",
+    is_flag=True,
+    default=False,
+    help=_LOCKED_HELP,
+)
+@_lockfile_option
+@click.option("--mirror", metavar="URL", help=_MIRROR_HELP)
+@_cache_size_option
+@_only_option
+@_skip_option
+@click.option(
+    "--workers",
+    multiple=True,
+    metavar="STAGE=N",
+    callback=_parse_workers,
+    help=_WORKERS_HELP,
+)
+def install(  # noqa: PLR0913, PLR0917
+    prefixes,
+    decompression,
+    link_mode,
+    zcompile,
+    compress_man_pages,
+    update_man_index,
+    versioned,
+    keep,
+    locked,
+    lockfile,
+    mirror,
+    cache_size,
+    only,
+    skip,
+    workers,
+):
+    """
+    Installs or updates all apps (default command).
+    """
+
+    decompressors.set_backend(decompression)
+    materialize.set_mode(link_mode)
+    manuals.configure(compress=compress_man_pages, update_index=update_man_index)
+    versions.configure(enabled=versioned, keep=keep)
+    try:
+        gh_client.set_max_downloads_size(cache_size * 2**20)
+        gh_client.set_mirror(mirror)
+        if locked:
+            gh_client.pin_releases(Lockfile.load(Path(lockfile)).releases)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    apps = _apps(prefixes[0], only, skip)
+    logging.info("Installing into: %s", ", ".join(prefixes))
+
+    if len(prefixes) > 1:
+        fan_out = PrefixFanOut([Path(_) for _ in prefixes])
+        pipeline = InstallPipeline(
+            apps,
+            workers=workers,
+            check=fan_out.check,
+            commit=fan_out.commit,
+        )
+    else:
+        pipeline = InstallPipeline(apps, workers=workers)
+
+    try:
+        installed = pipeline.run()
+    finally:
+        # Even if some app failed, others' completions were installed
+        for _ in prefixes:
+            if zcompile:
+                zsh_digest.refresh(Path(_))
+            else:
+                zsh_digest.discard_stale(Path(_))
 
     if installed:
         print("Installed files:")
         for _ in installed:
             print(f"- {_}")
+
+
+@cli.command()
+@_lockfile_option
+@_decompression_option
+@_cache_size_option
+@_only_option
+@_skip_option
+def lock(lockfile, decompression, cache_size, only, skip):
+    """
+    Writes latest release of each app, with assets chosen from it, their URLs and
+    SHA-256 digests, into lockfile for `install --locked`.
+    """
+    decompressors.set_backend(decompression)
+    try:
+        gh_client.set_max_downloads_size(cache_size * 2**20)
+        retv = Lockfile.resolve(_apps(DEFAULT_PREFIX, only, skip))
+        retv.save(Path(lockfile))
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    logging.info("Locked %d apps into %s", len(retv.apps), lockfile)
+
+
+@cli.command("plan")
+@_prefix_option
+@click.option("--json", "as_json", is_flag=True, help="Print plan as JSON.")
+@_only_option
+@_skip_option
+def show_plan(prefix, as_json, only, skip):
+    """
+    Shows what `install` would do, without changing anything: installed and latest
+    version of each app, assets that would be downloaded (with their sizes and whether
+    they are already cached) and how many bytes that is.
+    """
+    plans = plan.plan(_apps(prefix, only, skip))
+    if as_json:
+        print(json.dumps([_.to_dict() for _ in plans], indent=2))
+    else:
+        print(plan.format_table(plans))
+
+
+@cli.command("apps")
+def list_apps():
+    """
+    Lists names of all apps, with packages that plugin apps come from, without
+    importing any of them.
+    """
+    plugins = supported_apps.plugins()
+    for _ in supported_apps.names():
+        if _ in plugins:
+            dist = plugins[_].dist
+            source = f"{dist.name} {dist.version}" if dist else "?"
+            print(f"{_}  {plugins[_].value} (plugin from {source})")
+        else:
+            print(_)
+
+
+@cli.group()
+def bundle():
+    """
+    Prepared install set in single archive, for installing on machines that shouldn't
+    download and prepare anything themselves.
+    """
+
+
+@bundle.command("export")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    default=bundles.DEFAULT_NAME,
+    show_default=True,
+    help="Where to write the bundle.",
+)
+@click.option(
+    "--workers",
+    multiple=True,
+    metavar="STAGE=N",
+    callback=_parse_workers,
+    help=_WORKERS_HELP,
+)
+@_decompression_option
+@_cache_size_option
+@_only_option
+@_skip_option
+def bundle_export(  # noqa: PLR0913, PLR0917
+    output, workers, decompression, cache_size, only, skip
+):
+    """
+    Downloads and prepares all apps (binaries, completions and man pages) and writes
+    them into bundle, instead of installing them.
+    """
+    decompressors.set_backend(decompression)
+    try:
+        gh_client.set_max_downloads_size(cache_size * 2**20)
+        index = bundles.export(
+            _apps(DEFAULT_PREFIX, only, skip), Path(output), workers=workers
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    logging.info("Bundled %d apps into %s", len(index.apps), output)
+
+
+@bundle.command("delta")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    default="usr-local-pull-delta.tar.gz",
+    show_default=True,
+    help="Where to write the delta bundle.",
+)
+@click.argument("base", type=click.Path(exists=True, resolve_path=True))
+@click.argument(
+    "target", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+)
+def bundle_delta(output, base, target):
+    """
+    Writes bundle that updates BASE to TARGET bundle, with only apps and files that
+    changed.
+
+    BASE is either prefix (its current state is read from install receipts) or bundle
+    that was imported into prefixes which delta bundle is for. Importing delta bundle
+    first verifies that prefix is exactly in BASE state.
+    """
+    try:
+        index = bundles.delta(bundles.state_of(Path(base)), Path(target), Path(output))
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    logging.info(
+        "%d changed apps, %d of their files in %s",
+        len(index.apps),
+        sum(index.has_data(app, _) for app in index.apps for _ in app.files),
+        output,
+    )
+
+
+@bundle.command("import")
+@_prefix_option
+@click.argument(
+    "bundle_path", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+)
+def bundle_import(prefix, bundle_path):
+    """
+    Installs apps from BUNDLE_PATH written by `bundle export` into prefix, skipping
+    those that are already at bundled version.
+    """
+    logging.info("Installing into: %s", prefix)
+    try:
+        installed = bundles.install(Path(bundle_path), Path(prefix))
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        zsh_digest.refresh_existing(Path(prefix))
+
+    if installed:
+        print("Installed files:")
+        for _ in installed:
+            print(f"- {_}")
+
+
+@cli.command("layer")
+@_prefix_option
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    default=layer.DEFAULT_NAME,
+    show_default=True,
+    help="Where to write the layer (gzipped if it ends with `.gz`).",
+)
+@click.option(
+    "--workers",
+    multiple=True,
+    metavar="STAGE=N",
+    callback=_parse_workers,
+    help=_WORKERS_HELP,
+)
+@_decompression_option
+@_cache_size_option
+@_only_option
+@_skip_option
+def write_layer(  # noqa: PLR0913, PLR0917
+    prefix, output, workers, decompression, cache_size, only, skip
+):
+    """
+    Downloads and prepares all apps and writes them, as if installed into prefix, into
+    reproducible tarball to be used as container image layer.
+
+    Entries are sorted, owned by root and have `$SOURCE_DATE_EPOCH` (or 0) as mtime,
+    so that the same apps always give byte-identical layer.
+    """
+    decompressors.set_backend(decompression)
+    try:
+        gh_client.set_max_downloads_size(cache_size * 2**20)
+        mtime = layer.source_date_epoch()
+        prepared = bundles.prepare(_apps(prefix, only, skip), workers=workers)
+        count = layer.write(prepared, Path(prefix), Path(output), mtime=mtime)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    logging.info("Wrote %d entries into %s", count, output)
+
+
+def _apps(prefix, only=(), skip=()):
+    """
+    Instances of selected apps, see `supported_apps.select()`. Modules of other apps
+    aren't imported at all.
+    """
+    try:
+        selected = supported_apps.select(only, skip)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+
+    retv = []
+    for _ in selected:
+        try:
+            retv.append(supported_apps.load(_)(prefix=prefix))
+        except ValueError as e:
+            # Broken plugin app doesn't stop all others, unless it was asked for
+            if only:
+                raise click.ClickException(str(e)) from e
+            logging.warning("Skipping app %s: %s", _, e)
+    return retv
+
+
+@cli.command()
+@_prefix_option
+@click.argument("app_name")
+@click.argument("version")
+def activate(prefix, app_name, version):
+    """
+    Switches APP_NAME to its already installed VERSION (see `install --versioned`).
+    """
+    try:
+        VersionStore(Path(prefix), app_name).activate(version)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        zsh_digest.refresh_existing(Path(prefix))
+
+
+@cli.command()
+@_prefix_option
+@click.argument("app_name")
+def rollback(prefix, app_name):
+    """
+    Switches APP_NAME back to version installed before the active one (see
+    `install --versioned`).
+    """
+    try:
+        VersionStore(Path(prefix), app_name).rollback()
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        zsh_digest.refresh_existing(Path(prefix))
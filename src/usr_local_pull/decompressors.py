@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import bz2
+import contextlib
+import gzip
+import io
+import logging
+import lzma
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from typing import BinaryIO
+
+
+logger = logging.getLogger(__name__)
+
+# Decompression backends:
+#
+# - "auto"   - pipe compressed stream through multi-threaded system tool (`pigz`,
+#              `xz -T0`, `zstd`, ...) when one is found on `$PATH`, otherwise use
+#              Python stdlib decoders
+# - "stdlib" - always use Python stdlib decoders (`gzip`, `bz2`, `lzma`)
+#
+# Both produce identical output, system tools are just faster on large archives.
+BACKENDS: Final[tuple[str, ...]] = ("auto", "stdlib")
+
+# Compression name -> candidate system decompressors, in order of preference. Each one
+# must read compressed stream from stdin and write decompressed one to stdout.
+#
+# Notes:
+#
+# - `pigz` can't parallelize inflate itself but it does reading, writing and CRC
+#   checking in separate threads, which is still ~2x faster than `gzip` module
+# - `xz -T0` decompresses in parallel only archives that were compressed in multiple
+#   blocks (which is what `xz -T0` does by default since 5.4)
+# - `zstd` decompression is single threaded, but there is no `zstd` decoder in stdlib
+#   before Python 3.14 so it is still needed for `.zst` assets
+_SYSTEM_TOOLS: Final[dict[str, tuple[tuple[str, ...], ...]]] = {
+    "gz": (("pigz", "-d", "-c"),),
+    "bz2": (("lbzip2", "-d", "-c"), ("pbzip2", "-d", "-c")),
+    "xz": (("xz", "-d", "-c", "-T0"),),
+    "zst": (("zstd", "-d", "-c", "-q"),),
+}
+
+_CHUNK_SIZE: Final[int] = 1024 * 1024
+
+_backend: str = "auto"
+
+
+def set_backend(name: str) -> None:
+    global _backend  # noqa: PLW0603
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown decompression backend {name}!")
+    _backend = name
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def system_tool(compression: str) -> tuple[str, ...] | None:
+    """
+    Returns command line of the system decompressor that would be used for
+    `compression` or `None` if stdlib decoder would be used.
+    """
+    if _backend == "stdlib":
+        return None
+
+    for cmd in _SYSTEM_TOOLS.get(compression, ()):
+        exe = shutil.which(cmd[0])
+        if exe:
+            return (exe, *cmd[1:])
+
+    return None
+
+
+@contextmanager
+def open_decompressed(fileobj: BinaryIO, compression: str | None) -> Iterator[BinaryIO]:
+    """
+    Streaming decompression of `fileobj`.
+
+    Yields readable binary stream of decompressed data. If `compression` is `None`,
+    yields `fileobj` itself.
+
+    If system tool fails midway and `fileobj` is seekable, decompression continues
+    with stdlib decoder from where the tool stopped (see `_RecoveringStream`).
+    """
+    if not compression:
+        yield fileobj
+        return
+
+    cmd = system_tool(compression)
+    if cmd:
+        # Before the tool starts reading it
+        start = fileobj.tell() if fileobj.seekable() else None
+        try:
+            pipe = _ToolPipe(cmd, fileobj)
+        except OSError as e:
+            logger.debug("Can't start %s, falling back to stdlib: %s", cmd[0], e)
+        else:
+            with (
+                pipe,
+                io.BufferedReader(
+                    _RecoveringStream(pipe, fileobj, start, compression), _CHUNK_SIZE
+                ) as f,
+            ):
+                yield f  # type: ignore
+            return
+
+    with _stdlib_decoder(fileobj, compression) as f:
+        yield f
+
+
+def decompress(data: bytes, compression: str | None) -> bytes:
+    """
+    Decompresses whole `data` blob.
+
+    If system tool fails for any reason, retries with stdlib decoder.
+    """
+    if not compression:
+        return data
+
+    cmd = system_tool(compression)
+    if cmd:
+        try:
+            proc = subprocess.run(  # noqa: S603
+                cmd, input=data, capture_output=True, shell=False, check=True
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.debug("%s failed, falling back to stdlib: %s", cmd[0], e)
+        else:
+            return proc.stdout
+
+    if compression == "gz":
+        return gzip.decompress(data)
+    if compression == "bz2":
+        return bz2.decompress(data)
+    if compression == "xz":
+        return lzma.decompress(data)
+    if compression == "zst":
+        return _stdlib_zstd().decompress(data)
+
+    raise ValueError(f"Unsupported compression {compression}!")
+
+
+def _stdlib_zstd():
+    try:
+        from compression import zstd  # type: ignore  # noqa: PLC0415
+    except ImportError as e:
+        raise ValueError(
+            "Decompressing '.zst' requires either `zstd` on $PATH or Python >= 3.14!"
+        ) from e
+    return zstd
+
+
+def _stdlib_decoder(fileobj: BinaryIO, compression: str) -> BinaryIO:
+    if compression == "gz":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")  # type: ignore
+    if compression == "bz2":
+        return bz2.BZ2File(fileobj, mode="rb")  # type: ignore
+    if compression == "xz":
+        return lzma.LZMAFile(fileobj, mode="rb")  # type: ignore
+    if compression == "zst":
+        return _stdlib_zstd().ZstdFile(fileobj, mode="rb")
+
+    raise ValueError(f"Unsupported compression {compression}!")
+
+
+class _ToolPipe:
+    """
+    Runs system decompressor feeding it from `fileobj` in background thread.
+
+    Consumer reads decompressed data from `stdout`. Consumer is allowed to stop reading
+    before EOF (ie. once it found archive member it was looking for), in which case
+    the tool is killed and its exit status ignored.
+    """
+
+    def __init__(self, cmd: tuple[str, ...], fileobj: BinaryIO) -> None:
+        self.cmd = cmd
+        # Set when whatever the tool failed to decompress was decompressed elsewhere
+        self.replaced = False
+        self._stderr: IO[bytes] = tempfile.TemporaryFile()  # noqa: SIM115
+        try:
+            self._proc = subprocess.Popen(  # noqa: S603
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                shell=False,
+            )
+        except OSError:
+            self._stderr.close()
+            raise
+        self.stdout: BinaryIO = self._proc.stdout  # type: ignore
+        self._feeder = threading.Thread(
+            target=self._feed, args=(fileobj,), name=f"feed-{cmd[0]}", daemon=True
+        )
+        self._feeder.start()
+
+    def _feed(self, fileobj: BinaryIO) -> None:
+        stdin: IO[bytes] = self._proc.stdin  # type: ignore
+        try:
+            while chunk := fileobj.read(_CHUNK_SIZE):
+                stdin.write(chunk)
+        except (BrokenPipeError, ValueError, OSError):
+            # Tool exited early, either because it failed or because consumer stopped
+            # reading and we killed it. Both cases are handled in `__exit__`
+            pass
+        finally:
+            with contextlib.suppress(OSError):
+                stdin.close()
+
+    def __enter__(self) -> _ToolPipe:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        finished = exc_type is None and self.stdout.read(1) == b""
+
+        if not finished:
+            self._proc.kill()
+
+        self.stdout.close()
+        try:
+            err = self.error()
+            if finished and err and not self.replaced:
+                raise ValueError(err)
+        finally:
+            self._stderr.close()
+
+    def error(self) -> str | None:
+        """
+        Once `stdout` reached EOF, waits for the tool to exit and tells why it failed,
+        if it did. Nothing reads from `fileobj` after this returns.
+        """
+        returncode = self._proc.wait()
+        self._feeder.join()
+        if returncode == 0:
+            return None
+        self._stderr.seek(0)
+        err = self._stderr.read().decode(errors="replace").strip()
+        return f"{self.cmd[0]} failed with {returncode}: {err}"
+
+
+class _RecoveringStream(io.RawIOBase):
+    """
+    Output of `pipe`. If the tool fails before it decompressed everything and
+    `fileobj` can be rewound to `start`, continues with stdlib decoder: it decompresses
+    `fileobj` again from `start`, and output that tool already gave is skipped (both
+    decoders give the same output, so it is just its prefix).
+    """
+
+    def __init__(
+        self,
+        pipe: _ToolPipe,
+        fileobj: BinaryIO,
+        start: int | None,
+        compression: str,
+    ) -> None:
+        super().__init__()
+        self._pipe = pipe
+        self._fileobj = fileobj
+        self._start = start
+        self._compression = compression
+        self._stream: BinaryIO = pipe.stdout
+        self._stdlib: BinaryIO | None = None
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._stream.readinto(b)  # type: ignore
+        if not n and self._stdlib is None and self._start is not None:
+            err = self._pipe.error()
+            if err:
+                logger.debug("%s, continuing with stdlib", err)
+                self._fileobj.seek(self._start)
+                self._stdlib = self._stream = _stdlib_decoder(
+                    self._fileobj, self._compression
+                )
+                _skip(self._stdlib, self._pos)
+                self._pipe.replaced = True
+                n = self._stream.readinto(b)  # type: ignore
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if self._stdlib is not None:
+            self._stdlib.close()
+        super().close()
+
+
+def _skip(stream: BinaryIO, size: int) -> None:
+    while size:
+        chunk = stream.read(min(size, _CHUNK_SIZE))
+        if not chunk:
+            raise ValueError("Decompressed stream is shorter than expected!")
+        size -= len(chunk)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import ClassVar, Final
+
+logger = logging.getLogger(__name__)
+
+# Placeholder in generator arguments, replaced with path of empty directory into which
+# generator writes its output files (ie. `dasel man --output-directory <dir>`)
+OUTPUT_DIR: Final[str] = "{output_dir}"
+
+
+@dataclass
+class GeneratedOutput:
+    """
+    What single run of downloaded binary generated (ie. its completions or man pages).
+    """
+
+    stdout: bytes = field(default=b"", repr=False)
+    # Path relative to `OUTPUT_DIR` -> content
+    files: dict[str, bytes] = field(default_factory=dict, repr=False)
+
+    def glob(self, pattern: str) -> list[tuple[str, bytes]]:
+        """
+        Files directly in output directory matching `pattern`, sorted by name.
+        """
+        return sorted(
+            (name, data)
+            for name, data in self.files.items()
+            if "/" not in name and fnmatch.fnmatchcase(name, pattern)
+        )
+
+
+class GeneratedCache:
+    """
+    Outputs of already executed generators, stored in `~/.cache`.
+
+    Keyed by generator binary content hash and its arguments, so that reinstalling
+    the same version (or installing it into another prefix) doesn't run anything.
+    Each entry is a directory with `stdout` and `files/`; least recently used entries
+    are evicted once there are more than `_MAX_ENTRIES` of them.
+    """
+
+    _MAX_ENTRIES: ClassVar[int] = 128
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or Path.home() / ".cache" / "usr-local-pull" / "generated"
+
+    @classmethod
+    def _key(cls, digest: str, args: tuple[str, ...]) -> str:
+        return hashlib.sha256(json.dumps([digest, args]).encode()).hexdigest()
+
+    def get(self, digest: str, args: tuple[str, ...]) -> GeneratedOutput | None:
+        entry_dir = self.path / self._key(digest, args)
+        try:
+            stdout = (entry_dir / "stdout").read_bytes()
+            files_dir = entry_dir / "files"
+            files = {
+                _.relative_to(files_dir).as_posix(): _.read_bytes()
+                for _ in files_dir.rglob("*")
+                if _.is_file()
+            }
+            os.utime(entry_dir)
+        except OSError:
+            return None
+
+        return GeneratedOutput(stdout=stdout, files=files)
+
+    def add(self, digest: str, args: tuple[str, ...], output: GeneratedOutput) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry_dir = self.path / self._key(digest, args)
+
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.path, prefix=f".{entry_dir.name}."))
+        try:
+            (tmp_dir / "stdout").write_bytes(output.stdout)
+            for name, data in output.files.items():
+                file_path = tmp_dir / "files" / name
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                file_path.write_bytes(data)
+            (tmp_dir / "files").mkdir(exist_ok=True)
+            # Readers never see partial entry; if concurrent run already added the
+            # same one, it stays
+            tmp_dir.rename(entry_dir)
+        except OSError as e:
+            logger.debug("not caching generated output %s: %s", entry_dir.name, e)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(
+            (_ for _ in self.path.iterdir() if not _.name.startswith(".")),
+            key=_mtime_ns,
+        )
+        for _ in entries[: -self._MAX_ENTRIES]:
+            shutil.rmtree(_, ignore_errors=True)
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        # Already evicted by concurrent run
+        return 0
+
+
+_CACHE = GeneratedCache()
+
+
+def get(digest: str, args: tuple[str, ...]) -> GeneratedOutput | None:
+    return _CACHE.get(digest, args)
+
+
+def add(digest: str, args: tuple[str, ...], output: GeneratedOutput) -> None:
+    _CACHE.add(digest, args, output)
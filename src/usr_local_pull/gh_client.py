@@ -1,8 +1,20 @@
 from __future__ import annotations
 
+import contextlib
+import dataclasses
+import hashlib
+import io
 import json
 import logging
+import os
 import re
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
 import urllib.request
 from dataclasses import dataclass, field
 from datetime import UTC, date, datetime
@@ -11,14 +23,21 @@ from typing import TYPE_CHECKING, ClassVar
 
 from packaging.version import parse as parse_version
 
+from .app_files import StoredFile
+from .archive_extractor import ArchiveExtractor, PendingSelection, SelectedMembers
+from .decompressors import open_decompressed
+
 if TYPE_CHECKING:
-    from typing import Any, Final
+    from collections.abc import Callable
+    from typing import Any, BinaryIO, Final
 
     from packaging.version import Version
 
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_DOWNLOADS_SIZE: Final[int] = 2 * 1024 * 1024 * 1024
+
 
 @dataclass
 class GhRelease:
@@ -111,10 +130,34 @@ class GhRelease:
             (a["id"] for a in self.data.get("assets", []) if a["name"] == named), None
         )
 
+    def asset_digest(self, named: str) -> str | None:
+        """
+        `sha256:...` digest of asset, as published by GitHub (not available for older
+        releases).
+        """
+        return next(
+            (
+                a.get("digest")
+                for a in self.data.get("assets", [])
+                if a["name"] == named
+            ),
+            None,
+        )
+
+    def asset_size(self, named: str) -> int | None:
+        return next(
+            (a.get("size") for a in self.data.get("assets", []) if a["name"] == named),
+            None,
+        )
+
     @property
     def assets(self) -> list[dict[str, str | int | dict[str, str | int]]]:
         return self.data.get("assets", [])
 
+    @property
+    def tag_name(self) -> str:
+        return self.data["tag_name"]
+
     @property
     def tarball_url(self) -> str:
         return self.data["tarball_url"]
@@ -133,12 +176,128 @@ class GhDownloadedAsset:
     data: bytes = field(default=b"", repr=False)
 
 
+@dataclass
+class GhExtractedArtifacts:
+    """
+    Files already extracted from single downloaded asset.
+
+    Stored on disk next to the asset itself (`asset.<id>.extracted/`), keyed by member
+    path, so that reinstalling known version doesn't need to decompress anything. Evicted
+    together with the asset.
+
+    Each member's size, mtime and sha256 are recorded next to it when it is written, so
+    it can be installed from here without reading it (see `StoredFile`).
+    """
+
+    cache_dir: Path
+    digest: str | None = None
+
+    # Artifacts of archive nested in asset are keyed by "<outer member>!/<member>"
+    prefix: str = ""
+
+    # Stored like any other member, under key that can't be valid member path
+    _MEMBERS_KEY: ClassVar[str] = "\0members"
+    _DIGEST_FILE: ClassVar[str] = "digest"
+
+    def __post_init__(self):
+        digest_path = self.cache_dir / self._DIGEST_FILE
+        if self.digest and self.cache_dir.exists():
+            cached_digest = digest_path.read_text() if digest_path.exists() else None
+            if cached_digest != self.digest:
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if self.digest and not digest_path.exists():
+            _write_atomic(digest_path, self.digest.encode())
+
+    def nested(self, member: str) -> GhExtractedArtifacts:
+        return dataclasses.replace(self, prefix=f"{self.prefix}{member}!/")
+
+    def path(self, member: str) -> Path:
+        key = f"{self.prefix}{member}"
+        return self.cache_dir / hashlib.sha256(key.encode()).hexdigest()
+
+    @property
+    def _members_path(self) -> Path:
+        return self.path(self._MEMBERS_KEY)
+
+    @property
+    def members(self) -> list[str] | None:
+        if not self._members_path.exists():
+            return None
+        with self._members_path.open("r") as f:
+            return json.load(f)
+
+    @members.setter
+    def members(self, value: list[str]) -> None:
+        _write_atomic(self._members_path, json.dumps(value).encode())
+
+    def get(self, member: str) -> bytes | None:
+        data_path = self.path(member)
+        if not data_path.exists():
+            return None
+        logger.debug("extracted artifact cache hit for %s", member)
+        with data_path.open("rb") as f:
+            return f.read()
+
+    def stored(self, member: str) -> StoredFile | None:
+        """
+        Member as it is stored here, if it is and wasn't changed since it was written.
+        """
+        data_path = self.path(member)
+        try:
+            with self._record_path(data_path).open("r") as f:
+                record = json.load(f)
+            retv = StoredFile(path=data_path, **record)
+        except (OSError, ValueError, TypeError):
+            return None
+        return retv if retv.is_intact() else None
+
+    def add(self, member: str, data: bytes, *, executable: bool = False) -> StoredFile:
+        """
+        Executable members are stored as such (runnable by owner only), so that they
+        can be executed right from here.
+        """
+        data_path = self.path(member)
+        _write_atomic(data_path, data, stat.S_IRWXU if executable else None)
+        st = data_path.stat()
+        retv = StoredFile(
+            path=data_path,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            sha256=hashlib.sha256(data).hexdigest(),
+        )
+        record = dataclasses.asdict(retv)
+        del record["path"]
+        _write_atomic(self._record_path(data_path), json.dumps(record).encode())
+        return retv
+
+    @classmethod
+    def _record_path(cls, data_path: Path) -> Path:
+        return data_path.with_name(f"{data_path.name}.json")
+
+
 @dataclass
 class GhCache:
     _entries: dict[str, GhRelease | GhDownloadedAsset] = field(default_factory=dict)
 
+    # Cache dirs of assets used during this run. These are never evicted.
+    _in_use: set[Path] = field(default_factory=set)
+
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    # Downloaded assets, together with files extracted from them, are evicted least
+    # recently used first, once their total size exceeds this.
+    max_downloads_size: int = DEFAULT_MAX_DOWNLOADS_SIZE
+
     _RELEASE_CACHE_FOR_SECONDS: ClassVar[int] = 60 * 60
 
+    _EXTRACTED_SUFFIX: ClassVar[str] = ".extracted"
+
+    @classmethod
+    def _root_dir(cls) -> Path:
+        return Path.home() / ".cache" / "usr-local-pull"
+
     @classmethod
     def _make_release_key(cls, owner: str, repo: str) -> str:
         return f"releases/{owner}/{repo}"
@@ -152,11 +311,18 @@ class GhCache:
 
     @classmethod
     def _repo_cache_dir(cls, owner: str, repo: str) -> Path:
-        retv = Path.home() / ".cache" / "usr-local-pull" / owner / repo
+        retv = cls._root_dir() / owner / repo
         if not retv.exists():
             retv.mkdir(parents=True, exist_ok=True)
         return retv
 
+    @classmethod
+    def _downloaded_asset_path(cls, owner: str, repo: str, name: str, gh_id: int):
+        if name == "tarball":
+            return cls._repo_cache_dir(owner, repo) / f"tarball.{gh_id}"
+
+        return cls._repo_cache_dir(owner, repo) / f"asset.{gh_id}"
+
     def add_release(self, obj: GhRelease) -> None:
         data_path: Path = self._repo_cache_dir(obj.owner, obj.repo) / "release.json"
 
@@ -201,21 +367,18 @@ class GhCache:
         return None
 
     def add_downloaded_asset(self, obj: GhDownloadedAsset) -> None:
-        if obj.name == "tarball":
-            data_path: Path = (
-                self._repo_cache_dir(obj.owner, obj.repo) / f"tarball.{obj.gh_id}"
-            )
-        else:
-            data_path: Path = (
-                self._repo_cache_dir(obj.owner, obj.repo) / f"asset.{obj.gh_id}"
-            )
+        data_path = self._downloaded_asset_path(
+            obj.owner, obj.repo, obj.name, obj.gh_id
+        )
 
-        with data_path.open("wb") as f:
-            f.write(obj.data)
+        _write_atomic(data_path, obj.data)
+        self._use(data_path)
 
         key = self._make_downloaded_asset_key(obj.gh_id, obj.name)
         self._entries[key] = obj
 
+        self.evict()
+
     def get_downloaded_asset(
         self, owner: str, repo: str, name: str, gh_id: int
     ) -> GhDownloadedAsset | None:
@@ -226,12 +389,10 @@ class GhCache:
             logger.debug("memory cache hit for %s", name, extra={"app_name": repo})
             return retv
 
-        if name == "tarball":
-            data_path: Path = self._repo_cache_dir(owner, repo) / f"tarball.{gh_id}"
-        else:
-            data_path: Path = self._repo_cache_dir(owner, repo) / f"asset.{gh_id}"
+        data_path = self._downloaded_asset_path(owner, repo, name, gh_id)
         if data_path.exists():
             logger.debug("disk cache hit for %s", name, extra={"app_name": repo})
+            self._use(data_path)
             with data_path.open("rb") as f:
                 data = f.read()
             entry = GhDownloadedAsset(
@@ -242,9 +403,389 @@ class GhCache:
 
         return None
 
+    def has_downloaded_asset(
+        self, owner: str, repo: str, name: str, gh_id: int
+    ) -> bool:
+        if self._make_downloaded_asset_key(gh_id, name) in self._entries:
+            return True
+        path = self._downloaded_asset_path(owner, repo, name, gh_id)
+        return path.exists() or (
+            path.with_name(path.name + self._EXTRACTED_SUFFIX).exists()
+        )
+
+    def extracted_artifacts(
+        self, owner: str, repo: str, name: str, gh_id: int, digest: str | None = None
+    ) -> GhExtractedArtifacts:
+        asset_path = self._downloaded_asset_path(owner, repo, name, gh_id)
+        retv = GhExtractedArtifacts(
+            cache_dir=asset_path.with_name(asset_path.name + self._EXTRACTED_SUFFIX),
+            digest=digest,
+        )
+        self._use(retv.cache_dir)
+        return retv
+
+    def repo_files(self, owner: str, repo: str, tag: str) -> GhExtractedArtifacts:
+        """
+        Files from repository source tree at `tag`, keyed by path relative to
+        repository root.
+        """
+        retv = GhExtractedArtifacts(
+            cache_dir=self._repo_cache_dir(owner, repo)
+            / f"files.{urllib.parse.quote(tag, safe='')}"
+        )
+        self._use(retv.cache_dir)
+        return retv
+
+    def _use(self, path: Path) -> None:
+        # mtime of asset file or extracted artifacts dir is its "last used" time
+        with self._lock:
+            self._in_use.add(path)
+        if path.exists():
+            os.utime(path)
+
+    def evict(self) -> None:
+        """
+        Removes least recently used downloaded assets (together with artifacts extracted
+        from them) until their total size fits into `max_downloads_size`.
+        """
+        with self._lock:
+            units = self._cache_units()
+            total = sum(size for _, size, _ in units)
+
+            for _, size, paths in sorted(units):
+                if total <= self.max_downloads_size:
+                    break
+                if any(_ in self._in_use for _ in paths):
+                    continue
+
+                logger.debug("Evicting %s from download cache", paths[0])
+                for path in paths:
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+                total -= size
+
+    @classmethod
+    def _cache_units(cls) -> list[tuple[float, int, list[Path]]]:
+        # Downloaded asset and its extracted artifacts dir are single eviction unit,
+        # and so are repository files of single tag: (last used, total size, paths)
+        grouped: dict[Path, list[Path]] = {}
+        for path in cls._root_dir().glob("*/*/*"):
+            if path.name.startswith(("asset.", "tarball.", "files.")):
+                unit = path.with_name(path.name.removesuffix(cls._EXTRACTED_SUFFIX))
+                grouped.setdefault(unit, []).append(path)
+
+        # Concurrent runs may be evicting the same files, whatever is already gone
+        # simply doesn't count
+        retv = []
+        for paths in grouped.values():
+            stats = [(_, st) for _ in paths if (st := _stat(_)) is not None]
+            if not stats:
+                continue
+            last_used = max(st.st_mtime for _, st in stats)
+            size = sum(_tree_size(path, st) for path, st in stats)
+            retv.append((last_used, size, sorted(paths)))
+
+        return retv
+
+
+def _stat(path: Path) -> os.stat_result | None:
+    try:
+        return path.stat()
+    except FileNotFoundError:
+        return None
+
+
+def _tree_size(path: Path, st: os.stat_result) -> int:
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_size
+    try:
+        files = list(path.iterdir())
+    except FileNotFoundError:
+        return 0
+    return sum(_.st_size for _ in map(_stat, files) if _ is not None)
+
+
+def _write_atomic(path: Path, data: bytes, mode: int | None = None) -> None:
+    # Concurrent runs may write same cache entry, readers should never see partial one
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if mode is not None:
+                os.fchmod(f.fileno(), mode)
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+class _PlannedExtractor:
+    """
+    Stands in for `ArchiveExtractor` of asset that would be downloaded, in planning
+    mode. Fetches nothing and selects nothing.
+    """
+
+    def __init__(self, archive: str) -> None:
+        self.archive = Path(archive)
+
+    def nested(self, member: str) -> _PlannedExtractor:
+        return self
+
+    def prefetch(self, *specs) -> PendingSelection:
+        return PendingSelection(self, specs)  # type: ignore
+
+    def select(self, *specs) -> SelectedMembers:
+        return SelectedMembers()
+
+    def extract(self, member: str) -> bytes:
+        return b""
+
+
+class _RangesNotSupportedError(Exception):
+    pass
+
+
+class _RangeRequestError(Exception):
+    """
+    Range request failed, for whatever reason (server doesn't support them, HTTP or
+    network error, unexpected response).
+    """
+
+
+class HttpRangeReader(io.RawIOBase):
+    """
+    Seekable, read-only file over remote `url` of known `size`, read using HTTP `Range`
+    requests.
+
+    Makes it possible for `zipfile` to read central directory and then only the
+    members it needs instead of downloading whole archive. Each miss fetches at least
+    `MIN_FETCH` bytes, and consecutive sequential misses double that (up to
+    `MAX_FETCH`), so even large members are read in only a few requests.
+
+    If range request fails after reader was opened, whole file is read by `download`
+    instead.
+
+    Whole file is never read, so its published digest can't be verified. Each member
+    still has its CRC-32 verified by `zipfile`, and locked installs (where digest is
+    what pins the asset) always download assets whole.
+    """
+
+    MIN_FETCH: ClassVar[int] = 64 * 1024
+    MAX_FETCH: ClassVar[int] = 16 * 1024 * 1024
+    _MAX_WINDOWS: ClassVar[int] = 4
+
+    def __init__(
+        self,
+        url: str,
+        size: int,
+        *,
+        name: str = "",
+        app_name: str = "",
+        download: Callable[[], bytes] | None = None,
+    ):
+        super().__init__()
+        self.url = url
+        self.size = size
+        self.name = name or url
+        self.app_name = app_name
+        self.download = download
+        self.fetched = 0
+        # Asset URLs redirect to short lived signed URLs, don't go through redirect on
+        # every request
+        self._resolved_url = url
+        self._pos = 0
+        self._windows: list[tuple[int, bytes]] = []
+        self._fetch_size = self.MIN_FETCH
+        self._last_end = -1
+
+    @classmethod
+    def open(
+        cls,
+        url: str,
+        size: int,
+        *,
+        name: str = "",
+        app_name: str = "",
+        download: Callable[[], bytes] | None = None,
+    ) -> HttpRangeReader | None:
+        """
+        Returns reader with tail of the file (where zip central directory is) already
+        fetched, or `None` if server doesn't support range requests, or fetching the
+        tail failed (in which case caller downloads whole file).
+        """
+        if not url.startswith(("http:", "https:")):
+            raise ValueError("URL must be 'http:' or 'https:'!")
+
+        reader = cls(url, size, name=name, app_name=app_name, download=download)
+        try:
+            reader._fill(max(0, size - cls.MIN_FETCH), cls.MIN_FETCH)
+        except _RangeRequestError as e:
+            logger.debug(
+                "Can't read %s with range requests: %s",
+                reader.name,
+                e,
+                extra={"app_name": app_name},
+            )
+            return None
+        return reader
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}!")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}!")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer) -> int:
+        # `zipfile` doesn't retry short reads, so buffer is always filled up to the end
+        # of file, from as many windows as needed
+        count = max(0, min(len(buffer), self.size - self._pos))
+        done = 0
+        while done < count:
+            start, data = self._window(self._pos) or self._fill_or_download(
+                self._pos, count - done
+            )
+            chunk = data[self._pos - start : self._pos - start + count - done]
+            buffer[done : done + len(chunk)] = chunk
+            done += len(chunk)
+            self._pos += len(chunk)
+        return done
+
+    def _window(self, pos: int) -> tuple[int, bytes] | None:
+        return next((w for w in self._windows if w[0] <= pos < w[0] + len(w[1])), None)
+
+    def _fill_or_download(self, pos: int, count: int) -> tuple[int, bytes]:
+        try:
+            return self._fill(pos, count)
+        except _RangeRequestError as e:
+            if self.download is None:
+                raise ValueError(f"Couldn't download {self.name}: {e}!") from e
+            logger.info(
+                "Range request failed (%s), downloading whole %s.",
+                e,
+                self.name,
+                extra={"app_name": self.app_name},
+            )
+
+        data = self.download()
+        if len(data) != self.size:
+            raise ValueError(f"Downloaded {self.name} has unexpected size!")
+        # Covers whole file, so nothing is fetched any more
+        self._windows = [(0, data)]
+        return self._windows[0]
+
+    def _fill(self, pos: int, count: int) -> tuple[int, bytes]:
+        if pos == self._last_end:
+            self._fetch_size = min(self._fetch_size * 2, self.MAX_FETCH)
+        else:
+            self._fetch_size = self.MIN_FETCH
+
+        end = min(self.size, pos + max(count, self._fetch_size))
+        try:
+            window = (pos, self._fetch(pos, end))
+        except _RangesNotSupportedError as e:
+            raise _RangeRequestError("server doesn't support range requests") from e
+        except (OSError, ValueError) as e:
+            # HTTPError (ie. 403, 416) and URLError are OSErrors too
+            raise _RangeRequestError(str(e)) from e
+
+        self._last_end = end
+        self._windows = [*self._windows[-(self._MAX_WINDOWS - 1) :], window]
+        return window
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        try:
+            return self._fetch_from(self._resolved_url, start, end)
+        except urllib.error.HTTPError:
+            if self._resolved_url == self.url:
+                raise
+        # Signed URL expired, go through redirect again
+        self._resolved_url = self.url
+        return self._fetch_from(self.url, start, end)
+
+    def _fetch_from(self, url: str, start: int, end: int) -> bytes:
+        logger.debug(
+            "Fetching bytes %d-%d of %s",
+            start,
+            end - 1,
+            self.name,
+            extra={"app_name": self.app_name},
+        )
+        request = urllib.request.Request(  # noqa: S310
+            url=url, headers={"Range": f"bytes={start}-{end - 1}"}
+        )
+        with urllib.request.urlopen(request) as response:  # noqa: S310
+            if response.status != 206:  # noqa: PLR2004
+                raise _RangesNotSupportedError
+            content_range = response.headers.get("Content-Range", "")
+            if not content_range.endswith(f"/{self.size}"):
+                raise ValueError(
+                    f"Unexpected Content-Range {content_range!r} for {self.name}!"
+                )
+            self._resolved_url = response.url
+            data = response.read()
+
+        if len(data) != end - start:
+            raise ValueError(f"Short read of {self.name}!")
+        self.fetched += len(data)
+        return data
+
 
 _CACHE = GhCache()
 
+_GITHUB_URL: Final[str] = "https://github.com"
+
+# Release data pinned by lockfile, by `(owner, repo)`. When set, GitHub API is never
+# asked for release info and apps see only the pinned assets
+_pinned: dict[tuple[str, str], dict[str, Any]] | None = None
+
+# Base URL that replaces `https://github.com` in asset download URLs
+_mirror: str | None = None
+
+
+def pin_releases(releases: dict[tuple[str, str], dict[str, Any]] | None) -> None:
+    global _pinned  # noqa: PLW0603
+
+    _pinned = releases
+
+
+def set_mirror(url: str | None) -> None:
+    global _mirror  # noqa: PLW0603
+
+    if url and not url.startswith(("http:", "https:")):
+        raise ValueError("Mirror URL must be 'http:' or 'https:'!")
+    _mirror = url.rstrip("/") if url else None
+
+
+def set_max_downloads_size(size: int) -> None:
+    if size < 0:
+        raise ValueError("Download cache size can't be negative!")
+    _CACHE.max_downloads_size = size
+
+
+def _download_url(url: str) -> str:
+    if _mirror and url.startswith(f"{_GITHUB_URL}/"):
+        return _mirror + url.removeprefix(_GITHUB_URL)
+    return url
+
 
 class GithubApiClient:
     _GH_API_URL: Final[str] = "https://api.github.com/repos"
@@ -254,6 +795,15 @@ class GithubApiClient:
         self.repo = repo
         self.owner = owner
 
+        # Assets of the latest release requested through this client: name -> digest
+        self.used_assets: dict[str, str | None] = {}
+
+        # Only record which assets would be used, without downloading anything that
+        # isn't cached (see `plan`)
+        self.planning = False
+
+        self._pinned_release: GhRelease | None = None
+
     def _gh_releases(self) -> list[dict]:
         logger.info(
             "Fetching latest GitHub release info for %s/%s",
@@ -284,6 +834,9 @@ class GithubApiClient:
 
     @property
     def latest_release(self) -> GhRelease:
+        if _pinned is not None:
+            return self._locked_release()
+
         entry = _CACHE.get_release(self.owner, self.repo)
         if entry:
             return entry
@@ -308,6 +861,18 @@ class GithubApiClient:
 
         return entry
 
+    def _locked_release(self) -> GhRelease:
+        # Not added to release cache, pinned release isn't necessarily the latest one
+        # and has only the locked assets
+        if self._pinned_release is None:
+            data = (_pinned or {}).get((self.owner, self.repo))
+            if data is None:
+                raise ValueError(f"{self.owner}/{self.repo} isn't in lockfile!")
+            self._pinned_release = GhRelease(
+                owner=self.owner, repo=self.repo, data=data
+            )
+        return self._pinned_release
+
     def downloaded_asset(self, named: str) -> GhDownloadedAsset:
         if named == "tarball":
             gh_id = self.latest_release.gh_id
@@ -315,12 +880,18 @@ class GithubApiClient:
             gh_id = self.latest_release.asset_id(named)
         if not gh_id:
             raise ValueError(f"No such asset name {named}!")
+        digest = None if named == "tarball" else self.latest_release.asset_digest(named)
+        self.used_assets.setdefault(named, digest)
 
         entry: GhDownloadedAsset | None = _CACHE.get_downloaded_asset(
             self.owner, self.repo, named, gh_id
         )
         if entry:
             return entry
+        if self.planning:
+            return GhDownloadedAsset(
+                gh_id=gh_id, owner=self.owner, repo=self.repo, name=named
+            )
 
         if named == "tarball":
             url = self.latest_release.tarball_url
@@ -328,23 +899,225 @@ class GithubApiClient:
             url = self.latest_release.asset_download_url(named)
         if not url:
             raise ValueError(f"No such asset name {named}!")
+        url = _download_url(url)
         if not url.startswith(("http:", "https:")):
             raise ValueError("URL must be 'http:' or 'https:'!")
 
         logger.info("Downloading %s from GitHub.", named, extra={"app_name": self.repo})
-        data: bytes | None = None
+        data = self._fetch(url, named, digest)
+        logger.info("Downloaded %s from GitHub.", named, extra={"app_name": self.repo})
+        entry = GhDownloadedAsset(
+            owner=self.owner, repo=self.repo, name=named, data=data, gh_id=gh_id
+        )
+        _CACHE.add_downloaded_asset(entry)
+
+        return entry
+
+    _DOWNLOAD_CHUNK: Final[int] = 1024 * 1024
+
+    def _fetch(self, url: str, named: str, digest: str | None) -> bytes:
+        """
+        Downloads `url`, verifying `digest` (if known) while data arrives, so that it
+        doesn't need another pass over it.
+        """
+        hasher = hashlib.sha256()
+        chunks = []
         try:
             with urllib.request.urlopen(url) as response:  # noqa: S310
-                data = response.read()
+                while chunk := response.read(self._DOWNLOAD_CHUNK):
+                    hasher.update(chunk)
+                    chunks.append(chunk)
         except Exception as e:
             raise ValueError(f"Couldn't download {named} from GitHub!") from e
-        if not data:
+        if not chunks:
             raise ValueError(f"Couldn't download {named} from GitHub!")
 
-        logger.info("Downloaded %s from GitHub.", named, extra={"app_name": self.repo})
-        entry = GhDownloadedAsset(
-            owner=self.owner, repo=self.repo, name=named, data=data, gh_id=gh_id
+        algorithm, _, expected = (digest or "").partition(":")
+        if algorithm == "sha256" and hasher.hexdigest() != expected:
+            raise ValueError(
+                f"Downloaded {named} has sha256 {hasher.hexdigest()}, expected "
+                f"{expected}!"
+            )
+
+        return b"".join(chunks)
+
+    _RAW_URL: Final[str] = "https://raw.githubusercontent.com"
+    "https://raw.githubusercontent.com/OWNER/REPO/TAG/PATH"
+
+    def repo_files(self, *paths: str) -> dict[str, bytes]:
+        """
+        Files at `paths` (relative to repository root) from source tree at the latest
+        release tag.
+
+        Each file is fetched as raw content. If that fails, source tarball is streamed
+        instead and reading stops as soon as all of `paths` were found. Results are
+        cached per tag.
+        """
+        release = self.latest_release
+        cached = _CACHE.repo_files(self.owner, self.repo, release.tag_name)
+        if self.planning:
+            return {
+                path: data for path in paths if (data := cached.get(path)) is not None
+            }
+
+        retv: dict[str, bytes] = {}
+        fetched: dict[str, bytes] = {}
+        for path in paths:
+            data = cached.get(path)
+            if data is not None:
+                retv[path] = data
+                continue
+            data = self._raw_repo_file(release.tag_name, path)
+            if data is not None:
+                fetched[path] = data
+
+        missing = [_ for _ in paths if _ not in retv and _ not in fetched]
+        if missing:
+            fetched.update(self._tarball_repo_files(missing))
+
+        missing = [_ for _ in missing if _ not in fetched]
+        if missing:
+            raise ValueError(
+                f"Can't find {missing} in {self.owner}/{self.repo} at "
+                f"{release.tag_name}!"
+            )
+
+        for path, data in fetched.items():
+            cached.add(path, data)
+        retv.update(fetched)
+
+        return retv
+
+    def _raw_repo_file(self, tag: str, path: str) -> bytes | None:
+        url = "/".join(
+            (
+                self._RAW_URL,
+                self.owner,
+                self.repo,
+                urllib.parse.quote(tag, safe=""),
+                urllib.parse.quote(path),
+            )
         )
-        _CACHE.add_downloaded_asset(entry)
+        logger.info("Downloading %s from GitHub.", path, extra={"app_name": self.repo})
+        try:
+            with urllib.request.urlopen(url) as response:  # noqa: S310
+                return response.read()
+        except Exception as e:
+            logger.debug("Can't download %s: %s", url, e, extra={"app_name": self.repo})
+            return None
+
+    def _tarball_repo_files(self, paths: list[str]) -> dict[str, bytes]:
+        # Cached tarball is used if available, otherwise it is streamed and download
+        # is abandoned once all `paths` were found
+        release = self.latest_release
+        cached = _CACHE.get_downloaded_asset(
+            self.owner, self.repo, "tarball", release.gh_id
+        )
+        if not release.tarball_url.startswith(("http:", "https:")):
+            raise ValueError("URL must be 'http:' or 'https:'!")
 
-        return entry
+        logger.info(
+            "Reading %s from GitHub source tarball.",
+            ", ".join(paths),
+            extra={"app_name": self.repo},
+        )
+        retv: dict[str, bytes] = {}
+        try:
+            with contextlib.ExitStack() as stack:
+                if cached:
+                    fileobj = io.BytesIO(cached.data)
+                else:
+                    fileobj = stack.enter_context(
+                        urllib.request.urlopen(release.tarball_url)  # noqa: S310
+                    )
+                stream = stack.enter_context(open_decompressed(fileobj, "gz"))
+                tar = stack.enter_context(tarfile.open(fileobj=stream, mode="r|"))
+                for member_info in tar:
+                    # Tarball has single top level "<owner>-<repo>-<sha>/" directory
+                    path = member_info.path.partition("/")[2]
+                    if member_info.isfile() and path in paths:
+                        retv[path] = tar.extractfile(member_info).read()  # type: ignore
+                        if len(retv) == len(paths):
+                            break
+        except Exception as e:
+            raise ValueError(
+                f"Couldn't read source tarball of {self.owner}/{self.repo}!"
+            ) from e
+
+        return retv
+
+    def extractor(self, named: str) -> ArchiveExtractor:
+        """
+        `ArchiveExtractor` for release asset `named` (or `"tarball"`).
+
+        Asset is downloaded (or loaded from cache) only if some of the requested members
+        haven't already been extracted from it in some of the previous runs.
+        """
+        if named == "tarball":
+            gh_id = self.latest_release.gh_id
+            archive = "tarball.tar.gz"
+            digest = None
+        else:
+            gh_id = self.latest_release.asset_id(named)
+            archive = named
+            digest = self.latest_release.asset_digest(named)
+        if not gh_id:
+            raise ValueError(f"No such asset name {named}!")
+        self.used_assets[named] = digest
+        if self.planning:
+            return _PlannedExtractor(named)  # type: ignore
+
+        return ArchiveExtractor(
+            archive,
+            loader=lambda: self._load_archive(named, gh_id),
+            artifacts=_CACHE.extracted_artifacts(
+                self.owner, self.repo, named, gh_id, digest
+            ),
+        )
+
+    def is_cached(self, named: str) -> bool:
+        """
+        Is asset of the latest release already downloaded (or are all of its members
+        that were ever needed already extracted)?
+        """
+        release = self.latest_release
+        gh_id = release.gh_id if named == "tarball" else release.asset_id(named)
+        if not gh_id:
+            return False
+        return _CACHE.has_downloaded_asset(self.owner, self.repo, named, gh_id)
+
+    def _load_archive(self, named: str, gh_id: int) -> bytes | BinaryIO:
+        """
+        Zip assets that aren't cached yet are read remotely, fetching only central
+        directory and requested members. Everything else, and zips from servers that
+        don't support range requests, are downloaded whole.
+        """
+        cached = _CACHE.get_downloaded_asset(self.owner, self.repo, named, gh_id)
+        if cached:
+            return cached.data
+
+        url = self.latest_release.asset_download_url(named)
+        size = self.latest_release.asset_size(named)
+        # Locked installs always download whole asset, so that its digest is verified
+        if url and size and named.lower().endswith(".zip") and _pinned is None:
+            reader = HttpRangeReader.open(
+                _download_url(url),
+                size,
+                name=named,
+                app_name=self.repo,
+                download=lambda: self.downloaded_asset(named).data,
+            )
+            if reader:
+                logger.info(
+                    "Reading %s from GitHub using range requests.",
+                    named,
+                    extra={"app_name": self.repo},
+                )
+                return reader
+            logger.debug(
+                "Downloading whole %s",
+                named,
+                extra={"app_name": self.repo},
+            )
+
+        return self.downloaded_asset(named).data
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+from contextlib import ExitStack
+from datetime import UTC, datetime
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Final
+
+from .app_files import DOC_PERM
+from .receipts import InstallReceipt, ReceiptFile
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .app_files import InstallFile
+    from .bundle import BundleEntry
+
+DEFAULT_NAME: Final[str] = "usr-local-pull-layer.tar"
+
+# Mode of directories leading to installed files
+DIR_PERM: Final[int] = 0o755
+
+
+def source_date_epoch() -> int:
+    """
+    Timestamp of everything in layer: `$SOURCE_DATE_EPOCH` (see
+    https://reproducible-builds.org/specs/source-date-epoch/), or 0 if it isn't set.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH", "")
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"Invalid SOURCE_DATE_EPOCH {value!r}!") from e
+
+
+def write(
+    prepared: Sequence[tuple[BundleEntry, list[InstallFile]]],
+    prefix: Path,
+    path: Path,
+    *,
+    mtime: int,
+) -> int:
+    """
+    Writes prepared files of apps (see `bundle.prepare()`), together with their install
+    receipts, as container image layer at `path`: tarball of root filesystem with
+    everything under `prefix`. Layer is gzipped if `path` ends with `.gz`.
+
+    The same files and `mtime` always give byte-identical layer: entries are sorted,
+    all of them have `mtime` and are owned by root, files have their install mode and
+    directories `DIR_PERM`. Returns number of entries.
+    """
+    installed_at = datetime.fromtimestamp(mtime, UTC).isoformat()
+    # Relative to prefix -> content and mode
+    files: dict[Path, tuple[bytes, int]] = {}
+    for entry, app_files in prepared:
+        for _ in app_files:
+            files[_.path.relative_to(prefix)] = (_.content(), _.mode)
+
+        receipt = entry.receipt(
+            [
+                ReceiptFile(
+                    path=_.path,
+                    size=_.size,
+                    mtime_ns=mtime * 1_000_000_000,
+                    sha256=_.sha256,
+                )
+                for _ in entry.files
+            ]
+        )
+        receipt.installed_at = installed_at
+        files[InstallReceipt.path(Path(), entry.app_name)] = (
+            receipt.to_json(),
+            DOC_PERM,
+        )
+
+    root = PurePosixPath(prefix.relative_to(prefix.anchor))
+    members = {root / _: value for _, value in files.items()}
+    dirs = {
+        parent for _ in members for parent in _.parents if parent != PurePosixPath(".")
+    }
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with ExitStack() as stack:
+            f = stack.enter_context(os.fdopen(fd, "wb"))
+            if path.name.endswith(".gz"):
+                # No file name and fixed mtime in gzip header
+                f = stack.enter_context(
+                    gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=mtime)
+                )
+            tar = stack.enter_context(
+                tarfile.open(fileobj=f, mode="w", format=tarfile.GNU_FORMAT)
+            )
+
+            for name in sorted(dirs | members.keys()):
+                info = tarfile.TarInfo(name.as_posix())
+                info.mtime = mtime
+                info.uid = info.gid = 0
+                info.uname = info.gname = "root"
+                if name in dirs:
+                    info.type = tarfile.DIRTYPE
+                    info.mode = DIR_PERM
+                    tar.addfile(info)
+                else:
+                    data, info.mode = members[name]
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+        Path(tmp_path).replace(path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    return len(dirs) + len(members)
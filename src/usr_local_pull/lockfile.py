@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from .gh_client import GhRelease
+from .pipeline import DEFAULT_WORKERS, Stage
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .app import GitHubApp
+    from .gh_client import GithubApiClient
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LockedAsset:
+    name: str
+    id: int
+    url: str
+    size: int | None
+    # Hex digest, always known (computed from downloaded asset if GitHub didn't
+    # publish one)
+    sha256: str
+
+
+@dataclass
+class LockedApp:
+    owner: str
+    repo: str
+    version: str
+    release_id: int
+    tag_name: str
+    release_name: str | None
+    tarball_url: str
+    assets: list[LockedAsset] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, client: GithubApiClient) -> LockedApp:
+        """
+        Latest release of `client`'s repo, with the assets that were requested through
+        it (ie. by running app's download stage).
+        """
+        release = client.latest_release
+
+        assets = []
+        for name, digest in sorted(client.used_assets.items()):
+            if name == "tarball":
+                continue
+
+            algorithm, _, sha256 = (digest or "").partition(":")
+            if algorithm != "sha256":
+                logger.info(
+                    "GitHub didn't publish digest of %s, computing it.",
+                    name,
+                    extra={"app_name": client.repo},
+                )
+                data = client.downloaded_asset(name).data
+                sha256 = hashlib.sha256(data).hexdigest()
+
+            assets.append(
+                LockedAsset(
+                    name=name,
+                    id=release.asset_id(name),  # type: ignore
+                    url=release.asset_download_url(name),  # type: ignore
+                    size=release.asset_size(name),
+                    sha256=sha256,
+                )
+            )
+
+        return cls(
+            owner=client.owner,
+            repo=client.repo,
+            version=str(release.version),
+            release_id=release.gh_id,
+            tag_name=release.tag_name,
+            release_name=release.data.get("name"),
+            tarball_url=release.tarball_url,
+            assets=assets,
+        )
+
+    def release_data(self) -> dict[str, Any]:
+        """
+        GitHub API release data, as if fetched from GitHub, with only the locked assets
+        in it.
+        """
+        return {
+            "id": self.release_id,
+            "tag_name": self.tag_name,
+            "name": self.release_name,
+            "tarball_url": self.tarball_url,
+            "assets": [
+                {
+                    "id": _.id,
+                    "name": _.name,
+                    "browser_download_url": _.url,
+                    "size": _.size,
+                    "digest": f"sha256:{_.sha256}",
+                }
+                for _ in self.assets
+            ],
+            GhRelease.DOWNLOADED_AT_KEY: datetime.now(UTC).isoformat(),
+        }
+
+
+@dataclass
+class Lockfile:
+    """
+    Exact releases and assets of all apps, resolved once by `usr-local-pull lock` and
+    then installed with `install --locked` anywhere, without asking GitHub API.
+    """
+
+    # App name -> its locked release
+    apps: dict[str, LockedApp] = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+    FORMAT: ClassVar[int] = 1
+    DEFAULT_NAME: ClassVar[str] = "usr-local-pull.lock.json"
+
+    @classmethod
+    def resolve(cls, apps: Sequence[GitHubApp]) -> Lockfile:
+        """
+        Locks latest release of each of `apps`, with assets their download stage
+        chooses from it. Nothing is extracted, and only assets without published digest
+        are downloaded.
+        """
+        with ThreadPoolExecutor(DEFAULT_WORKERS[Stage.METADATA]) as pool:
+            locked = list(pool.map(_lock, apps))
+        return cls(apps={app.name: _ for app, _ in zip(apps, locked, strict=True)})
+
+    @classmethod
+    def load(cls, path: Path) -> Lockfile:
+        try:
+            with path.open("r") as f:
+                data = json.load(f)
+        except Exception as e:
+            raise ValueError(f"Can't read lockfile {path}: {e}!") from e
+        if data.get("format") != cls.FORMAT:
+            raise ValueError(
+                f"Lockfile {path} has unsupported format {data.get('format')!r}!"
+            )
+
+        try:
+            return cls(
+                apps={
+                    name: LockedApp(
+                        **{
+                            **app,
+                            "assets": [LockedAsset(**_) for _ in app["assets"]],
+                        }
+                    )
+                    for name, app in data["apps"].items()
+                },
+                created_at=data["created_at"],
+            )
+        except Exception as e:
+            raise ValueError(f"Invalid lockfile {path}: {e}!") from e
+
+    def save(self, path: Path) -> None:
+        data = {"format": self.FORMAT, **asdict(self)}
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.write("\n")
+            Path(tmp_path).replace(path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @property
+    def releases(self) -> dict[tuple[str, str], dict[str, Any]]:
+        """
+        Release data of each locked `(owner, repo)`, see `gh_client.pin_releases()`.
+        """
+        return {(_.owner, _.repo): _.release_data() for _ in self.apps.values()}
+
+
+def _lock(app: GitHubApp) -> LockedApp:
+    # Assets are chosen in download stage, which in planning mode only records them
+    # without fetching or extracting anything (see `plan`). Only assets GitHub didn't
+    # publish digest of are then downloaded, by `LockedApp.of()`
+    if inspect.isgeneratorfunction(app.download):
+        app.client.planning = True
+        try:
+            next(app.stages(), None)
+        finally:
+            app.client.planning = False
+    else:
+        app.download()
+
+    logger.info(
+        "Locked %s.", app.latest_available_version, extra={"app_name": app.name}
+    )
+    return LockedApp.of(app.client)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import shutil
+import subprocess
+import threading
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from .app_files import ManPage
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds single `mandb` invocation may take before it is killed
+MANDB_TIMEOUT: Final[float] = 60
+
+_COMPRESSED_SUFFIXES: Final[tuple[str, ...]] = (".gz", ".bz2", ".xz", ".lzma", ".zst")
+
+_compress: bool = False
+_update_index: bool = False
+
+# `mandb` locks its database anyway, this just avoids waiting on that lock
+_MANDB_LOCK = threading.Lock()
+
+
+def configure(*, compress: bool, update_index: bool) -> None:
+    global _compress, _update_index  # noqa: PLW0603
+
+    _compress = compress
+    _update_index = update_index
+
+
+def is_installed_as_is(page: ManPage) -> bool:
+    return not _compress or page.file_name.endswith(_COMPRESSED_SUFFIXES)
+
+
+def install_name_and_data(page: ManPage) -> tuple[str, bytes]:
+    """
+    File name and content with which `page` gets installed.
+
+    When compression is on, pages that aren't already compressed are gzipped.
+    Compression is deterministic (no name, `mtime=0` in gzip header), so the same
+    page always produces the same file, and reinstalling it is recognized as no
+    change.
+    """
+    if is_installed_as_is(page):
+        return page.file_name, page.content()
+
+    return (
+        f"{page.file_name}.gz",
+        gzip.compress(page.content(), compresslevel=9, mtime=0),
+    )
+
+
+def update_index(paths: Iterable[Path], *, app_name: str = "") -> None:
+    """
+    Updates `mandb` index entries of just the given (added or changed) man pages,
+    instead of rebuilding whole index.
+    """
+    paths = list(paths)
+    if not _update_index or not paths:
+        return
+
+    mandb = shutil.which("mandb")
+    if not mandb:
+        logger.warning(
+            "Can't find `mandb` on $PATH, not updating man index.",
+            extra={"app_name": app_name},
+        )
+        return
+
+    with _MANDB_LOCK:
+        for path in paths:
+            try:
+                subprocess.run(  # noqa: S603
+                    [mandb, "--quiet", "--filename", path.as_posix()],
+                    shell=False,
+                    check=True,
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    timeout=MANDB_TIMEOUT,
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning(
+                    "Failed to update man index for %s: %s",
+                    path,
+                    e,
+                    extra={"app_name": app_name},
+                )
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from .app_files import StoredFile
+
+logger = logging.getLogger(__name__)
+
+# How files get into prefix when they are already in extracted artifacts cache:
+#
+# - "auto"            - reflink, then `copy_file_range`, then streamed copy
+# - "reflink"         - `FICLONE` ioctl: new file shares extents with the cached one
+#                       until either of them is modified (btrfs, XFS, bcachefs, ...).
+#                       Needs both in the same filesystem
+# - "copy_file_range" - in-kernel copy, no data goes through userspace; some
+#                       filesystems (NFS, ...) do it server side or as reflink
+# - "hardlink"        - installed file IS the cached one (same inode); cheapest, but
+#                       they share mode and ownership and cache eviction doesn't free
+#                       any space while file stays installed. Needs both in the same
+#                       filesystem, and cache owned by root (see `_is_root_owned()`),
+#                       otherwise it works as "auto"
+# - "copy"            - always write file content from memory
+#
+# Each mode except "copy" falls back to streamed copy when it can't be used. Cached
+# file is used only if it wasn't changed since cache wrote it (`StoredFile.is_intact()`),
+# otherwise data is written.
+MODES: Final[tuple[str, ...]] = (
+    "auto",
+    "reflink",
+    "copy_file_range",
+    "hardlink",
+    "copy",
+)
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE: Final[int] = 0x40049409
+
+_mode: str = "auto"
+
+
+def set_mode(name: str) -> None:
+    global _mode  # noqa: PLW0603
+
+    if name not in MODES:
+        raise ValueError(f"Unknown link mode {name}!")
+    _mode = name
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def create_temp(
+    path: Path, data: bytes | None, source: StoredFile | None = None
+) -> Path:
+    """
+    Creates temp file next to `path`, with `data` as its content.
+
+    If `source` is given, it is a file with the same content in extracted artifacts
+    cache, from which the temp file is created without going through Python at all
+    (`data` may then be `None`, it is read from `source` only if that can't be done).
+    """
+    mode = _mode if source is not None and source.is_intact() else "copy"
+
+    if mode == "hardlink":
+        if _is_root_owned(source.path):  # type: ignore
+            try:
+                return _hardlink(source.path, path)  # type: ignore
+            except OSError as e:
+                logger.debug("can't hardlink %s, copying: %s", source.path, e)  # type: ignore
+        else:
+            logger.debug("%s isn't owned by root, not hardlinking it", source.path)  # type: ignore
+            mode = "auto"
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if mode == "copy" or not _clone(source.path, f, mode):  # type: ignore
+                f.write(data if data is not None else source.read())  # type: ignore
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    return Path(tmp_path)
+
+
+def _is_root_owned(path: Path) -> bool:
+    """
+    Hardlinked file shares its inode (content, mode, owner) with the cached one, so
+    whoever can change the cached file changes installed one too. Only root-owned
+    file in root-owned directory, neither of them writable by others, is safe for that.
+    """
+    try:
+        for st in (path.stat(), path.parent.stat()):
+            if st.st_uid != 0 or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def _hardlink(source: Path, path: Path) -> Path:
+    while True:
+        tmp_path = path.with_name(f".{path.name}.{os.urandom(4).hex()}")
+        try:
+            os.link(source, tmp_path)
+        except FileExistsError:
+            continue
+        return tmp_path
+
+
+def _clone(source: Path, dst: IO[bytes], mode: str) -> bool:
+    """
+    Returns `False`, without writing anything into `dst`, if `source` can't be read.
+    """
+    try:
+        src = source.open("rb")
+    except OSError as e:
+        logger.debug("can't open %s, copying: %s", source, e)
+        return False
+
+    with src:
+        if mode in ("auto", "reflink"):
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            except OSError as e:
+                logger.debug("can't reflink %s: %s", source, e)
+            else:
+                return True
+
+        if mode in ("auto", "copy_file_range"):
+            try:
+                _copy_file_range(src, dst)
+            except OSError as e:
+                logger.debug("can't copy_file_range %s: %s", source, e)
+                dst.seek(0)
+                dst.truncate()
+            else:
+                return True
+
+        shutil.copyfileobj(src, dst)
+        return True
+
+
+def _copy_file_range(src: IO[bytes], dst: IO[bytes]) -> None:
+    size = os.fstat(src.fileno()).st_size
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(
+            src.fileno(), dst.fileno(), size - offset, offset, offset
+        )
+        if copied == 0:
+            raise OSError(f"source ended after {offset} of {size} bytes")
+        offset += copied
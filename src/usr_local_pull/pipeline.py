@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import logging
+import operator
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Final
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+    from pathlib import Path
+
+    from .app import App
+
+
+logger = logging.getLogger(__name__)
+
+
+class Stage(Enum):
+    """
+    Install stages, in order in which each app goes through them.
+
+    `App.download()` implementations are generators that start in `DOWNLOAD` stage and
+    yield the stage in which the rest of their work should be done, ie.:
+
+        def download(self):
+            pending = self.client.extractor(asset_name).prefetch(...)  # network
+
+            yield Stage.EXTRACT
+            self.add_selected(pending.select())  # CPU
+
+            yield Stage.GENERATE
+            self.zsh_completions = ...  # subprocesses
+    """
+
+    # Fetching release info and finding out installed version
+    METADATA = "metadata"
+    DOWNLOAD = "download"
+    EXTRACT = "extract"
+    # Running downloaded binaries to generate completions and man pages
+    GENERATE = "generate"
+    # Writing files into prefix
+    COMMIT = "commit"
+
+
+DEFAULT_WORKERS: Final[dict[Stage, int]] = {
+    Stage.METADATA: 8,
+    Stage.DOWNLOAD: 4,
+    Stage.EXTRACT: os.cpu_count() or 1,
+    Stage.GENERATE: 4,
+    Stage.COMMIT: 1,
+}
+
+
+@dataclass
+class _Job:
+    index: int
+    app: App
+    steps: Iterator[Stage] | None = field(default=None, repr=False)
+
+
+class InstallPipeline:
+    """
+    Installs apps concurrently, in stages connected by queues.
+
+    Each stage has its own pool of worker threads, so that ie. one app is being
+    downloaded while another one is being decompressed and third one is generating
+    its completions. Files are written into prefix by `COMMIT` stage only after app
+    went through all previous ones.
+    """
+
+    def __init__(
+        self,
+        apps: Sequence[App],
+        workers: dict[Stage, int] | None = None,
+        *,
+        check: Callable[[App], bool] | None = None,
+        commit: Callable[[App], list[Path]] | None = None,
+    ) -> None:
+        """
+        `check` and `commit` replace what metadata and commit stages do with each app
+        (`App.check_for_update()` and `App.commit()`), ie. to collect prepared files
+        instead of writing them into prefix.
+        """
+        self.apps = list(apps)
+        self._check = check or operator.methodcaller("check_for_update")
+        self._commit = commit or operator.methodcaller("commit")
+        self.workers = {**DEFAULT_WORKERS, **(workers or {})}
+        for stage, count in self.workers.items():
+            if count < 1:
+                raise ValueError(f"Stage {stage.value} needs at least one worker!")
+
+        self._queues: dict[Stage, queue.Queue[_Job | None]] = {
+            _: queue.Queue() for _ in Stage
+        }
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._done = threading.Event()
+        self._results: dict[int, list[Path]] = {}
+        self._errors: list[Exception] = []
+
+    def run(self) -> list[Path]:
+        """
+        Returns installed files, in order of apps.
+
+        If any app fails, remaining apps are still installed and then the first error
+        is raised.
+        """
+        self._remaining = len(self.apps)
+        if not self.apps:
+            return []
+
+        threads = [
+            threading.Thread(
+                target=self._worker,
+                args=(stage,),
+                name=f"{stage.value}-{i}",
+                daemon=True,
+            )
+            for stage in Stage
+            for i in range(self.workers[stage])
+        ]
+        for thread in threads:
+            thread.start()
+
+        for idx, app in enumerate(self.apps):
+            self._queues[Stage.METADATA].put(_Job(idx, app))
+
+        self._done.wait()
+
+        for stage in Stage:
+            for _ in range(self.workers[stage]):
+                self._queues[stage].put(None)
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return [path for idx in sorted(self._results) for path in self._results[idx]]
+
+    def _worker(self, stage: Stage) -> None:
+        while True:
+            job = self._queues[stage].get()
+            if job is None:
+                return
+
+            try:
+                next_stage = self._step(stage, job)
+            except Exception as e:
+                logger.exception(
+                    "Failed in %s stage.",
+                    stage.value,
+                    extra={"app_name": job.app.name},
+                )
+                with self._lock:
+                    self._errors.append(e)
+                next_stage = None
+
+            if next_stage:
+                self._queues[next_stage].put(job)
+            else:
+                self._finish()
+
+    def _step(self, stage: Stage, job: _Job) -> Stage | None:
+        if stage == Stage.METADATA:
+            if not self._check(job.app):
+                self._results[job.index] = []
+                return None
+            job.steps = job.app.stages()
+            return Stage.DOWNLOAD
+
+        if stage == Stage.COMMIT:
+            self._results[job.index] = self._commit(job.app)
+            return None
+
+        next_stage = next(job.steps, Stage.COMMIT)  # type: ignore
+        if next_stage == Stage.METADATA:
+            raise ValueError(f"{job.app.name} can't go back to metadata stage!")
+        return next_stage
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._done.set()
+
+
+class PrefixFanOut:
+    """
+    `check` and `commit` for `InstallPipeline` that install each app into several
+    prefixes, with single metadata, download, extract and generate pass.
+
+    Installed version is checked in each prefix separately, app goes through the rest
+    of the pipeline if any of them needs it and is then committed (concurrently) only
+    into those that do, each with its own transaction and receipt.
+    """
+
+    def __init__(self, prefixes: Sequence[Path]) -> None:
+        self.prefixes = list(prefixes)
+        # App name -> prefixes that need it installed
+        self._pending: dict[str, list[Path]] = {}
+        self._lock = threading.Lock()
+
+    def check(self, app: App) -> bool:
+        pending = [_ for _ in self.prefixes if app.at_prefix(_).check_for_update()]
+        with self._lock:
+            self._pending[app.name] = pending
+        return bool(pending)
+
+    def commit(self, app: App) -> list[Path]:
+        """
+        Returns files installed into all prefixes. If commit into any of them fails,
+        others are still committed and then the first error is raised.
+        """
+        with self._lock:
+            prefixes = self._pending.pop(app.name, [])
+        if not prefixes:
+            return []
+
+        logger.info(
+            "Installing into %s.",
+            ", ".join(_.as_posix() for _ in prefixes),
+            extra={"app_name": app.name},
+        )
+        with ThreadPoolExecutor(len(prefixes)) as pool:
+            futures = [pool.submit(app.at_prefix(_).commit) for _ in prefixes]
+
+        errors = []
+        for prefix, future in zip(prefixes, futures, strict=True):
+            if error := future.exception():
+                logger.error(
+                    "Failed to install into %s: %s",
+                    prefix,
+                    error,
+                    extra={"app_name": app.name},
+                )
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+        return [path for _ in futures for path in _.result()]
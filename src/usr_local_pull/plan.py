@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from .pipeline import DEFAULT_WORKERS, Stage
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .app import GitHubApp
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlannedAsset:
+    name: str
+    # As published in release metadata
+    size: int | None
+    cached: bool
+
+
+@dataclass
+class AppPlan:
+    """
+    What installing single app would do.
+    """
+
+    app_name: str
+    installed: str | None = None
+    latest: str | None = None
+    needs_install: bool = False
+    assets: list[PlannedAsset] = field(default_factory=list)
+    # How long it took to find out all of the above
+    seconds: float = 0
+    error: str | None = None
+
+    @property
+    def download_size(self) -> int:
+        """
+        Estimated bytes to download: sizes of assets that aren't cached. Zip assets
+        are usually read only partially, so it is upper bound.
+        """
+        if not self.needs_install:
+            return 0
+        return sum(_.size or 0 for _ in self.assets if not _.cached)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "download_size": self.download_size}
+
+
+def plan(apps: Sequence[GitHubApp]) -> list[AppPlan]:
+    """
+    Finds out installed and latest version of each of `apps` (concurrently) and which
+    assets installing it would download, without changing anything.
+    """
+    with ThreadPoolExecutor(DEFAULT_WORKERS[Stage.METADATA]) as pool:
+        return list(pool.map(_plan, apps))
+
+
+def _plan(app: GitHubApp) -> AppPlan:
+    started = time.monotonic()
+    retv = AppPlan(app_name=app.name)
+    app.client.planning = True
+    try:
+        installed = app.installed_version
+        retv.installed = str(installed) if installed is not None else None
+        retv.latest = str(app.latest_available_version)
+        retv.needs_install = app.needs_install
+        retv.assets = _planned_assets(app)
+    except Exception as e:
+        logger.debug("Can't plan %s", app.name, exc_info=True)
+        retv.error = str(e)
+
+    retv.seconds = round(time.monotonic() - started, 3)
+    return retv
+
+
+def _planned_assets(app: GitHubApp) -> list[PlannedAsset]:
+    # Assets are chosen in download stage, in planning mode nothing is fetched and app
+    # doesn't get any further. Unstaged `download()` would run all the way through,
+    # with whatever it does after choosing assets
+    if not inspect.isgeneratorfunction(app.download):
+        raise ValueError(f"{app.name} download isn't staged, can't plan it!")
+    next(app.stages(), None)
+
+    return [
+        PlannedAsset(
+            name=_,
+            size=app.client.latest_release.asset_size(_),
+            cached=app.client.is_cached(_),
+        )
+        for _ in app.client.used_assets
+    ]
+
+
+def format_table(plans: Sequence[AppPlan]) -> str:
+    rows = [("APP", "INSTALLED", "LATEST", "ACTION", "DOWNLOAD", "TIME", "ASSETS")]
+    for _ in plans:
+        if _.error:
+            action = "error"
+        elif not _.needs_install:
+            action = "-"
+        else:
+            action = "update" if _.installed else "install"
+        assets = ", ".join(
+            f"{a.name} ({'cached' if a.cached else _format_size(a.size)})"
+            for a in _.assets
+        )
+        rows.append(
+            (
+                _.app_name,
+                _.installed or "-",
+                _.latest or "-",
+                action,
+                _format_size(_.download_size) if _.download_size else "-",
+                f"{_.seconds:.2f}s",
+                _.error or assets,
+            )
+        )
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    lines = [
+        "  ".join([*(c.ljust(w) for c, w in zip(row, widths, strict=False)), row[-1]])
+        for row in rows
+    ]
+
+    pending = [_ for _ in plans if _.needs_install and not _.error]
+    lines.append("")
+    lines.append(
+        f"{len(pending)} of {len(plans)} apps need install, "
+        f"{_format_size(sum(_.download_size for _ in pending))} to download."
+    )
+    return "\n".join(lines)
+
+
+def _format_size(size: int | None) -> str:
+    if size is None:
+        return "? B"
+    value = float(size)
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:  # noqa: PLR2004
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar, Final
+
+from packaging.version import parse as parse_version
+
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds single `--version` invocation may take before it is killed
+PROBE_TIMEOUT: Final[float] = 10
+
+
+@dataclass(frozen=True)
+class VersionProbe:
+    """
+    How to find out version of installed binary by running it.
+
+    Version is parsed from output of `<prefix>/bin/<exe_name> <args>`:
+
+    - if `regex` is given, from its first group
+    - otherwise from whitespace separated word at `index`; if that isn't valid version,
+      then from word at `index` after replacing dashes with spaces (`split_dashes` uses
+      only the latter)
+
+    If binary crashes or hangs and `fallback_version` is given, that one is assumed.
+    """
+
+    exe_name: str
+    index: int = -1
+    split_dashes: bool = False
+    regex: str | None = None
+    args: tuple[str, ...] = ("--version",)
+    merge_stderr: bool = False
+    fallback_version: str | None = None
+
+    def parse(self, output: str) -> Version | None:
+        if self.regex:
+            match = re.search(self.regex, output, re.MULTILINE)
+            return parse_version(match.group(1)) if match else None
+
+        if not self.split_dashes:
+            try:
+                return parse_version(output.split()[self.index])
+            except Exception:  # noqa: S110
+                pass
+
+        return parse_version(output.replace("-", " ").split()[self.index])
+
+
+class ProbeCache:
+    """
+    Outputs of already executed probes, stored in `~/.cache`.
+
+    Keyed by binary content hash, so binary is never executed twice with the same
+    arguments. To avoid hashing on every lookup, `(device, inode, mtime, size)` of
+    each probed binary is remembered together with its hash.
+    """
+
+    _MAX_ENTRIES: ClassVar[int] = 256
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or Path.home() / ".cache" / "usr-local-pull" / "probes.json"
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, str]] | None = None
+
+    @property
+    def _entries(self) -> dict[str, dict[str, str]]:
+        if self._data is None:
+            try:
+                with self.path.open("r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            self._data = {
+                "stats": data.get("stats", {}),
+                "outputs": data.get("outputs", {}),
+            }
+        return self._data
+
+    @classmethod
+    def _stat_key(cls, bin_path: Path) -> str:
+        st = bin_path.stat()
+        return f"{st.st_dev}:{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+
+    @classmethod
+    def _output_key(cls, digest: str, probe: VersionProbe) -> str:
+        return json.dumps([digest, probe.args, probe.merge_stderr])
+
+    def digest(self, bin_path: Path) -> str:
+        stat_key = self._stat_key(bin_path)
+        with self._lock:
+            digest = self._entries["stats"].get(stat_key)
+        if not digest:
+            with bin_path.open("rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+            with self._lock:
+                self._entries["stats"][stat_key] = digest
+        return digest
+
+    def get(self, digest: str, probe: VersionProbe) -> str | None:
+        with self._lock:
+            return self._entries["outputs"].get(self._output_key(digest, probe))
+
+    def add(self, digest: str, probe: VersionProbe, output: str) -> None:
+        with self._lock:
+            outputs = self._entries["outputs"]
+            outputs[self._output_key(digest, probe)] = output
+            # Oldest entries first, dict preserves insertion order
+            for key in list(outputs)[: -self._MAX_ENTRIES]:
+                del outputs[key]
+            stats = self._entries["stats"]
+            for key in list(stats)[: -self._MAX_ENTRIES]:
+                del stats[key]
+
+    def save(self) -> None:
+        with self._lock:
+            if self._data is None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.path.parent, prefix=f".{self.path.name}."
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._data, f)
+                Path(tmp_path).replace(self.path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+
+
+_CACHE = ProbeCache()
+
+
+def probe(
+    prefix: Path, version_probe: VersionProbe, *, app_name: str, save: bool = True
+) -> Version | None:
+    """
+    Version of `version_probe.exe_name` installed in `prefix`, or `None` if it isn't
+    installed or if it failed to report its version (which is logged as warning).
+
+    Without `save`, probe cache is only read (new outputs are kept in memory only).
+    """
+    retv = _probe(prefix, version_probe, app_name=app_name)
+    if save:
+        _CACHE.save()
+    return retv
+
+
+def _probe(
+    prefix: Path, version_probe: VersionProbe, *, app_name: str
+) -> Version | None:
+    bin_path = prefix / "bin" / version_probe.exe_name
+    if not bin_path.exists():
+        return None
+
+    digest = _CACHE.digest(bin_path)
+    output = _CACHE.get(digest, version_probe)
+    if output is None:
+        output = _run(bin_path, version_probe, app_name=app_name)
+        if output is None:
+            if version_probe.fallback_version:
+                logger.warning(
+                    "Assuming version %s.",
+                    version_probe.fallback_version,
+                    extra={"app_name": app_name},
+                )
+                return parse_version(version_probe.fallback_version)
+            return None
+        _CACHE.add(digest, version_probe, output)
+    else:
+        logger.debug("probe cache hit for %s", bin_path, extra={"app_name": app_name})
+
+    try:
+        retv = version_probe.parse(output)
+    except Exception as e:
+        raise RuntimeError(f"Failed to fetch local app version for {app_name}!") from e
+
+    if retv:
+        logger.debug("Found installed version %s", retv, extra={"app_name": app_name})
+    else:
+        logger.warning(
+            "Can't find %s version in output of `%s %s`, treating it as broken "
+            "install: %r",
+            app_name,
+            bin_path,
+            " ".join(version_probe.args),
+            output[:200],
+            extra={"app_name": app_name},
+        )
+
+    return retv
+
+
+def _run(bin_path: Path, version_probe: VersionProbe, *, app_name: str) -> str | None:
+    try:
+        proc = subprocess.run(  # noqa: S603
+            [bin_path.as_posix(), *version_probe.args],
+            shell=False,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if version_probe.merge_stderr else subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            encoding="utf-8",
+            errors="replace",
+            timeout=PROBE_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        reason = f"didn't finish in {PROBE_TIMEOUT}s"
+    except subprocess.CalledProcessError as e:
+        reason = f"exited with {e.returncode}"
+        if e.stderr and e.stderr.strip():
+            reason += f": {e.stderr.strip()[-200:]}"
+    except OSError as e:
+        reason = f"couldn't be run: {e}"
+    else:
+        return proc.stdout
+
+    logger.warning(
+        "%s didn't report its version, treating it as broken install: `%s %s` %s.",
+        app_name,
+        bin_path,
+        " ".join(version_probe.args),
+        reason,
+        extra={"app_name": app_name},
+    )
+    return None
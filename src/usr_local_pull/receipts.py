@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
+
+from packaging.version import parse as parse_version
+
+if TYPE_CHECKING:
+    import os
+
+    from packaging.version import Version
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReceiptFile:
+    # Relative to prefix
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    @classmethod
+    def of(
+        cls,
+        prefix: Path,
+        path: Path,
+        sha256: str | None = None,
+        *,
+        st: os.stat_result | None = None,
+    ) -> ReceiptFile:
+        """
+        `sha256` of file content and its `stat`, if already known (ie. of temp file that
+        is yet to be renamed to `path`).
+        """
+        st = st or path.stat()
+        return cls(
+            path=path.relative_to(prefix).as_posix(),
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            sha256=sha256 or sha256_of(path),
+        )
+
+    def is_intact(self, prefix: Path) -> bool:
+        """
+        Is the file still the one that was installed?
+
+        Cheap `stat` check first; file is hashed only if its size matches but mtime
+        doesn't (ie. it was `touch`-ed or copied over with identical content).
+        """
+        path = prefix / self.path
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+
+        if st.st_size != self.size:
+            return False
+        if st.st_mtime_ns == self.mtime_ns:
+            return True
+        return sha256_of(path) == self.sha256
+
+
+@dataclass
+class InstallReceipt:
+    """
+    Record of single app installation, stored under prefix.
+
+    Makes it possible to know installed version without running installed binary.
+    """
+
+    app_name: str
+    version: str
+    # Relative to prefix
+    binary: str
+    release_id: int | None = None
+    # Asset name -> `sha256:...` digest (or `None` if GitHub didn't publish one)
+    assets: dict[str, str | None] = field(default_factory=dict)
+    files: list[ReceiptFile] = field(default_factory=list)
+    installed_at: str = field(default_factory=lambda: datetime.now(UTC).isoformat())
+
+    DIR: ClassVar[Path] = Path("lib") / "usr-local-pull" / "receipts"
+
+    @classmethod
+    def path(cls, prefix: Path, app_name: str) -> Path:
+        return prefix / cls.DIR / f"{app_name}.json"
+
+    @classmethod
+    def load(cls, prefix: Path, app_name: str) -> InstallReceipt | None:
+        return cls.load_file(cls.path(prefix, app_name), app_name)
+
+    @classmethod
+    def load_file(cls, path: Path, app_name: str) -> InstallReceipt | None:
+        try:
+            with path.open("r") as f:
+                data = json.load(f)
+            data["files"] = [ReceiptFile(**_) for _ in data.get("files", [])]
+            return cls(**data)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(
+                "Ignoring unreadable install receipt %s: %s",
+                path,
+                e,
+                extra={"app_name": app_name},
+            )
+            return None
+
+    def to_json(self) -> bytes:
+        """
+        Receipt is written into prefix together with app's files, as part of the same
+        `InstallTransaction`.
+        """
+        return json.dumps(asdict(self), indent=2).encode("utf-8")
+
+    @property
+    def parsed_version(self) -> Version | date:
+        try:
+            return date.fromisoformat(self.version)
+        except ValueError:
+            return parse_version(self.version)
+
+    def file(self, path: str) -> ReceiptFile | None:
+        return next((_ for _ in self.files if _.path == path), None)
+
+    def binary_is_intact(self, prefix: Path) -> bool:
+        entry = self.file(self.binary)
+        return entry is not None and entry.is_intact(prefix)
+
+
+def sha256_of(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
@@ -1,23 +1,166 @@
-from .ast_grep import AstGrep
-from .bat import Bat
-from .dasel import Dasel
-from .eza import Eza
-from .fd_find import FdFind
-from .fnm import Fnm
-from .fzf import Fzf
-from .gitleaks import Gitleaks
-from .gojq import GoJq
-from .jid import Jid
-from .jq import Jq
-from .jqp import Jqp
-from .lazygit import Lazygit
-from .mdbook import Mdbook
-from .neovide import Neovide
-from .restish import Restish
-from .ripgrep import Ripgrep
-from .rust_analyzer import RustAnalyzer
-from .starship import Starship
-from .stylua import Stylua
-from .uv import Uv
-from .xq import Xq
-from .yq import YamlQ
+"""
+Supported apps.
+
+App modules are imported only when their app is used (ie.
+`usr-local-pull install --only ripgrep` doesn't import any other), either by `load()`
+or by accessing class from this package.
+
+Other packages can add their own apps through `ENTRY_POINT_GROUP` entry points, ie. in
+their `pyproject.toml`:
+
+    [project.entry-points."usr_local_pull.apps"]
+    my-tool = "my_package.apps:MyTool"
+
+These are discovered from installed packages' metadata, and imported only when used,
+too.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+from importlib.metadata import entry_points
+from typing import TYPE_CHECKING, Final
+
+from ..app import GitHubApp
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from importlib.metadata import EntryPoint
+
+    from .ast_grep import AstGrep
+    from .bat import Bat
+    from .dasel import Dasel
+    from .eza import Eza
+    from .fd_find import FdFind
+    from .fnm import Fnm
+    from .fzf import Fzf
+    from .gitleaks import Gitleaks
+    from .gojq import GoJq
+    from .jid import Jid
+    from .jq import Jq
+    from .jqp import Jqp
+    from .lazygit import Lazygit
+    from .mdbook import Mdbook
+    from .neovide import Neovide
+    from .restish import Restish
+    from .ripgrep import Ripgrep
+    from .rust_analyzer import RustAnalyzer
+    from .starship import Starship
+    from .stylua import Stylua
+    from .uv import Uv
+    from .xq import Xq
+    from .yq import YamlQ
+
+
+logger = logging.getLogger(__name__)
+
+# App name -> "<module>:<class>", module relative to this package
+REGISTRY: Final[dict[str, str]] = {
+    "ast-grep": ".ast_grep:AstGrep",
+    "bat": ".bat:Bat",
+    "dasel": ".dasel:Dasel",
+    "eza": ".eza:Eza",
+    "fd": ".fd_find:FdFind",
+    "fnm": ".fnm:Fnm",
+    "fzf": ".fzf:Fzf",
+    "gitleaks": ".gitleaks:Gitleaks",
+    "gojq": ".gojq:GoJq",
+    "jid": ".jid:Jid",
+    "jq": ".jq:Jq",
+    "jqp": ".jqp:Jqp",
+    "lazygit": ".lazygit:Lazygit",
+    "mdbook": ".mdbook:Mdbook",
+    "neovide": ".neovide:Neovide",
+    "restish": ".restish:Restish",
+    "ripgrep": ".ripgrep:Ripgrep",
+    "rust-analyzer": ".rust_analyzer:RustAnalyzer",
+    "starship": ".starship:Starship",
+    "stylua": ".stylua:Stylua",
+    "uv": ".uv:Uv",
+    "xq": ".xq:Xq",
+    "yq": ".yq:YamlQ",
+}
+
+# Entry point name is app name, and its value is app's class
+ENTRY_POINT_GROUP: Final[str] = "usr_local_pull.apps"
+
+# Class name -> its module
+_MODULES: Final[dict[str, str]] = {
+    cls: module for module, cls in (_.split(":") for _ in REGISTRY.values())
+}
+
+
+_plugins: dict[str, EntryPoint] | None = None
+
+
+def plugins() -> dict[str, EntryPoint]:
+    """
+    Apps from other packages, by name. Only their packages' metadata is read, none of
+    them is imported.
+    """
+    global _plugins  # noqa: PLW0603
+
+    if _plugins is None:
+        _plugins = {}
+        for _ in entry_points(group=ENTRY_POINT_GROUP):
+            if _.name in REGISTRY or _.name in _plugins:
+                logger.warning(
+                    "Ignoring app %s from %s, app with that name already exists.",
+                    _.name,
+                    _.value,
+                )
+                continue
+            _plugins[_.name] = _
+    return _plugins
+
+
+def names() -> list[str]:
+    """
+    Names of all apps: supported ones, followed by those from `plugins()`.
+    """
+    return [*REGISTRY, *plugins()]
+
+
+def load(name: str) -> type[GitHubApp]:
+    """
+    Class of app `name`, importing only its module.
+    """
+    if name in REGISTRY:
+        module, cls = REGISTRY[name].split(":")
+        return getattr(importlib.import_module(module, __name__), cls)
+
+    if name not in plugins():
+        raise ValueError(f"Unknown app {name}, known apps are {sorted(names())}!")
+
+    entry_point = plugins()[name]
+    try:
+        retv = entry_point.load()
+    except Exception as e:
+        raise ValueError(f"Can't load app {name} from {entry_point.value}: {e}!") from e
+    if not (isinstance(retv, type) and issubclass(retv, GitHubApp)):
+        raise ValueError(  # noqa: TRY004
+            f"App {name} from {entry_point.value} isn't subclass of GitHubApp!"
+        )
+    return retv
+
+
+def select(only: Sequence[str] = (), skip: Sequence[str] = ()) -> list[str]:
+    """
+    Names of apps in `only` (or all of them if it is empty) that aren't in `skip`.
+    """
+    known = names()
+    unknown = [_ for _ in (*only, *skip) if _ not in known]
+    if unknown:
+        raise ValueError(f"Unknown apps {unknown}, known apps are {sorted(known)}!")
+    return [_ for _ in dict.fromkeys(only or known) if _ not in skip]
+
+
+def __getattr__(name: str):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_MODULES[name], __name__), name)
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_MODULES])
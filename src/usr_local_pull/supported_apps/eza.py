@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Eza(GitHubApp):
+    version_probe = VersionProbe("eza", index=-3)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="eza",
@@ -18,14 +25,9 @@ class Eza(GitHubApp):
             gh_repo="eza",
         )
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -3)
-        return self._installed_version
-
     def download(self):
+        pending = []
+
         asset_name = next(
             (
                 a
@@ -38,13 +40,9 @@ class Eza(GitHubApp):
             raise ValueError(
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-        exe = next((_ for _ in members if Path(_).name == "eza"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'eza' in {asset_name}!")
-        self.binary = AppBinary("eza", data=extractor.extract(exe))
+        pending.append(
+            self.client.extractor(asset_name).prefetch(MemberSpec.binary("eza"))
+        )
 
         asset_name = next(
             (
@@ -58,15 +56,9 @@ class Eza(GitHubApp):
             raise ValueError(
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-        zsh_complete = next((_ for _ in members if Path(_).name == "_eza"), None)
-        if not zsh_complete:
-            raise ValueError(f"Can't find '_eza' in {asset_name}!")
-        self.zsh_completions = [
-            ZshCompletion("eza", data=extractor.extract(zsh_complete))
-        ]
+        pending.append(
+            self.client.extractor(asset_name).prefetch(MemberSpec.zsh_completion("eza"))
+        )
 
         asset_name = next(
             (
@@ -80,14 +72,11 @@ class Eza(GitHubApp):
             raise ValueError(
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-        for member in members:
-            file_name = Path(member).name
-            section = int(Path(member).suffixes[-1][1:])
-            self.man_pages.append(
-                ManPage(
-                    section=section, file_name=file_name, data=extractor.extract(member)
-                )
-            )
+        pending.append(
+            self.client.extractor(asset_name).prefetch(MemberSpec.man_pages("*"))
+        )
+
+        yield Stage.EXTRACT
+
+        for _ in pending:
+            self.add_selected(_.select())
@@ -1,25 +1,25 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class FdFind(GitHubApp):
+    version_probe = VersionProbe("fd", index=1)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(name="fd", prefix=prefix, gh_owner="sharkdp", gh_repo="fd")
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version("fd", 1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -36,31 +36,12 @@ class FdFind(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-
-        errs = []
-
-        exe = next((_ for _ in members if Path(_).name == "fd"), None)
-        if not exe:
-            errs.append(f"Can't find 'fd' in {asset_name}!")
-
-        man = next((_ for _ in members if Path(_).name == "fd.1"), None)
-        if not man:
-            errs.append(f"Can't find 'fd.1' in {asset_name}!")
-
-        zsh_complete = next((_ for _ in members if Path(_).name == "_fd"), None)
-        if not zsh_complete:
-            errs.append(f"Can't find '_fd' in {asset_name}!")
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("fd"),
+            MemberSpec.man_pages("fd.1"),
+            MemberSpec.zsh_completion("fd"),
+        )
 
-        if errs:
-            raise ValueError(f"Asset extraction failed: {errs}!")
+        yield Stage.EXTRACT
 
-        self.binary = AppBinary("fd", data=extractor.extract(exe))
-        self.zsh_completions = [
-            ZshCompletion("fd", data=extractor.extract(zsh_complete))
-        ]
-        self.man_pages.append(
-            ManPage(section=1, file_name="fd.1", data=extractor.extract(man))
-        )
+        self.add_selected(pending.select())
@@ -1,27 +1,22 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-import tempfile
 from pathlib import Path
 
-from ..app import BIN_PERM, DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp, ManPage, ZshCompletion
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
 
 logger = logging.getLogger(__name__)
 
 
 class Fzf(GitHubApp):
+    version_probe = VersionProbe("fzf", index=0)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(name="fzf", prefix=prefix, gh_owner="junegunn", gh_repo="fzf")
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, 0)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -37,38 +32,23 @@ class Fzf(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(MemberSpec.binary("fzf"))
 
-        exe = next((_ for _ in members if Path(_).name == "fzf"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'fzf' in {asset_name}!")
-        self.binary = AppBinary("fzf", data=extractor.extract(exe))
+        self.man_pages = [
+            ManPage(section=1, file_name=Path(path).name, data=data)
+            for path, data in self.client.repo_files(
+                "man/man1/fzf.1", "man/man1/fzf-tmux.1"
+            ).items()
+        ]
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            exe_path = Path(tmp_dir) / f"{self.name}_tmp"
-            with exe_path.open("wb") as _:
-                _.write(self.binary.data)
-            exe_path.chmod(BIN_PERM)
+        yield Stage.EXTRACT
 
-            self.zsh_completions = [
-                ZshCompletion(
-                    app_name="fzf",
-                    data=subprocess.check_output(  # noqa: S603
-                        [exe_path.as_posix(), "--zsh"], shell=False
-                    ),
-                )
-            ]
+        self.add_selected(pending.select())
 
-        asset = self.client.downloaded_asset("tarball")
-        extractor = ArchiveExtractor(f"{asset.name}.tar.gz", asset.data)
-        members = extractor.members
-        for member in members:
-            file_name = Path(member).name
-            if file_name in {"fzf.1", "fzf-tmux.1"}:
-                self.man_pages.append(
-                    ManPage(
-                        section=1, file_name=file_name, data=extractor.extract(member)
-                    )
-                )
+        yield Stage.GENERATE
+
+        self.zsh_completions = [
+            ZshCompletion(
+                app_name="fzf", data=self.generate(self.binary, "--zsh").stdout
+            )
+        ]
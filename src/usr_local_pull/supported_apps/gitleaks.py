@@ -2,17 +2,22 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-import tempfile
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import BIN_PERM, DEFAULT_PREFIX, AppBinary, GitHubApp, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp, ZshCompletion
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Gitleaks(GitHubApp):
+    version_probe = VersionProbe("gitleaks")
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="gitleaks",
@@ -22,13 +27,6 @@ class Gitleaks(GitHubApp):
             post_install_notice=None,
         )
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -43,26 +41,19 @@ class Gitleaks(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("gitleaks")
+        )
+
+        yield Stage.EXTRACT
 
-        exe = next((_ for _ in members if Path(_).name == "gitleaks"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'gitleaks' in {asset_name}!")
-        self.binary = AppBinary("gitleaks", data=extractor.extract(exe))
+        self.add_selected(pending.select())
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            exe_path = Path(tmp_dir) / f"{self.name}_tmp"
-            with exe_path.open("wb") as _:
-                _.write(self.binary.data)
-            exe_path.chmod(BIN_PERM)
+        yield Stage.GENERATE
 
-            self.zsh_completions = [
-                ZshCompletion(
-                    app_name="gitleaks",
-                    data=subprocess.check_output(  # noqa: S603
-                        [exe_path.as_posix(), "completion", "zsh"], shell=False
-                    ),
-                )
-            ]
+        self.zsh_completions = [
+            ZshCompletion(
+                app_name="gitleaks",
+                data=self.generate(self.binary, "completion", "zsh").stdout,
+            )
+        ]
@@ -1,26 +1,25 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class GoJq(GitHubApp):
+    version_probe = VersionProbe("gojq", index=1)
 
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(name="gojq", prefix=prefix, gh_owner="itchyny", gh_repo="gojq")
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, 1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -35,16 +34,10 @@ class GoJq(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("gojq"), MemberSpec.zsh_completion("gojq")
+        )
 
-        exe = next((_ for _ in members if Path(_).name == "gojq"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'gojq' in {asset_name}!")
-        self.binary = AppBinary("gojq", data=extractor.extract(exe))
+        yield Stage.EXTRACT
 
-        zsh = next((_ for _ in members if Path(_).name == "_gojq"), None)
-        if not zsh:
-            raise ValueError(f"Can't find 'gojq' in {asset_name}!")
-        self.zsh_completions = [ZshCompletion("gojq", data=extractor.extract(zsh))]
+        self.add_selected(pending.select())
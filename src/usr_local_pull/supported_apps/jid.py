@@ -1,25 +1,25 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Jid(GitHubApp):
+    version_probe = VersionProbe("jid")
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(name="jid", prefix=prefix, gh_owner="simeji", gh_repo="jid")
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -34,11 +34,8 @@ class Jid(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(MemberSpec.binary("jid"))
+
+        yield Stage.EXTRACT
 
-        exe = next((_ for _ in members if Path(_).name == "jid"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'jid' in {asset_name}!")
-        self.binary = AppBinary("jid", data=extractor.extract(exe))
+        self.add_selected(pending.select())
@@ -1,25 +1,25 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Jq(GitHubApp):
+    version_probe = VersionProbe("jq")
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(name="jq", prefix=prefix, gh_owner="jqlang", gh_repo="jq")
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -34,15 +34,8 @@ class Jq(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-
-        man = next((_ for _ in members if Path(_).name == "jq.1"), None)
-        if not man:
-            raise ValueError(f"Can't find 'jq.1' in {asset_name}!")
-        self.man_pages.append(
-            ManPage(section=1, file_name="jq.1", data=extractor.extract(man))
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.man_pages("jq.1")
         )
 
         asset_name = next(
@@ -59,3 +52,7 @@ class Jq(GitHubApp):
             )
         exe = self.client.downloaded_asset(asset_name)
         self.binary = AppBinary("jq", data=exe.data)
+
+        yield Stage.EXTRACT
+
+        self.add_selected(pending.select())
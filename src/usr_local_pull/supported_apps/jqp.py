@@ -2,27 +2,27 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Jqp(GitHubApp):
+    version_probe = VersionProbe("jqp")
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="jqp", prefix=prefix, gh_owner="noahgorstein", gh_repo="jqp"
         )
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, -1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -37,11 +37,8 @@ class Jqp(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(MemberSpec.binary("jqp"))
+
+        yield Stage.EXTRACT
 
-        exe = next((_ for _ in members if Path(_).name == "jqp"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'jqp' in {asset_name}!")
-        self.binary = AppBinary("jqp", data=extractor.extract(exe))
+        self.add_selected(pending.select())
@@ -1,63 +1,26 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from packaging.version import Version
-from packaging.version import parse as parse_version
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
-from ..archive_extractor import ArchiveExtractor
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Lazygit(GitHubApp):
+    version_probe = VersionProbe("lazygit", regex=r"(?:^|,)\s*version=([^,\s]+)")
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="lazygit", prefix=prefix, gh_owner="jesseduffield", gh_repo="lazygit"
         )
-        self._installed_version: Version | None = None
-
-    @property
-    def installed_version(self) -> Version | None:
-        if self._installed_version:
-            return self._installed_version
-
-        try:
-            bin_path = self.prefix / "bin" / "lazygit"
-            if bin_path.exists():
-                data = subprocess.check_output(  # noqa: S603
-                    [bin_path.as_posix(), "--version"], shell=False, encoding="utf-8"
-                )
-                if data:
-                    data = (
-                        next(
-                            (
-                                _
-                                for _ in data.split(",")
-                                if _.strip().startswith("version=")
-                            ),
-                            "",
-                        )
-                        .strip()
-                        .split("=")
-                    )
-                if data and len(data) >= 2:  # noqa: PLR2004
-                    self._installed_version = parse_version(data[-1])
-            if self._installed_version:
-                logger.debug(
-                    "Found installed version %s",
-                    self._installed_version,
-                    extra={"app_name": self.name},
-                )
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to fetch local app version for {self.name}!"
-            ) from e
-
-        return self._installed_version
 
     def download(self):
         asset_name = next(
@@ -74,11 +37,10 @@ class Lazygit(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("lazygit")
+        )
+
+        yield Stage.EXTRACT
 
-        exe = next((_ for _ in members if Path(_).name == "lazygit"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'lazygit' in {asset_name}!")
-        self.binary = AppBinary("lazygit", data=extractor.extract(exe))
+        self.add_selected(pending.select())
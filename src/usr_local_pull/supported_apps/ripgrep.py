@@ -3,8 +3,10 @@ from __future__ import annotations
 import logging
 from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
 
 if TYPE_CHECKING:
     from pathlib import Path
@@ -13,18 +15,13 @@ logger = logging.getLogger(__name__)
 
 
 class Ripgrep(GitHubApp):
+    version_probe = VersionProbe("rg", index=1)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="ripgrep", prefix=prefix, gh_owner="BurntSushi", gh_repo="ripgrep"
         )
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version("rg", 1)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -39,29 +36,17 @@ class Ripgrep(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        deb_extractor = ArchiveExtractor(asset.name, asset.data)
-        xz_data = deb_extractor.extract("data.tar.xz")
-        extractor = ArchiveExtractor("data.tar.xz", xz_data)
-        members = extractor.members
-
-        exe = next((_ for _ in members if _ == "usr/bin/rg"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'ripgrep' in {asset_name}!")
-        self.binary = AppBinary("rg", data=extractor.extract(exe))
-
-        man = next((_ for _ in members if _ == "usr/share/man/man1/rg.1.gz"), None)
-        if not man:
-            raise ValueError(f"Can't find 'rg.1.gz' in {asset_name}!")
-        self.man_pages.append(
-            ManPage(section=1, file_name="rg.1.gz", data=extractor.extract(man))
+        # Debian packages may use any of `data.tar.{gz,xz,zst,...}`
+        pending = (
+            self.client.extractor(asset_name)
+            .nested("data.tar.*")
+            .prefetch(
+                MemberSpec.binary("rg", "usr/bin/rg"),
+                MemberSpec.man_pages("usr/share/man/man1/rg.1.gz"),
+                MemberSpec.zsh_completion("rg", "usr/share/zsh/vendor-completions/_rg"),
+            )
         )
 
-        zsh_complete = next(
-            (_ for _ in members if _ == "usr/share/zsh/vendor-completions/_rg"), None
-        )
-        if not zsh_complete:
-            raise ValueError(f"Can't find 'ripgrep.zsh' in {asset_name}!")
-        self.zsh_completions = [
-            ZshCompletion("rg", data=extractor.extract(zsh_complete))
-        ]
+        yield Stage.EXTRACT
+
+        self.add_selected(pending.select())
@@ -6,19 +6,22 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from packaging.version import Version
-from packaging.version import parse as parse_version
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
-from ..archive_extractor import ArchiveExtractor
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class RustAnalyzer(GitHubApp):
+    version_probe = VersionProbe("rust-analyzer", index=-2, split_dashes=True)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="rust-analyzer",
@@ -26,35 +29,6 @@ class RustAnalyzer(GitHubApp):
             gh_owner="rust-lang",
             gh_repo="rust-analyzer",
         )
-        self._installed_version: Version | None = None
-
-    @property
-    def installed_version(self) -> Version | None:
-        if self._installed_version:
-            return self._installed_version
-
-        try:
-            bin_path = self.prefix / "bin" / "rust-analyzer"
-            if bin_path.exists():
-                data = subprocess.check_output(  # noqa: S603
-                    [bin_path.as_posix(), "--version"], shell=False, encoding="utf-8"
-                )
-                if data:
-                    data = data.replace("-", " ").split()[-2]
-                if data:
-                    self._installed_version = parse_version(data)
-            if self._installed_version:
-                logger.debug(
-                    "Found installed version %s",
-                    self._installed_version,
-                    extra={"app_name": self.name},
-                )
-        except Exception as e:
-            raise RuntimeError(
-                f"Failed to fetch local app version for {self.name}!"
-            ) from e
-
-        return self._installed_version
 
     def download(self):
         asset_name = next(
@@ -70,18 +44,10 @@ class RustAnalyzer(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-
-        exe = next(
-            (
-                _
-                for _ in members
-                if Path(_).name == "rust-analyzer-x86_64-unknown-linux-gnu"
-            ),
-            None,
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("rust-analyzer", "rust-analyzer-x86_64-unknown-linux-gnu")
         )
-        if not exe:
-            raise ValueError(f"Can't find 'rust-analyzer' in {asset_name}!")
-        self.binary = AppBinary("rust-analyzer", data=extractor.extract(exe))
+
+        yield Stage.EXTRACT
+
+        self.add_selected(pending.select())
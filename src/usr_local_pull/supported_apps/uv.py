@@ -2,12 +2,14 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-import tempfile
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import BIN_PERM, DEFAULT_PREFIX, AppBinary, GitHubApp, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp, ZshCompletion
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -36,44 +38,27 @@ class Uv(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
-
-        exe = next((_ for _ in members if Path(_).name == "uv"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'uv' in {asset_name}!")
-        self.binary = AppBinary("uv", data=extractor.extract(exe))
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("uv"), MemberSpec.other_bin("uvx")
+        )
 
-        exe = next((_ for _ in members if Path(_).name == "uvx"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'uvx' in {asset_name}!")
-        self.other_bins = [AppBinary("uvx", data=extractor.extract(exe))]
+        yield Stage.EXTRACT
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            uv_path = Path(tmp_dir) / "uv_tmp"
-            with uv_path.open("wb") as _:
-                _.write(self.binary.data)
-            uv_path.chmod(BIN_PERM)
+        self.add_selected(pending.select())
 
-            uvx_path = Path(tmp_dir) / "uvx_tmp"
-            with uvx_path.open("wb") as _:
-                _.write(self.other_bins[0].data)
-            uvx_path.chmod(BIN_PERM)
+        yield Stage.GENERATE
 
-            self.zsh_completions = [
-                ZshCompletion(
-                    app_name="uv",
-                    data=subprocess.check_output(  # noqa: S603
-                        [uv_path.as_posix(), "generate-shell-completion", "zsh"],
-                        shell=False,
-                    ),
-                ),
-                ZshCompletion(
-                    app_name="uvx",
-                    data=subprocess.check_output(  # noqa: S603
-                        [uvx_path.as_posix(), "--generate-shell-completion", "zsh"],
-                        shell=False,
-                    ),
-                ),
-            ]
+        self.zsh_completions = [
+            ZshCompletion(
+                app_name="uv",
+                data=self.generate(
+                    self.binary, "generate-shell-completion", "zsh"
+                ).stdout,
+            ),
+            ZshCompletion(
+                app_name="uvx",
+                data=self.generate(
+                    self.other_bins[0], "--generate-shell-completion", "zsh"
+                ).stdout,
+            ),
+        ]
@@ -1,27 +1,27 @@
 from __future__ import annotations
 
 import logging
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import DEFAULT_PREFIX, AppBinary, GitHubApp
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+from ..probes import VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
 class Xq(GitHubApp):
+    version_probe = VersionProbe("xq", index=2)
+
     def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
         super().__init__(
             name="xq", prefix=prefix, gh_owner="sibprogrammer", gh_repo="xq"
         )
 
-    @property
-    def installed_version(self):
-        if self._installed_version:
-            return self._installed_version
-        self._installed_version = self.get_installed_version(self.name, 2)
-        return self._installed_version
-
     def download(self):
         asset_name = next(
             (
@@ -36,11 +36,8 @@ class Xq(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(MemberSpec.binary("xq"))
+
+        yield Stage.EXTRACT
 
-        exe = next((_ for _ in members if Path(_).name == "xq"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'xq' in {asset_name}!")
-        self.binary = AppBinary("xq", data=extractor.extract(exe))
+        self.add_selected(pending.select())
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import logging
-import subprocess
-import tempfile
-from pathlib import Path
+from typing import TYPE_CHECKING
 
-from ..app import BIN_PERM, DEFAULT_PREFIX, AppBinary, GitHubApp, ManPage, ZshCompletion
-from ..archive_extractor import ArchiveExtractor
+from ..app import DEFAULT_PREFIX, GitHubApp, ZshCompletion
+from ..archive_extractor import MemberSpec
+from ..pipeline import Stage
+
+if TYPE_CHECKING:
+    from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -29,33 +31,19 @@ class YamlQ(GitHubApp):
                 f"Can't find suitable release asset in {self.client.latest_release.asset_names}!"
             )
 
-        asset = self.client.downloaded_asset(asset_name)
-        extractor = ArchiveExtractor(asset.name, asset.data)
-        members = extractor.members
+        pending = self.client.extractor(asset_name).prefetch(
+            MemberSpec.binary("yq", "yq_linux_amd64"), MemberSpec.man_pages("yq.1")
+        )
 
-        exe = next((_ for _ in members if Path(_).name == "yq_linux_amd64"), None)
-        if not exe:
-            raise ValueError(f"Can't find 'yq_linux_amd64' in {asset_name}!")
-        self.binary = AppBinary("yq", data=extractor.extract(exe))
+        yield Stage.EXTRACT
 
-        man = next((_ for _ in members if Path(_).name == "yq.1"), None)
-        if not man:
-            raise ValueError(f"Can't find 'yq.1' in {asset_name}!")
-        self.man_pages.append(
-            ManPage(section=1, file_name="yq.1", data=extractor.extract(man))
-        )
+        self.add_selected(pending.select())
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            exe_path = Path(tmp_dir) / f"{self.name}_tmp"
-            with exe_path.open("wb") as _:
-                _.write(self.binary.data)
-            exe_path.chmod(BIN_PERM)
-
-            self.zsh_completions = [
-                ZshCompletion(
-                    app_name="yq",
-                    data=subprocess.check_output(  # noqa: S603
-                        [exe_path.as_posix(), "completion", "zsh"], shell=False
-                    ),
-                )
-            ]
+        yield Stage.GENERATE
+
+        self.zsh_completions = [
+            ZshCompletion(
+                app_name="yq",
+                data=self.generate(self.binary, "completion", "zsh").stdout,
+            )
+        ]
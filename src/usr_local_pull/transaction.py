@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, ClassVar
+
+from . import materialize
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+    from .app_files import StoredFile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _JournalEntry:
+    path: str
+    # `None` if `path` is being removed
+    tmp: str | None
+    # Hardlink to file that was at `path` before, if there was one
+    backup: str | None = None
+
+
+class InstallTransaction:
+    """
+    Writes set of app's files into prefix so that either all of them are replaced, or
+    none is.
+
+        with InstallTransaction(prefix, "rg") as txn:
+            txn.stage(path, data, mode)
+            ...
+            txn.commit()
+
+    - for its whole duration, holds exclusive per-app lock in prefix, so parallel runs
+      installing the same app into the same prefix are serialized
+    - `stage()` writes data into temp file in the target directory and fsyncs it
+    - `commit()` journals what it is about to do, then hardlinks each existing target
+      to a backup and renames temp file over it (or removes it, see `remove()`), so
+      target path always points to either complete old or complete new file (ie.
+      running `rg` never sees torn executable). Once all renames are done, journal is
+      renamed to cleanup list (that rename is the commit point), and only then are
+      backups removed
+    - if anything fails before that, already replaced files are restored from backups.
+      Journal left behind by crashed run is rolled back the same way by the next
+      transaction of the same app, and cleanup list left behind after commit point
+      only has its backups removed
+    """
+
+    STATE_DIR: ClassVar[Path] = Path("lib") / "usr-local-pull"
+    _BACKUP_SUFFIX: ClassVar[str] = ".usr-local-pull-backup"
+
+    def __init__(self, prefix: Path, app_name: str) -> None:
+        self.prefix = prefix
+        self.app_name = app_name
+        self._lock_file: IO[bytes] | None = None
+        self._entries: list[_JournalEntry] = []
+        self._committed = False
+
+    @property
+    def _journal_path(self) -> Path:
+        return self.prefix / self.STATE_DIR / "journal" / f"{self.app_name}.json"
+
+    @property
+    def _cleanup_path(self) -> Path:
+        return self._journal_path.with_suffix(".cleanup.json")
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.prefix / self.STATE_DIR / "locks" / f"{self.app_name}.lock"
+
+    @classmethod
+    def recover(cls, prefix: Path, app_name: str) -> None:
+        """
+        Rolls back install of app interrupted by crash, if there was one.
+        """
+        txn = cls(prefix, app_name)
+        if txn._journal_path.exists() or txn._cleanup_path.exists():
+            with txn:
+                pass
+
+    def __enter__(self) -> InstallTransaction:
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = self._lock_path.open("ab")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(
+                "Waiting for another install into %s to finish...",
+                self.prefix,
+                extra={"app_name": self.app_name},
+            )
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+        self._recover()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        try:
+            if not self._committed:
+                for _ in self._entries:
+                    if _.tmp:
+                        Path(_.tmp).unlink(missing_ok=True)
+                self._entries = []
+        finally:
+            if self._lock_file:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+    def stage(
+        self,
+        path: Path,
+        data: bytes | None,
+        mode: int,
+        source: StoredFile | None = None,
+    ) -> os.stat_result:
+        """
+        Writes `data` for `path` into temp file next to it (from `source` file with the
+        same content, if given, see `materialize`; `data` may then be `None`).
+
+        Returns `stat` of that file, which is the same as of `path` after commit.
+        """
+        if self._committed:
+            raise ValueError("Transaction was already committed!")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = materialize.create_temp(path, data, source)
+        try:
+            tmp.chmod(mode)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        self._entries.append(_JournalEntry(path=path.as_posix(), tmp=tmp.as_posix()))
+        return tmp.stat()
+
+    def symlink(self, path: Path, target: str) -> None:
+        """
+        Makes `path` symlink to `target` on commit.
+        """
+        if self._committed:
+            raise ValueError("Transaction was already committed!")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            tmp = path.with_name(f".{path.name}.{os.urandom(4).hex()}")
+            try:
+                tmp.symlink_to(target)
+            except FileExistsError:
+                continue
+            break
+
+        self._entries.append(_JournalEntry(path=path.as_posix(), tmp=tmp.as_posix()))
+
+    def remove(self, path: Path) -> None:
+        """
+        Removes `path` on commit (it is restored if commit fails).
+        """
+        if self._committed:
+            raise ValueError("Transaction was already committed!")
+
+        if path.exists() or path.is_symlink():
+            self._entries.append(_JournalEntry(path=path.as_posix(), tmp=None))
+
+    def commit(self) -> None:
+        for _ in self._entries:
+            path = Path(_.path)
+            if path.exists() or path.is_symlink():
+                _.backup = path.with_name(
+                    f".{path.name}{self._BACKUP_SUFFIX}"
+                ).as_posix()
+        self._write_journal()
+
+        try:
+            for _ in self._entries:
+                if _.backup:
+                    Path(_.backup).unlink(missing_ok=True)
+                    os.link(_.path, _.backup, follow_symlinks=False)
+                if _.tmp:
+                    Path(_.tmp).replace(_.path)
+                else:
+                    Path(_.path).unlink()
+            self._fsync_dirs()
+        except BaseException:
+            logger.warning(
+                "Install failed, rolling back.", extra={"app_name": self.app_name}
+            )
+            self._rollback(self._entries)
+            self._journal_path.unlink(missing_ok=True)
+            self._entries = []
+            raise
+
+        # Commit point: from now on, crash leaves new files in place, with only backups
+        # still to be removed
+        self._journal_path.replace(self._cleanup_path)
+        _fsync_dir(self._journal_path.parent)
+        self._committed = True
+
+        self._remove_backups(self._entries)
+        self._cleanup_path.unlink(missing_ok=True)
+
+    def _write_journal(self) -> None:
+        self._journal_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=self._journal_path.parent, prefix=f".{self._journal_path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump([asdict(_) for _ in self._entries], f)
+                f.flush()
+                os.fsync(f.fileno())
+            Path(tmp).replace(self._journal_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        _fsync_dir(self._journal_path.parent)
+
+    def _fsync_dirs(self) -> None:
+        for _ in {Path(_.path).parent for _ in self._entries}:
+            _fsync_dir(_)
+
+    def _recover(self) -> None:
+        if self._journal_path.exists():
+            logger.warning(
+                "Rolling back interrupted install.", extra={"app_name": self.app_name}
+            )
+            self._rollback(self._read_entries(self._journal_path))
+            self._journal_path.unlink(missing_ok=True)
+
+        if self._cleanup_path.exists():
+            logger.info(
+                "Removing backups of interrupted install.",
+                extra={"app_name": self.app_name},
+            )
+            self._remove_backups(self._read_entries(self._cleanup_path))
+            self._cleanup_path.unlink(missing_ok=True)
+
+    @classmethod
+    def _read_entries(cls, path: Path) -> list[_JournalEntry]:
+        try:
+            with path.open("r") as f:
+                return [_JournalEntry(**_) for _ in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            raise ValueError(f"Can't read install journal {path}!") from e
+
+    @classmethod
+    def _remove_backups(cls, entries: list[_JournalEntry]) -> None:
+        for _ in entries:
+            if _.backup:
+                Path(_.backup).unlink(missing_ok=True)
+
+    @classmethod
+    def _rollback(cls, entries: list[_JournalEntry]) -> None:
+        for _ in reversed(entries):
+            with contextlib.suppress(FileNotFoundError):
+                if _.backup and Path(_.backup).exists():
+                    Path(_.backup).replace(_.path)
+                elif not _.backup:
+                    # There was no file before, anything at path is ours
+                    Path(_.path).unlink(missing_ok=True)
+            if _.tmp:
+                Path(_.tmp).unlink(missing_ok=True)
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
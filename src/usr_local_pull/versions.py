@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from typing import TYPE_CHECKING, ClassVar, Final
+
+from .app_files import DOC_PERM
+from .receipts import InstallReceipt
+from .transaction import InstallTransaction
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from .receipts import ReceiptFile
+
+
+logger = logging.getLogger(__name__)
+
+# How many most recently installed versions of each app are kept (active one is kept
+# always, even if it is older)
+DEFAULT_KEEP: Final[int] = 3
+
+_enabled: bool = False
+_keep: int = DEFAULT_KEEP
+
+
+def configure(*, enabled: bool, keep: int = DEFAULT_KEEP) -> None:
+    global _enabled, _keep  # noqa: PLW0603
+
+    if keep < 1:
+        raise ValueError("At least one version must be kept!")
+    _enabled = enabled
+    _keep = keep
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_keep() -> int:
+    return _keep
+
+
+class VersionStore:
+    """
+    Side-by-side installed versions of single app.
+
+    Each version has its own directory with the same layout as prefix, plus its
+    install receipt:
+
+        <prefix>/lib/usr-local-pull/rg/14.1.0/bin/rg
+        <prefix>/lib/usr-local-pull/rg/14.1.0/share/man/man1/rg.1
+        <prefix>/lib/usr-local-pull/rg/14.1.0/receipt.json
+        <prefix>/lib/usr-local-pull/rg/current -> 14.1.0
+
+    and files in prefix are relative symlinks through `current`:
+
+        <prefix>/bin/rg -> ../lib/usr-local-pull/rg/current/bin/rg
+
+    so switching to another version is single atomic rename of `current` (plus adding
+    and removing links of files that only one of versions has), with no network.
+    """
+
+    _CURRENT: ClassVar[str] = "current"
+    _RECEIPT: ClassVar[str] = "receipt.json"
+
+    def __init__(self, prefix: Path, app_name: str) -> None:
+        self.prefix = prefix
+        self.app_name = app_name
+
+    @property
+    def root(self) -> Path:
+        return self.prefix / InstallTransaction.STATE_DIR / self.app_name
+
+    def version_dir(self, version: str) -> Path:
+        return self.root / version
+
+    def path_in_version(self, version: str, path: Path) -> Path:
+        """
+        Where file that would be installed as `path` goes in `version`'s directory.
+        """
+        return self.version_dir(version) / path.relative_to(self.prefix)
+
+    def receipt_path(self, version: str) -> Path:
+        return self.version_dir(version) / self._RECEIPT
+
+    def receipt(self, version: str) -> InstallReceipt | None:
+        return InstallReceipt.load_file(self.receipt_path(version), self.app_name)
+
+    @property
+    def active_version(self) -> str | None:
+        try:
+            return (self.root / self._CURRENT).readlink().as_posix()
+        except OSError:
+            return None
+
+    @property
+    def versions(self) -> list[str]:
+        """
+        Installed versions, from least to most recently installed.
+        """
+        if not self.root.is_dir():
+            return []
+
+        receipts = [
+            receipt
+            for _ in self.root.iterdir()
+            if _.name != self._CURRENT
+            and _.is_dir()
+            and (receipt := self.receipt(_.name)) is not None
+        ]
+        return [_.version for _ in sorted(receipts, key=lambda _: _.installed_at)]
+
+    def stage_activation(
+        self, txn: InstallTransaction, version: str, receipt: InstallReceipt
+    ) -> None:
+        """
+        Stages into `txn` everything that makes `version` (with its `receipt`) the
+        active one, except removing links of files it doesn't have.
+        """
+        for _ in receipt.files:
+            link = self.prefix / _.path
+            target = os.path.relpath(self.root / self._CURRENT / _.path, link.parent)
+            if link.is_symlink() and link.readlink().as_posix() == target:
+                continue
+            txn.symlink(link, target)
+
+        txn.symlink(self.root / self._CURRENT, version)
+        txn.stage(
+            InstallReceipt.path(self.prefix, self.app_name),
+            receipt.to_json(),
+            DOC_PERM,
+        )
+
+    def activate(self, version: str) -> None:
+        with InstallTransaction(self.prefix, self.app_name) as txn:
+            receipt = self.receipt(version)
+            if receipt is None:
+                raise ValueError(
+                    f"{self.app_name} {version} isn't installed, available versions "
+                    f"are {self.versions}!"
+                )
+
+            previous = InstallReceipt.load(self.prefix, self.app_name)
+            wanted = {_.path for _ in receipt.files}
+            for _ in previous.files if previous else []:
+                if _.path not in wanted and self._is_link_to_store(_):
+                    txn.remove(self.prefix / _.path)
+
+            self.stage_activation(txn, version, receipt)
+            txn.commit()
+
+        logger.info("Activated %s.", version, extra={"app_name": self.app_name})
+
+    def rollback(self) -> str:
+        """
+        Activates version that was installed before the active one.
+        """
+        versions = self.versions
+        active = self.active_version
+        if active not in versions or versions.index(active) == 0:
+            raise ValueError(
+                f"There is no version of {self.app_name} installed before {active}!"
+            )
+
+        retv = versions[versions.index(active) - 1]
+        self.activate(retv)
+        return retv
+
+    def prune(self, keep: int) -> list[str]:
+        """
+        Removes all but `keep` most recently installed versions, and the active one.
+
+        Must be called with app's `InstallTransaction` entered.
+        """
+        active = self.active_version
+        removed = [_ for _ in self.versions[:-keep] if _ != active]
+        for _ in removed:
+            shutil.rmtree(self.version_dir(_), ignore_errors=True)
+            logger.info("Removed old version %s.", _, extra={"app_name": self.app_name})
+        return removed
+
+    def _is_link_to_store(self, file: ReceiptFile) -> bool:
+        link = self.prefix / file.path
+        if not link.is_symlink():
+            return False
+        target = (link.parent / link.readlink()).resolve()
+        return target.is_relative_to(self.root.resolve())
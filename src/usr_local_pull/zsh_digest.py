@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Final
+
+from .app_files import DOC_PERM, ZshCompletion
+from .transaction import InstallTransaction
+
+logger = logging.getLogger(__name__)
+
+# Seconds `zcompile` may take before it is killed
+ZCOMPILE_TIMEOUT: Final[float] = 60
+
+
+def digest_path(prefix: Path) -> Path:
+    """
+    For each directory in `$fpath`, zsh also looks for `<directory>.zwc` digest and
+    loads function from it when digest is newer than function's own file. So this is
+    picked up without any change to `.zshrc`.
+    """
+    functions_dir = ZshCompletion.site_functions_dir(prefix)
+    return functions_dir.with_name(f"{functions_dir.name}.zwc")
+
+
+def sources_path(prefix: Path) -> Path:
+    """
+    Functions digest was built from: their names, resolved paths, sizes and mtimes.
+    """
+    return prefix / InstallTransaction.STATE_DIR / "zsh-digest.json"
+
+
+def refresh(prefix: Path) -> Path | None:
+    """
+    Compiles all functions in prefix's `site-functions` into single `.zwc` digest, so
+    that shell startup doesn't need to parse each completion file.
+
+    Digest is rebuilt only if functions in `site-functions` changed since it was built
+    (some were added or removed, or resolve to other files, ie. after switching
+    versions). Returns digest path, or `None` if it couldn't be built, in which case
+    there is no digest at all: stale one would make zsh load old functions from it
+    instead of from their newer files.
+    """
+    functions_dir = ZshCompletion.site_functions_dir(prefix)
+    zwc_path = digest_path(prefix)
+    functions = _functions(functions_dir)
+    sources = _sources(functions)
+    if _is_fresh(prefix, sources):
+        logger.debug("%s is up to date", zwc_path)
+        return zwc_path
+
+    if not functions:
+        _discard(prefix)
+        return None
+
+    zsh = shutil.which("zsh")
+    if not zsh:
+        logger.warning("Can't find `zsh` on $PATH, not building %s.", zwc_path)
+        _discard(prefix)
+        return None
+
+    # `zcompile` insists on `.zwc` suffix of output file
+    fd, tmp_path = tempfile.mkstemp(
+        dir=zwc_path.parent, prefix=f".{zwc_path.stem}.", suffix=".zwc"
+    )
+    os.close(fd)
+    try:
+        subprocess.run(  # noqa: S603
+            [
+                zsh,
+                "-fc",
+                # -U: no alias expansion, as recommended for completion functions
+                'zcompile -U "$1" "${@:2}"',
+                "zsh",
+                tmp_path,
+                *(_.as_posix() for _ in functions),
+            ],
+            shell=False,
+            check=True,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            timeout=ZCOMPILE_TIMEOUT,
+        )
+        Path(tmp_path).chmod(DOC_PERM)
+        Path(tmp_path).replace(zwc_path)
+    except (OSError, subprocess.SubprocessError) as e:
+        # Stale digest would shadow newer completions only until they are touched
+        # again, but better not leave it around at all
+        logger.warning("Failed to build %s: %s", zwc_path, _stderr(e))
+        _discard(prefix)
+        return None
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+    sources_path(prefix).parent.mkdir(parents=True, exist_ok=True)
+    sources_path(prefix).write_text(
+        json.dumps(
+            {"digest_mtime_ns": zwc_path.stat().st_mtime_ns, "functions": sources}
+        )
+    )
+    logger.info("Compiled %d zsh functions into %s.", len(functions), zwc_path)
+    return zwc_path
+
+
+def refresh_existing(prefix: Path) -> Path | None:
+    """
+    `refresh()`, but only if prefix already has digest (ie. built by
+    `install --zcompile`). For commands that change completions in prefix without
+    being asked to build digest.
+    """
+    if not digest_path(prefix).exists():
+        return None
+    return refresh(prefix)
+
+
+def discard_stale(prefix: Path) -> None:
+    """
+    Removes prefix's digest if it no longer matches its functions.
+    """
+    zwc_path = digest_path(prefix)
+    if zwc_path.exists() and not _is_fresh(
+        prefix, _sources(_functions(ZshCompletion.site_functions_dir(prefix)))
+    ):
+        logger.info("Removing stale %s.", zwc_path)
+        _discard(prefix)
+
+
+def _functions(functions_dir: Path) -> list[Path]:
+    if not functions_dir.is_dir():
+        return []
+    return sorted(
+        _ for _ in functions_dir.iterdir() if not _.name.startswith(".") and _.is_file()
+    )
+
+
+def _sources(functions: list[Path]) -> dict[str, list]:
+    retv: dict[str, list] = {}
+    for _ in functions:
+        stat = _.stat()
+        retv[_.name] = [_.resolve().as_posix(), stat.st_size, stat.st_mtime_ns]
+    return retv
+
+
+def _is_fresh(prefix: Path, sources: dict[str, list]) -> bool:
+    try:
+        built_at = digest_path(prefix).stat().st_mtime_ns
+        with sources_path(prefix).open("r") as f:
+            built = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return built == {"digest_mtime_ns": built_at, "functions": sources}
+
+
+def _discard(prefix: Path) -> None:
+    digest_path(prefix).unlink(missing_ok=True)
+    sources_path(prefix).unlink(missing_ok=True)
+
+
+def _stderr(e: Exception) -> str:
+    if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+        return e.stderr.decode("utf-8", errors="replace").strip()
+    return str(e)
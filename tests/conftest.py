@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import http.server
+import io
+import tarfile
+import threading
+from datetime import UTC, datetime
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from usr_local_pull import generated, gh_client, probes
+from usr_local_pull.app import DEFAULT_PREFIX, GitHubApp
+from usr_local_pull.archive_extractor import MemberSpec
+from usr_local_pull.generated import GeneratedCache
+from usr_local_pull.gh_client import GhCache, GhRelease, GithubApiClient
+from usr_local_pull.pipeline import Stage
+from usr_local_pull.probes import ProbeCache
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+ASSET = "tool-linux-x86_64.tar.gz"
+
+
+class Tool(GitHubApp):
+    """
+    App installed from release of fake GitHub (see `github` fixture).
+    """
+
+    def __init__(self, prefix: str | Path = DEFAULT_PREFIX) -> None:
+        super().__init__(name="tool", prefix=prefix, gh_owner="acme", gh_repo="tool")
+
+    def download(self):
+        pending = self.client.extractor(ASSET).prefetch(
+            MemberSpec.binary("tool"), MemberSpec.man_pages("tool.1")
+        )
+
+        yield Stage.EXTRACT
+
+        self.add_selected(pending.select())
+
+
+class FakeGitHub:
+    """
+    Serves release assets over HTTP and release metadata instead of GitHub API.
+    """
+
+    ASSET = ASSET
+
+    def __init__(self, assets_dir: Path) -> None:
+        self.assets_dir = assets_dir
+        # Paths of served requests
+        self.requests: list[str] = []
+        self._releases: list[dict[str, Any]] = []
+        self._next_id = 1
+
+        handler = partial(_Handler, self, directory=str(assets_dir))
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.01,), daemon=True
+        )
+        self._thread.start()
+
+    def app(self, prefix: str | Path) -> Tool:
+        return Tool(prefix)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def release(self, version: str, *, digest: bool = True) -> bytes:
+        """
+        Publishes `tool` release `version` and returns its asset.
+        """
+        asset = _tar_gz(
+            {
+                "tool/tool": f"#!/bin/sh\necho tool {version}\n".encode(),
+                "tool/tool.1": f".TH TOOL 1 {version}\n".encode(),
+            }
+        )
+        (self.assets_dir / version).mkdir(parents=True)
+        (self.assets_dir / version / ASSET).write_bytes(asset)
+
+        self._releases.insert(
+            0,
+            {
+                "id": self._new_id(),
+                "tag_name": f"v{version}",
+                "name": version,
+                "tarball_url": f"{self.url}/{version}/source.tar.gz",
+                "assets": [
+                    {
+                        "id": self._new_id(),
+                        "name": ASSET,
+                        "browser_download_url": f"{self.url}/{version}/{ASSET}",
+                        "size": len(asset),
+                        "digest": (
+                            f"sha256:{hashlib.sha256(asset).hexdigest()}"
+                            if digest
+                            else None
+                        ),
+                    }
+                ],
+                GhRelease.DOWNLOADED_AT_KEY: datetime.now(UTC).isoformat(),
+            },
+        )
+        return asset
+
+    def releases(self) -> list[dict[str, Any]]:
+        return [dict(_) for _ in self._releases]
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+
+class _Handler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, github: FakeGitHub, *args, **kwargs) -> None:
+        self.github = github
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.github.requests.append(self.path)
+        super().do_GET()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _tar_gz(files: dict[str, bytes]) -> bytes:
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o755
+            tar.addfile(info, io.BytesIO(data))
+    return f.getvalue()
+
+
+@pytest.fixture
+def github(tmp_path: Path, monkeypatch) -> Iterator[FakeGitHub]:
+    """
+    Fake GitHub, with all caches in `tmp_path` instead of `~/.cache`.
+    """
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setattr(gh_client, "_CACHE", GhCache())
+    monkeypatch.setattr(gh_client, "_pinned", None)
+    monkeypatch.setattr(gh_client, "_mirror", None)
+    monkeypatch.setattr(probes, "_CACHE", ProbeCache())
+    monkeypatch.setattr(generated, "_CACHE", GeneratedCache())
+
+    retv = FakeGitHub(tmp_path / "github")
+    monkeypatch.setattr(GithubApiClient, "_gh_releases", retv.releases)
+    yield retv
+    retv.close()
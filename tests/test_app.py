@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from usr_local_pull.app import _executable
+from usr_local_pull.app_files import AppBinary
+from usr_local_pull.gh_client import GhExtractedArtifacts
+
+SCRIPT = b"#!/bin/sh\necho hi\n"
+
+
+@pytest.fixture
+def artifacts(tmp_path: Path) -> GhExtractedArtifacts:
+    return GhExtractedArtifacts(tmp_path / "asset.1.extracted")
+
+
+class DescribeExecutable:
+    def it_runs_cached_executable_in_place(self, artifacts):
+        source = artifacts.add("bin/tool", SCRIPT, executable=True)
+
+        with _executable(AppBinary("tool", None, source)) as (path, fds):
+            assert path == source.path.as_posix()
+            assert fds == ()
+
+    def it_doesnt_chmod_cached_file_that_isnt_executable(self, artifacts):
+        source = artifacts.add("bin/tool", SCRIPT)
+        mode = source.path.stat().st_mode
+
+        with _executable(AppBinary("tool", None, source)) as (path, _):
+            assert path != source.path.as_posix()
+            assert Path(path).read_bytes() == SCRIPT
+
+        assert source.path.stat().st_mode == mode
+        assert not mode & stat.S_IXUSR
+
+    def it_doesnt_run_cached_file_with_different_content(self, artifacts):
+        source = artifacts.add("bin/tool", SCRIPT, executable=True)
+        st = source.path.stat()
+        source.path.write_bytes(SCRIPT.replace(b"hi", b"yo"))
+        os.utime(source.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        with _executable(AppBinary("tool", SCRIPT, source)) as (path, _):
+            assert path != source.path.as_posix()
+            assert Path(path).read_bytes() == SCRIPT
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import io
+import tarfile
+
+import pytest
+
+from usr_local_pull.archive_extractor import ArchiveExtractor
+
+
+def _tar(files: dict[str, bytes], compression: str) -> bytes:
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode=f"w:{compression}") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return f.getvalue()
+
+
+def _ar(members: dict[str, bytes]) -> bytes:
+    retv = b"!<arch>\n"
+    for name, data in members.items():
+        header = (
+            f"{name + '/':<16}{0:<12}{0:<6}{0:<6}{100644:<8}{len(data):<10}`\n"
+        ).encode()
+        retv += header + data + (b"\n" if len(data) % 2 else b"")
+    return retv
+
+
+@pytest.fixture(params=["", "gz", "bz2", "xz"])
+def deb(request) -> bytes:
+    data_tar = _tar(
+        {"./usr/bin/rg": b"rg binary", "./usr/share/doc/rg": b"doc"}, request.param
+    )
+    suffix = f".{request.param}" if request.param else ""
+    return _ar(
+        {
+            "debian-binary": b"2.0\n",
+            "control.tar.gz": _tar({"./control": b"Package: rg\n"}, "gz"),
+            f"data.tar{suffix}": data_tar,
+            "trailer": b"odd",
+        }
+    )
+
+
+class DescribeArchiveExtractor:
+    def it_extracts_members_of_deb(self, deb):
+        extractor = ArchiveExtractor("rg.deb", deb)
+
+        assert extractor.extract("debian-binary") == b"2.0\n"
+        assert extractor.extract("trailer") == b"odd"
+
+    def it_streams_nested_members_of_deb(self, deb):
+        extractor = ArchiveExtractor("rg.deb", deb)
+
+        assert extractor.extract("data.tar*!/./usr/bin/rg") == b"rg binary"
+        assert extractor.nested("data.tar*").members == [
+            "./usr/bin/rg",
+            "./usr/share/doc/rg",
+        ]
+
+    @pytest.mark.parametrize("args", [(), (-1,)])
+    def it_reads_nested_member_stream_only_to_its_end(self, args):
+        data_tar = _tar({"./usr/bin/rg": b"rg binary"}, "")
+        extractor = ArchiveExtractor(
+            "rg.deb", _ar({"data.tar": data_tar, "trailer": b"odd"})
+        )
+
+        stream = extractor._ar_member_stream("data.tar")
+        assert stream.read(*args) == data_tar
+        assert stream.read(*args) == b""
+
+    def it_reads_nested_member_stream_into_buffer(self):
+        extractor = ArchiveExtractor(
+            "rg.deb", _ar({"member": b"0123456789", "trailer": b"odd"})
+        )
+
+        stream = extractor._ar_member_stream("member")
+        buf = bytearray(4)
+        assert [stream.readinto(buf) for _ in range(4)] == [4, 4, 2, 0]
+        assert stream.seek(8) == 8
+        assert io.BufferedReader(stream).read() == b"89"  # type: ignore
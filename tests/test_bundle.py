@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import tarfile
+from typing import TYPE_CHECKING
+
+import pytest
+
+from usr_local_pull import bundle as bundles
+from usr_local_pull.bundle import (
+    BundledApp,
+    BundleEntry,
+    BundleFile,
+    BundleIndex,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+V1 = {
+    "aa": ("1.0.0", {"bin/aa": b"aa 1", "share/man/man1/aa.1": b"aa manual"}),
+    "bb": ("2.0.0", {"bin/bb": b"bb 2", "share/doc/bb": b"bb docs"}),
+    "cc": ("3.0.0", {"bin/cc": b"cc 3"}),
+}
+V2 = {
+    # Only binary changed
+    "aa": ("1.1.0", {"bin/aa": b"aa 1.1", "share/man/man1/aa.1": b"aa manual"}),
+    # Unchanged
+    "bb": V1["bb"],
+    # File added, another one changed
+    "cc": ("3.1.0", {"bin/cc": b"cc 3.1", "share/zsh/site-functions/_cc": b"#compdef"}),
+}
+
+
+def _entry(name: str, version: str, files: dict[str, bytes]) -> BundleEntry:
+    return BundleEntry(
+        app_name=name,
+        version=version,
+        binary=f"bin/{name}",
+        files=[
+            BundleFile(
+                path=path,
+                mode=0o755 if path.startswith("bin/") else 0o644,
+                size=len(data),
+                sha256=hashlib.sha256(data).hexdigest(),
+            )
+            for path, data in files.items()
+        ],
+    )
+
+
+def _bundle(path: Path, apps: dict[str, tuple[str, dict[str, bytes]]]) -> Path:
+    index = BundleIndex(
+        apps=[_entry(name, *version_files) for name, version_files in apps.items()]
+    )
+    bundles._write(
+        path,
+        index,
+        (
+            (f"files/{file.path}", apps[entry.app_name][1][file.path], file.mode)
+            for entry in index.apps
+            for file in entry.files
+        ),
+    )
+    return path
+
+
+def _members(path: Path) -> list[str]:
+    with tarfile.open(path) as tar:
+        return tar.getnames()
+
+
+@pytest.fixture
+def v1(tmp_path: Path) -> Path:
+    return _bundle(tmp_path / "v1.tar.gz", V1)
+
+
+@pytest.fixture
+def v2(tmp_path: Path) -> Path:
+    return _bundle(tmp_path / "v2.tar.gz", V2)
+
+
+@pytest.fixture
+def prefix(tmp_path: Path, v1: Path) -> Path:
+    retv = tmp_path / "prefix"
+    bundles.install(v1, retv)
+    return retv
+
+
+def _content(prefix: Path, apps: dict[str, tuple[str, dict[str, bytes]]]) -> None:
+    for _, files in apps.values():
+        for path, data in files.items():
+            assert (prefix / path).read_bytes() == data
+
+
+class DescribeDelta:
+    def it_has_only_changed_apps_and_files(self, tmp_path, v1, v2):
+        index = bundles.delta(bundles.state_of(v1), v2, tmp_path / "delta.tar.gz")
+
+        assert [_.app_name for _ in index.apps] == ["aa", "cc"]
+        assert _members(tmp_path / "delta.tar.gz") == [
+            "index.json",
+            "files/bin/aa",
+            "files/bin/cc",
+            "files/share/zsh/site-functions/_cc",
+        ]
+
+    def it_keeps_members_in_index_order(self, tmp_path, v1):
+        # Apps and files in target aren't sorted, delta stream must still follow them
+        target = _bundle(
+            tmp_path / "target.tar.gz",
+            {
+                "cc": ("3.1.0", {"share/zsh/site-functions/_cc": b"x", "bin/cc": b"y"}),
+                "aa": ("1.1.0", {"share/man/man1/aa.1": b"z", "bin/aa": b"w"}),
+            },
+        )
+        index = bundles.delta(bundles.state_of(v1), target, tmp_path / "delta.tar.gz")
+
+        expected = [
+            f"files/{file.path}"
+            for entry in index.apps
+            for file in entry.files
+            if index.has_data(entry, file)
+        ]
+        assert _members(tmp_path / "delta.tar.gz")[1:] == expected
+        assert expected == [
+            "files/share/zsh/site-functions/_cc",
+            "files/bin/cc",
+            "files/share/man/man1/aa.1",
+            "files/bin/aa",
+        ]
+
+    def it_refuses_delta_as_target(self, tmp_path, v1, v2):
+        delta = tmp_path / "delta.tar.gz"
+        bundles.delta(bundles.state_of(v1), v2, delta)
+
+        with pytest.raises(ValueError, match="is delta bundle"):
+            bundles.delta(bundles.state_of(v1), delta, tmp_path / "again.tar.gz")
+
+    def it_updates_prefix_to_target(self, tmp_path, v2, prefix):
+        delta = tmp_path / "delta.tar.gz"
+        bundles.delta(bundles.state_of(prefix), v2, delta)
+
+        bundles.install(delta, prefix)
+
+        _content(prefix, V2)
+        assert bundles.state_of(prefix) == bundles.state_of(v2)
+
+
+class DescribeVerifyBase:
+    def it_refuses_prefix_at_other_version(self, tmp_path, v1, v2, prefix):
+        delta = tmp_path / "delta.tar.gz"
+        bundles.delta(bundles.state_of(v1), v2, delta)
+        # Prefix moved on since delta was made
+        bundles.install(v2, prefix)
+        older = _bundle(tmp_path / "older.tar.gz", {"aa": V1["aa"]})
+        bundles.install(older, prefix)
+
+        with pytest.raises(
+            ValueError, match=r"doesn't apply.*cc is 3\.1\.0, expected 3\.0\.0"
+        ):
+            bundles.install(delta, prefix)
+
+        _content(prefix, {"aa": V1["aa"], "cc": V2["cc"]})
+
+    def it_refuses_prefix_with_locally_modified_file(self, tmp_path, v2, prefix):
+        delta = tmp_path / "delta.tar.gz"
+        bundles.delta(bundles.state_of(prefix), v2, delta)
+        (prefix / "share/man/man1/aa.1").write_bytes(b"edited")
+
+        with pytest.raises(ValueError, match=r"share/man/man1/aa\.1 changed"):
+            bundles.install(delta, prefix)
+
+        assert (prefix / "bin/aa").read_bytes() == b"aa 1"
+        assert (prefix / "share/man/man1/aa.1").read_bytes() == b"edited"
+
+
+class DescribeBundledApp:
+    def it_takes_files_missing_in_delta_from_prefix(self, prefix):
+        entry = _entry("aa", *V2["aa"])
+        app = BundledApp(entry, prefix=prefix, base=_entry("aa", *V1["aa"]).state)
+        app.data["bin/aa"] = b"aa 1.1"
+
+        files = {_.path: _.content() for _ in app.install_files()}
+
+        assert files == {
+            prefix / "bin/aa": b"aa 1.1",
+            prefix / "share/man/man1/aa.1": b"aa manual",
+        }
+
+    def it_refuses_base_file_changed_in_prefix(self, prefix):
+        entry = _entry("aa", *V2["aa"])
+        app = BundledApp(entry, prefix=prefix, base=_entry("aa", *V1["aa"]).state)
+        app.data["bin/aa"] = b"aa 1.1"
+        (prefix / "share/man/man1/aa.1").write_bytes(b"edited")
+
+        with pytest.raises(ValueError, match=r"aa\.1 is missing or corrupted"):
+            app.install_files()
+
+
+class DescribeExportImport:
+    def it_installs_exported_apps(self, github, tmp_path):
+        github.release("1.0")
+        path = tmp_path / "bundle.tar.gz"
+        prefix = tmp_path / "target"
+
+        index = bundles.export([github.app(tmp_path / "build")], path)
+        requests = list(github.requests)
+        installed = bundles.install(path, prefix)
+
+        assert [(_.app_name, _.version) for _ in index.apps] == [("tool", "1.0")]
+        assert _members(path) == [
+            "index.json",
+            "files/bin/tool",
+            "files/share/man/man1/tool.1",
+        ]
+        assert set(installed) == {prefix / "bin/tool", prefix / "share/man/man1/tool.1"}
+        assert (prefix / "bin/tool").read_bytes() == b"#!/bin/sh\necho tool 1.0\n"
+        assert (prefix / "bin/tool").stat().st_mode & 0o777 == 0o755
+        assert bundles.state_of(prefix) == index.state
+        # Importing doesn't talk to GitHub
+        assert github.requests == requests
+
+    def it_skips_apps_already_at_bundled_version(self, github, tmp_path):
+        github.release("1.0")
+        path = tmp_path / "bundle.tar.gz"
+        prefix = tmp_path / "target"
+        bundles.export([github.app(tmp_path / "build")], path)
+        bundles.install(path, prefix)
+
+        assert bundles.install(path, prefix) == []
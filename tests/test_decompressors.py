@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import gzip
+import io
+import random
+from typing import TYPE_CHECKING
+
+import pytest
+
+from usr_local_pull import decompressors
+from usr_local_pull.decompressors import open_decompressed
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DATA = random.Random(42).randbytes(3 * 1024 * 1024)
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self, data: bytes) -> None:
+        self._f = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        return self._f.readinto(b)
+
+
+@pytest.fixture
+def failing_pigz(tmp_path: Path, monkeypatch) -> None:
+    # Gives first part of output and fails, like on I/O error or when killed
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    tool = bin_dir / "pigz"
+    tool.write_text(
+        "#!/bin/sh\n"
+        "/usr/bin/gzip -d -c | /usr/bin/head -c 1500000\n"
+        "echo 'pigz: oops' >&2\n"
+        "exit 1\n"
+    )
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setattr(decompressors, "_backend", "auto")
+    assert decompressors.system_tool("gz") == (str(tool), "-d", "-c")
+
+
+class DescribeOpenDecompressed:
+    def it_continues_with_stdlib_when_tool_fails_midway(self, failing_pigz):
+        f = io.BytesIO(b"prefix" + gzip.compress(DATA))
+        f.seek(len(b"prefix"))
+
+        with open_decompressed(f, "gz") as stream:
+            assert stream.read() == DATA
+
+    def it_continues_with_stdlib_in_small_reads(self, failing_pigz):
+        f = io.BytesIO(gzip.compress(DATA))
+
+        with open_decompressed(f, "gz") as stream:
+            chunks = iter(lambda: stream.read(4096), b"")
+            assert b"".join(chunks) == DATA
+
+    def it_fails_when_tool_fails_on_unseekable_stream(self, failing_pigz):
+        f = _Unseekable(gzip.compress(DATA))
+
+        with (
+            pytest.raises(ValueError, match="pigz failed with 1: pigz: oops"),
+            open_decompressed(f, "gz") as stream,  # type: ignore
+        ):
+            assert len(stream.read()) < len(DATA)
+
+    def it_uses_stdlib_when_asked_to(self, failing_pigz, monkeypatch):
+        monkeypatch.setattr(decompressors, "_backend", "stdlib")
+
+        f = _Unseekable(gzip.compress(DATA))
+
+        with open_decompressed(f, "gz") as stream:  # type: ignore
+            assert stream.read() == DATA
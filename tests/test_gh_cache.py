@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from usr_local_pull import gh_client
+from usr_local_pull.gh_client import GhCache
+
+
+@pytest.fixture
+def repo_dir(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setenv("HOME", str(tmp_path))
+    retv = tmp_path / ".cache" / "usr-local-pull" / "owner" / "repo"
+    retv.mkdir(parents=True)
+    return retv
+
+
+def _asset(repo_dir: Path, gh_id: int, size: int, last_used: int) -> Path:
+    retv = repo_dir / f"asset.{gh_id}"
+    retv.write_bytes(b"x" * size)
+    extracted = repo_dir / f"asset.{gh_id}.extracted"
+    extracted.mkdir()
+    (extracted / "member").write_bytes(b"y" * size)
+    for _ in (retv, extracted):
+        os.utime(_, (last_used, last_used))
+    return retv
+
+
+class DescribeGhCache:
+    def it_evicts_least_recently_used_downloads_over_limit(self, repo_dir):
+        old = _asset(repo_dir, 1, 100, last_used=1000)
+        new = _asset(repo_dir, 2, 100, last_used=2000)
+
+        GhCache(max_downloads_size=300).evict()
+
+        assert not old.exists()
+        assert not old.with_name("asset.1.extracted").exists()
+        assert new.exists()
+        assert new.with_name("asset.2.extracted").exists()
+
+    def it_keeps_everything_under_limit(self, repo_dir):
+        paths = [_asset(repo_dir, _, 100, last_used=1000 * _) for _ in (1, 2)]
+
+        GhCache(max_downloads_size=400).evict()
+
+        assert all(_.exists() for _ in paths)
+
+    def it_ignores_files_evicted_concurrently(self, repo_dir, monkeypatch):
+        gone = _asset(repo_dir, 1, 100, last_used=1000)
+        kept = _asset(repo_dir, 2, 100, last_used=2000)
+        member = gone.with_name("asset.1.extracted") / "member"
+
+        # Listed, but removed by another run before it is stat-ed
+        stat = Path.stat
+
+        def racy_stat(self, *args, **kwargs):
+            if self in (gone, member):
+                raise FileNotFoundError(self)
+            return stat(self, *args, **kwargs)
+
+        monkeypatch.setattr(Path, "stat", racy_stat)
+
+        GhCache(max_downloads_size=200).evict()
+
+        assert kept.exists()
+
+    def it_has_configurable_limit(self, monkeypatch):
+        monkeypatch.setattr(gh_client, "_CACHE", GhCache())
+
+        gh_client.set_max_downloads_size(1024)
+        assert gh_client._CACHE.max_downloads_size == 1024
+
+        with pytest.raises(ValueError, match="negative"):
+            gh_client.set_max_downloads_size(-1)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import email.message
+import io
+import random
+import urllib.error
+import zipfile
+
+import pytest
+
+from usr_local_pull.gh_client import HttpRangeReader, _RangesNotSupportedError
+
+
+def _zip(rnd: random.Random) -> tuple[bytes, dict[str, bytes]]:
+    members = {
+        f"dir-{i}/{'x' * rnd.randint(1, 200)}-{i}": rnd.randbytes(
+            rnd.randint(0, HttpRangeReader.MIN_FETCH // 8)
+        )
+        for i in range(rnd.randint(20, 200))
+    }
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+    return f.getvalue(), members
+
+
+def _http_error(code: int) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError(
+        "https://example.com/a.zip", code, "error", email.message.Message(), None
+    )
+
+
+FAILURES = [
+    pytest.param(_http_error(403), id="403"),
+    pytest.param(_http_error(416), id="416"),
+    pytest.param(urllib.error.URLError("connection refused"), id="URLError"),
+    pytest.param(_RangesNotSupportedError(), id="non-206"),
+]
+
+
+def _reader(data: bytes, monkeypatch, **kwargs) -> HttpRangeReader:
+    monkeypatch.setattr(
+        HttpRangeReader,
+        "_fetch_from",
+        lambda self, url, start, end: data[start:end],
+    )
+    retv = HttpRangeReader.open("https://example.com/a.zip", len(data), **kwargs)
+    assert retv
+    return retv
+
+
+class DescribeHttpRangeReader:
+    @pytest.mark.parametrize("seed", range(30))
+    def it_reads_members_in_any_order(self, seed, monkeypatch):
+        rnd = random.Random(seed)
+        data, members = _zip(rnd)
+        names = list(members)
+        rnd.shuffle(names)
+
+        with zipfile.ZipFile(_reader(data, monkeypatch)) as zf:
+            for _ in names:
+                assert zf.read(_) == members[_]
+
+    def it_fills_whole_buffer_across_windows(self, monkeypatch):
+        data = random.Random(0).randbytes(4 * HttpRangeReader.MIN_FETCH)
+        reader = _reader(data, monkeypatch)
+
+        assert reader.read(10) == data[:10]
+        # Starts just before end of window fetched by previous read
+        reader.seek(HttpRangeReader.MIN_FETCH - 10)
+        assert reader.read(100) == data[HttpRangeReader.MIN_FETCH - 10 :][:100]
+
+    @pytest.mark.parametrize("error", FAILURES)
+    def it_isnt_opened_when_tail_fetch_fails(self, error, monkeypatch):
+        def fail(self, url, start, end):
+            raise error
+
+        monkeypatch.setattr(HttpRangeReader, "_fetch_from", fail)
+        assert HttpRangeReader.open("https://example.com/a.zip", 1000) is None
+
+    @pytest.mark.parametrize("error", FAILURES)
+    def it_downloads_whole_file_when_range_request_fails(self, error, monkeypatch):
+        data, members = _zip(random.Random(0))
+        reader = _reader(data, monkeypatch, download=lambda: data)
+
+        def fail(self, url, start, end):
+            raise error
+
+        monkeypatch.setattr(HttpRangeReader, "_fetch_from", fail)
+        with zipfile.ZipFile(reader) as zf:
+            for name, content in members.items():
+                assert zf.read(name) == content
+
+    @pytest.mark.parametrize("error", FAILURES)
+    def it_fails_with_value_error_without_download(self, error, monkeypatch):
+        data = random.Random(0).randbytes(4 * HttpRangeReader.MIN_FETCH)
+        reader = _reader(data, monkeypatch)
+
+        def fail(self, url, start, end):
+            raise error
+
+        monkeypatch.setattr(HttpRangeReader, "_fetch_from", fail)
+        with pytest.raises(ValueError, match="Couldn't download"):
+            reader.read(10)
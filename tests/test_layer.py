@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from usr_local_pull import bundle as bundles
+from usr_local_pull import gh_client, layer
+from usr_local_pull.gh_client import GhCache
+
+PREFIX = Path("/usr/local")
+
+
+def _layer(github, path: Path) -> bytes:
+    prepared = bundles.prepare([github.app(PREFIX)])
+    layer.write(prepared, PREFIX, path, mtime=1700000000)
+    return path.read_bytes()
+
+
+class DescribeLayer:
+    @pytest.mark.parametrize("name", ["tools.tar", "tools.tar.gz"])
+    def it_is_byte_identical_across_runs(self, github, tmp_path, monkeypatch, name):
+        github.release("1.0")
+
+        first = _layer(github, tmp_path / f"first-{name}")
+        # Second run finds everything already extracted in cache
+        monkeypatch.setattr(gh_client, "_CACHE", GhCache())
+        second = _layer(github, tmp_path / f"second-{name}")
+
+        assert first == second
+
+    def it_has_prefix_files_and_receipt(self, github, tmp_path):
+        github.release("1.0")
+        path = tmp_path / "tools.tar"
+        _layer(github, path)
+
+        with tarfile.open(path) as tar:
+            members = {_.name: _ for _ in tar.getmembers()}
+            assert tar.extractfile(members["usr/local/bin/tool"]).read() == (  # type: ignore
+                b"#!/bin/sh\necho tool 1.0\n"
+            )
+
+        assert "usr/local/lib/usr-local-pull/receipts/tool.json" in members
+        assert members["usr/local/bin/tool"].mode == 0o755
+        assert {(_.uid, _.gid, _.mtime) for _ in members.values()} == {
+            (0, 0, 1700000000)
+        }
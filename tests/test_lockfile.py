@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING
+
+import pytest
+
+from usr_local_pull import gh_client
+from usr_local_pull.gh_client import GhCache
+from usr_local_pull.lockfile import Lockfile
+from usr_local_pull.pipeline import InstallPipeline
+from usr_local_pull.receipts import InstallReceipt
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def prefix(tmp_path: Path) -> Path:
+    return tmp_path / "prefix"
+
+
+def _extracted(home: Path) -> list[Path]:
+    return [_ for _ in home.rglob("*.extracted/*") if _.name != "digest"]
+
+
+class DescribeLock:
+    def it_takes_published_digest_without_downloading(self, github, prefix, tmp_path):
+        asset = github.release("1.0")
+
+        lock = Lockfile.resolve([github.app(prefix)])
+
+        [locked] = lock.apps["tool"].assets
+        assert (locked.name, locked.size) == (github.ASSET, len(asset))
+        assert locked.url == f"{github.url}/1.0/{github.ASSET}"
+        assert github.requests == []
+        assert _extracted(tmp_path / "home") == []
+
+    def it_computes_missing_digest_without_extracting(self, github, prefix, tmp_path):
+        asset = github.release("1.0", digest=False)
+
+        lock = Lockfile.resolve([github.app(prefix)])
+
+        [locked] = lock.apps["tool"].assets
+        assert locked.sha256 == hashlib.sha256(asset).hexdigest()
+        assert github.requests == [f"/1.0/{github.ASSET}"]
+        assert _extracted(tmp_path / "home") == []
+
+
+class DescribeLockedInstall:
+    def it_installs_locked_release_after_round_trip(self, github, prefix, tmp_path):
+        github.release("1.0")
+        path = tmp_path / "lock.json"
+        resolved = Lockfile.resolve([github.app(prefix)])
+        resolved.save(path)
+        github.release("2.0")
+
+        lock = Lockfile.load(path)
+        assert lock == resolved
+        gh_client.pin_releases(lock.releases)
+        InstallPipeline([github.app(prefix)]).run()
+
+        assert (prefix / "bin/tool").read_bytes() == b"#!/bin/sh\necho tool 1.0\n"
+        assert InstallReceipt.load(prefix, "tool").version == "1.0"  # type: ignore
+        assert f"/2.0/{github.ASSET}" not in github.requests
+
+    def it_refuses_asset_that_doesnt_match_lock(
+        self, github, prefix, tmp_path, monkeypatch
+    ):
+        github.release("1.0")
+        lock = Lockfile.resolve([github.app(prefix)])
+        # Replaced on the server (or mirror) after it was locked
+        (github.assets_dir / "1.0" / github.ASSET).write_bytes(b"tampered")
+        monkeypatch.setattr(gh_client, "_CACHE", GhCache())
+
+        gh_client.pin_releases(lock.releases)
+        with pytest.raises(ValueError, match="sha256"):
+            InstallPipeline([github.app(prefix)]).run()
+
+        assert not (prefix / "bin/tool").exists()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+from usr_local_pull import materialize
+from usr_local_pull.app_files import StoredFile
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DATA = b"binary content" * 1000
+
+
+@pytest.fixture(params=materialize.MODES)
+def mode(request, monkeypatch) -> str:
+    monkeypatch.setattr(materialize, "_mode", request.param)
+    return request.param
+
+
+def _stored(path: Path, data: bytes = DATA) -> StoredFile:
+    path.write_bytes(data)
+    path.chmod(0o644)
+    st = path.stat()
+    return StoredFile(
+        path=path,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        sha256=hashlib.sha256(data).hexdigest(),
+    )
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Path:
+    retv = tmp_path / "store"
+    retv.mkdir(mode=0o755)
+    retv.chmod(0o755)
+    return retv
+
+
+class DescribeCreateTemp:
+    def it_creates_file_from_cached_one_without_data(self, tmp_path, store, mode):
+        source = _stored(store / "cached")
+
+        tmp = materialize.create_temp(tmp_path / "installed", None, source)
+        assert tmp.read_bytes() == DATA
+        is_root = os.geteuid() == 0
+        assert (tmp.stat().st_ino == source.path.stat().st_ino) == (
+            mode == "hardlink" and is_root
+        )
+
+    def it_doesnt_hardlink_cache_not_owned_by_root(self, tmp_path, store, monkeypatch):
+        monkeypatch.setattr(materialize, "_mode", "hardlink")
+        source = _stored(store / "cached")
+        if os.geteuid() == 0:
+            os.chown(source.path, 1000, 1000)
+
+        tmp = materialize.create_temp(tmp_path / "installed", None, source)
+        assert tmp.read_bytes() == DATA
+        assert tmp.stat().st_ino != source.path.stat().st_ino
+
+    def it_doesnt_hardlink_cache_writable_by_others(self, tmp_path, store, monkeypatch):
+        monkeypatch.setattr(materialize, "_mode", "hardlink")
+        source = _stored(store / "cached")
+        store.chmod(0o777)
+
+        tmp = materialize.create_temp(tmp_path / "installed", None, source)
+        assert tmp.stat().st_ino != source.path.stat().st_ino
+
+    def it_writes_data_when_cached_file_was_changed(self, tmp_path, store, mode):
+        source = _stored(store / "cached")
+        changed = DATA[:100] + b"X" + DATA[101:]
+        source.path.write_bytes(changed)
+
+        tmp = materialize.create_temp(tmp_path / "installed", DATA, source)
+        assert tmp.read_bytes() == DATA
+        assert tmp.stat().st_ino != source.path.stat().st_ino
+        assert source.path.read_bytes() == changed
+
+    def it_writes_data_when_cached_file_is_gone(self, tmp_path, store, mode):
+        source = _stored(store / "cached")
+        source.path.unlink()
+
+        tmp = materialize.create_temp(tmp_path / "installed", DATA, source)
+        assert tmp.read_bytes() == DATA
+
+    def it_refuses_corrupted_cached_file_it_has_to_read(self, tmp_path, store):
+        source = _stored(store / "cached")
+        st = source.path.stat()
+        source.path.write_bytes(b"\0" * len(DATA))
+        os.utime(source.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        with pytest.raises(ValueError, match="corrupted"):
+            source.read()
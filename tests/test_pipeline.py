@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from usr_local_pull.pipeline import InstallPipeline, PrefixFanOut
+from usr_local_pull.receipts import InstallReceipt
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _fan_out(github, prefixes: list[Path]) -> list[Path]:
+    fan_out = PrefixFanOut(prefixes)
+    return InstallPipeline(
+        [github.app(prefixes[0])], check=fan_out.check, commit=fan_out.commit
+    ).run()
+
+
+class DescribePrefixFanOut:
+    def it_writes_receipt_into_each_prefix(self, github, tmp_path):
+        asset = f"/1.0/{github.ASSET}"
+        github.release("1.0")
+        prefixes = [tmp_path / "a", tmp_path / "b", tmp_path / "c"]
+
+        installed = _fan_out(github, prefixes)
+
+        assert {_ / "bin/tool" for _ in prefixes} <= set(installed)
+        for _ in prefixes:
+            receipt = InstallReceipt.load(_, "tool")
+            assert receipt is not None
+            assert receipt.version == "1.0"
+            assert receipt.binary_is_intact(_)
+        assert github.requests == [asset]
+
+    def it_installs_only_into_prefixes_that_need_it(self, github, tmp_path):
+        github.release("1.0")
+        a, b = tmp_path / "a", tmp_path / "b"
+        _fan_out(github, [a])
+        receipt_a = InstallReceipt.path(a, "tool").read_bytes()
+
+        installed = _fan_out(github, [a, b])
+
+        assert b / "bin/tool" in installed
+        assert all(_.is_relative_to(b) for _ in installed)
+        assert InstallReceipt.path(a, "tool").read_bytes() == receipt_a
+        assert InstallReceipt.load(b, "tool").version == "1.0"  # type: ignore
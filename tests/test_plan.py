@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from packaging.version import Version
+
+from usr_local_pull import probes
+from usr_local_pull.app import GitHubApp
+from usr_local_pull.pipeline import Stage
+from usr_local_pull.plan import _plan
+from usr_local_pull.probes import ProbeCache
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class _App(GitHubApp):
+    def __init__(self, prefix: Path) -> None:
+        super().__init__(name="tool", prefix=prefix, gh_owner="o", gh_repo="tool")
+        self.done: list[str] = []
+
+    @property
+    def latest_available_version(self):
+        return Version("2.0")
+
+    def download(self):
+        self.done.append("choose assets")
+        yield Stage.EXTRACT
+        self.done.append("extract")
+
+
+class _UnstagedApp(_App):
+    def download(self):
+        self.done.append("everything")
+
+
+@pytest.fixture
+def cache(tmp_path: Path, monkeypatch) -> ProbeCache:
+    retv = ProbeCache(tmp_path / "probes.json")
+    monkeypatch.setattr(probes, "_CACHE", retv)
+    return retv
+
+
+@pytest.fixture
+def prefix(tmp_path: Path) -> Path:
+    retv = tmp_path / "prefix"
+    (retv / "bin").mkdir(parents=True)
+    tool = retv / "bin" / "tool"
+    tool.write_text("#!/bin/sh\necho tool 1.0\n")
+    tool.chmod(0o755)
+    return retv
+
+
+class DescribePlan:
+    def it_stops_after_choosing_assets(self, prefix, cache):
+        app = _App(prefix)
+
+        retv = _plan(app)
+
+        assert retv.error is None
+        assert (retv.installed, retv.latest, retv.needs_install) == ("1.0", "2.0", True)
+        assert app.done == ["choose assets"]
+
+    def it_doesnt_write_probe_cache(self, prefix, cache):
+        _plan(_App(prefix))
+
+        assert not cache.path.exists()
+
+    def it_refuses_to_run_unstaged_download(self, prefix, cache):
+        app = _UnstagedApp(prefix)
+
+        retv = _plan(app)
+
+        assert "isn't staged" in retv.error  # type: ignore
+        assert app.done == []
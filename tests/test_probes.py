@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+import pytest
+from packaging.version import Version
+
+from usr_local_pull import probes
+from usr_local_pull.probes import ProbeCache, VersionProbe
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path: Path, monkeypatch) -> ProbeCache:
+    retv = ProbeCache(tmp_path / "probes.json")
+    monkeypatch.setattr(probes, "_CACHE", retv)
+    return retv
+
+
+@pytest.fixture
+def prefix(tmp_path: Path) -> Path:
+    retv = tmp_path / "prefix"
+    (retv / "bin").mkdir(parents=True)
+    return retv
+
+
+def _install(prefix: Path, script: str) -> None:
+    path = prefix / "bin" / "tool"
+    path.write_text(f"#!/bin/sh\n{script}\n")
+    path.chmod(0o755)
+
+
+class DescribeProbe:
+    def it_parses_version(self, prefix):
+        _install(prefix, "echo tool 1.2.3")
+
+        assert probes.probe(prefix, VersionProbe("tool"), app_name="tool") == Version(
+            "1.2.3"
+        )
+
+    @pytest.mark.parametrize(
+        ("script", "reason"),
+        [
+            ("echo 'no such option' >&2; exit 3", "exited with 3: no such option"),
+            ("exec /bin/sleep 5", "didn't finish in 0.2s"),
+        ],
+    )
+    def it_warns_when_binary_fails(self, prefix, monkeypatch, caplog, script, reason):
+        monkeypatch.setattr(probes, "PROBE_TIMEOUT", 0.2)
+        _install(prefix, script)
+
+        with caplog.at_level(logging.WARNING, logger="usr_local_pull"):
+            assert probes.probe(prefix, VersionProbe("tool"), app_name="my-app") is None
+
+        [record] = caplog.records
+        assert record.app_name == "my-app"
+        assert record.getMessage().startswith("my-app didn't report its version")
+        assert reason in record.getMessage()
+
+    def it_warns_when_output_has_no_version(self, prefix, caplog):
+        _install(prefix, "echo 'tool, no version here'")
+        version_probe = VersionProbe("tool", regex=r"v(\d+\.\d+)")
+
+        with caplog.at_level(logging.WARNING, logger="usr_local_pull"):
+            assert probes.probe(prefix, version_probe, app_name="my-app") is None
+
+        [record] = caplog.records
+        assert "Can't find my-app version" in record.getMessage()
+
+    def it_assumes_fallback_version_of_broken_binary(self, prefix):
+        _install(prefix, "exit 1")
+        version_probe = VersionProbe("tool", fallback_version="0.1")
+
+        assert probes.probe(prefix, version_probe, app_name="tool") == Version("0.1")
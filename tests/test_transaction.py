@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from usr_local_pull.transaction import InstallTransaction
+
+APP_NAME = "app"
+
+
+class _Crash(BaseException):
+    """
+    Process dying at some point of commit: nothing after it runs.
+    """
+
+
+@pytest.fixture
+def prefix(tmp_path: Path) -> Path:
+    retv = tmp_path / "prefix"
+    (retv / "bin").mkdir(parents=True)
+    (retv / "bin" / "a").write_bytes(b"old a")
+    (retv / "bin" / "b").write_bytes(b"old b")
+    (retv / "bin" / "c").write_bytes(b"old c")
+    return retv
+
+
+def _contents(prefix: Path) -> dict[str, bytes]:
+    return {
+        _.relative_to(prefix).as_posix(): _.read_bytes()
+        for _ in sorted(prefix.rglob("*"))
+        if _.is_file()
+        and "usr-local-pull" not in _.parts
+        and not _.name.endswith(".usr-local-pull-backup")
+    }
+
+
+def _install(prefix: Path) -> None:
+    with InstallTransaction(prefix, APP_NAME) as txn:
+        txn.stage(prefix / "bin" / "a", b"new a", 0o755)
+        txn.stage(prefix / "bin" / "b", b"new b", 0o755)
+        txn.stage(prefix / "bin" / "d", b"new d", 0o755)
+        txn.remove(prefix / "bin" / "c")
+        txn.commit()
+
+
+NEW = {"bin/a": b"new a", "bin/b": b"new b", "bin/d": b"new d"}
+OLD = {"bin/a": b"old a", "bin/b": b"old b", "bin/c": b"old c"}
+
+
+class DescribeInstallTransaction:
+    def it_replaces_all_files(self, prefix: Path):
+        _install(prefix)
+
+        assert _contents(prefix) == NEW
+        assert not list(prefix.rglob("*.json"))
+
+    def it_restores_all_files_when_commit_fails(self, prefix, monkeypatch):
+        def fail(self):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(InstallTransaction, "_fsync_dirs", fail)
+        with pytest.raises(OSError, match="disk full"):
+            _install(prefix)
+
+        assert _contents(prefix) == OLD
+        assert not list(prefix.rglob("*.json"))
+
+    def it_rolls_back_install_that_crashed_before_commit_point(
+        self, prefix, monkeypatch
+    ):
+        replace = Path.replace
+
+        def crash_on_journal(self, target):
+            # All files are already replaced, journal is about to be removed
+            if Path(target).name.endswith(".cleanup.json"):
+                raise _Crash
+            return replace(self, target)
+
+        with monkeypatch.context() as m:
+            m.setattr(Path, "replace", crash_on_journal)
+            with pytest.raises(_Crash):
+                _install(prefix)
+
+        assert _contents(prefix) == NEW
+
+        InstallTransaction.recover(prefix, APP_NAME)
+
+        assert _contents(prefix) == OLD
+        assert not list(prefix.rglob("*.json"))
+
+    def it_keeps_install_that_crashed_while_removing_backups(self, prefix, monkeypatch):
+        def crash(cls, entries):
+            # Some backups are already gone when process dies
+            for _ in entries[:1]:
+                Path(_.backup).unlink()
+            raise _Crash
+
+        with monkeypatch.context() as m:
+            m.setattr(InstallTransaction, "_remove_backups", classmethod(crash))
+            with pytest.raises(_Crash):
+                _install(prefix)
+
+        assert list(prefix.rglob("*.usr-local-pull-backup"))
+
+        InstallTransaction.recover(prefix, APP_NAME)
+
+        assert _contents(prefix) == NEW
+        assert not list(prefix.rglob("*.usr-local-pull-backup"))
+        assert not list(prefix.rglob("*.json"))
+
+        # Next install of the same app doesn't roll anything back
+        (prefix / "bin" / "c").write_bytes(b"old c")
+        _install(prefix)
+        assert _contents(prefix) == NEW
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+from usr_local_pull import zsh_digest
+from usr_local_pull.app_files import ZshCompletion
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def zsh(tmp_path: Path, monkeypatch) -> Path:
+    """
+    `zsh` that "compiles" functions by concatenating them into digest.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    retv = bin_dir / "zsh"
+    # Called as: zsh -fc <script> zsh <digest> <function>...
+    retv.write_text('#!/bin/sh\nout="$4"\nshift 4\n/bin/cat "$@" > "$out"\n')
+    retv.chmod(0o755)
+    monkeypatch.setenv("PATH", bin_dir.as_posix())
+    return retv
+
+
+@pytest.fixture
+def prefix(tmp_path: Path) -> Path:
+    retv = tmp_path / "prefix"
+    functions_dir = ZshCompletion.site_functions_dir(retv)
+    functions_dir.mkdir(parents=True)
+    (functions_dir / "_a").write_text("a\n")
+    (functions_dir / "_b").write_text("b\n")
+    return retv
+
+
+def _versioned(prefix: Path, name: str, content: str) -> Path:
+    """
+    Function file of some installed version, with mtime older than anything else.
+    """
+    retv = prefix / "versions" / content.strip() / name
+    retv.parent.mkdir(parents=True, exist_ok=True)
+    retv.write_text(content)
+    os.utime(retv, ns=(0, 0))
+    return retv
+
+
+class DescribeRefresh:
+    def it_builds_digest_only_when_functions_change(self, prefix, zsh):
+        zwc_path = zsh_digest.refresh(prefix)
+        assert zwc_path
+        assert zwc_path.read_text() == "a\nb\n"
+
+        built_at = zwc_path.stat().st_mtime_ns
+        assert zsh_digest.refresh(prefix) == zwc_path
+        assert zwc_path.stat().st_mtime_ns == built_at
+
+        (ZshCompletion.site_functions_dir(prefix) / "_b").unlink()
+        assert zsh_digest.refresh(prefix) == zwc_path
+        assert zwc_path.read_text() == "a\n"
+
+    def it_rebuilds_digest_when_function_resolves_to_older_file(self, prefix, zsh):
+        link = ZshCompletion.site_functions_dir(prefix) / "_c"
+        link.symlink_to(_versioned(prefix, "_c", "new\n"))
+        zsh_digest.refresh(prefix)
+
+        # Ie. rollback to older version
+        link.unlink()
+        link.symlink_to(_versioned(prefix, "_c", "old\n"))
+
+        zwc_path = zsh_digest.refresh_existing(prefix)
+        assert zwc_path
+        assert zwc_path.read_text() == "a\nb\nold\n"
+
+    def it_removes_digest_when_zsh_is_missing(self, prefix, zsh):
+        zwc_path = zsh_digest.refresh(prefix)
+        assert zwc_path
+        (ZshCompletion.site_functions_dir(prefix) / "_b").write_text("changed\n")
+        zsh.unlink()
+
+        assert zsh_digest.refresh(prefix) is None
+        assert not zwc_path.exists()
+        assert not zsh_digest.sources_path(prefix).exists()
+
+
+class DescribeDiscardStale:
+    def it_keeps_fresh_digest(self, prefix, zsh):
+        zwc_path = zsh_digest.refresh(prefix)
+        assert zwc_path
+
+        zsh_digest.discard_stale(prefix)
+        assert zwc_path.exists()
+
+    def it_removes_stale_digest(self, prefix, zsh):
+        zwc_path = zsh_digest.refresh(prefix)
+        assert zwc_path
+        (ZshCompletion.site_functions_dir(prefix) / "_a").unlink()
+
+        zsh_digest.discard_stale(prefix)
+        assert not zwc_path.exists()
+
+
+def it_does_nothing_without_digest(prefix, zsh):
+    assert zsh_digest.refresh_existing(prefix) is None
+    assert not zsh_digest.digest_path(prefix).exists()